@@ -8,8 +8,14 @@ import time
 import multiprocessing
 import fcntl
 from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
+# Shared adaptive rate limiter
+sys.path.append(str(Path(__file__).parent.parent / "auto" / "shared" / "utils"))
+from rate_limiter import get_scheduler
+
 # Set up logging with configurable level
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
 logging.basicConfig(
@@ -30,7 +36,6 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_DIR = os.path.join(SCRIPT_DIR, "db")
 LOGS_DIR = os.path.join(SCRIPT_DIR, "logs")
 MAX_PROJECTS_PER_BATCH = 20  # Maximum number of projects to create in one batch
-RATE_LIMIT_DELAY = 1  # Delay between API calls in seconds
 MAX_CONCURRENT_ACCOUNTS = 3  # Maximum number of accounts to process concurrently
 
 # Create necessary directories if they don't exist
@@ -48,13 +53,19 @@ class RevenueCatAutomation:
         self.account_id = account_id
         self.db_file = os.path.join(DB_DIR, f"{account_id}_db.json")
         self.load_db()
-        self.rate_limit_counter = 0
+        self.api_host = urlparse(self.base_url).netloc
+        self.scheduler = get_scheduler()
+        # Every response feeds the limiter, so 429/503 + Retry-After slow this host down
+        self.session.hooks['response'].append(self._observe_rate_limit)
 
     def rate_limit(self):
-        """Implement rate limiting between API calls."""
-        self.rate_limit_counter += 1
-        if self.rate_limit_counter % 2 == 0:  # Every 2 API calls
-            time.sleep(RATE_LIMIT_DELAY)
+        """Wait for a slot in the shared per-host token bucket before an API call."""
+        self.scheduler.wait(self.api_host)
+
+    def _observe_rate_limit(self, response, *args, **kwargs):
+        """requests response hook: report status/Retry-After to the rate limiter."""
+        self.scheduler.observe(urlparse(response.url).netloc, response.status_code, response.headers)
+        return response
 
     def load_db(self):
         """Load the database from account-specific db.json file."""
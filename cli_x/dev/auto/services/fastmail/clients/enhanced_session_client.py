@@ -5,17 +5,20 @@ Client for the enhanced automation server with session reuse
 """
 
 import requests
+import aiohttp
+import asyncio
 import sys
 import time
 import json
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator
 
 class EnhancedSessionClient:
     def __init__(self, server_url: str = "http://100.124.55.82:8002", timeout: int = 120):
         self.server_url = server_url.rstrip('/')
         self.session = requests.Session()
         self.session.timeout = timeout
+        self.timeout = timeout
         
     def get_status(self) -> Dict[str, Any]:
         """Get server status including session reuse stats"""
@@ -44,13 +47,15 @@ class EnhancedSessionClient:
         except requests.exceptions.RequestException as e:
             return {"error": f"Failed to reset session: {e}"}
     
-    def create_alias(self, alias_email: str, target_email: str, description: str = "") -> Dict[str, Any]:
-        """Create alias using enhanced server with session reuse"""
+    def create_alias(self, alias_email: str, target_email: str, description: str = "",
+                     account: str = None) -> Dict[str, Any]:
+        """Create alias using enhanced server with session reuse (in `account`, default: server's first)"""
         try:
             payload = {
                 "alias_email": alias_email,
                 "target_email": target_email,
-                "description": description
+                "description": description,
+                "account": account
             }
             
             start_time = time.time()
@@ -65,12 +70,14 @@ class EnhancedSessionClient:
         except requests.exceptions.RequestException as e:
             return {"error": f"Failed to create alias: {e}"}
     
-    def batch_create_aliases(self, aliases_list: list, processing_mode: str = "sequential") -> Dict[str, Any]:
+    def batch_create_aliases(self, aliases_list: list, processing_mode: str = "sequential",
+                             account: str = None) -> Dict[str, Any]:
         """Create multiple aliases in batch"""
         try:
             payload = {
                 "aliases": aliases_list,
-                "processing_mode": processing_mode
+                "processing_mode": processing_mode,
+                "account": account
             }
             
             start_time = time.time()
@@ -85,6 +92,36 @@ class EnhancedSessionClient:
         except requests.exceptions.RequestException as e:
             return {"error": f"Failed to batch create aliases: {e}"}
     
+    def submit_batch(self, aliases_list: list, processing_mode: str = "parallel",
+                     account: str = None) -> Dict[str, Any]:
+        """Queue a batch on the server; returns at once with its batch_id"""
+        try:
+            payload = {
+                "aliases": aliases_list,
+                "processing_mode": processing_mode,
+                "account": account
+            }
+            response = self.session.post(f"{self.server_url}/jobs", json=payload)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            return {"error": f"Failed to submit batch: {e}"}
+    
+    async def stream_batch(self, batch_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield per-alias results of a queued batch as the server finishes them (NDJSON),
+        ending with the {'event': 'done', ...} summary. No overall timeout: only a stalled
+        connection (nothing for `timeout` seconds while a job runs) is an error.
+        """
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=max(self.timeout, 300))
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(f"{self.server_url}/jobs/{batch_id}/stream",
+                                   headers={"Accept": "application/x-ndjson"}) as response:
+                response.raise_for_status()
+                async for line in response.content:
+                    if line.strip():
+                        yield json.loads(line)
+    
     def get_active_tasks(self) -> Dict[str, Any]:
         """Get information about active tasks"""
         try:
@@ -112,6 +149,9 @@ def display_status(client: EnhancedSessionClient):
     reuse_stats = status.get('session_reuse_stats', {})
     print(f"🔄 Sessions Created: {reuse_stats.get('sessions_created', 0)}")
     print(f"🌐 Browser Active: {reuse_stats.get('browser_active', False)}")
+    for account, pool_stats in status.get('browser_pool_stats', {}).items():
+        print(f"🏊 Browser Pool [{account}]: {pool_stats.get('in_use', 0)} in use, {pool_stats.get('idle', 0)} idle "
+              f"(max {pool_stats.get('size', 0)}), {pool_stats.get('reused', 0)} reuses")
     if reuse_stats.get('last_used'):
         print(f"⏰ Last Used: {reuse_stats['last_used']}")
     
@@ -253,7 +293,56 @@ def create_batch_aliases(client: EnhancedSessionClient, aliases_list: list, proc
     
     return result.get('successful_count', 0) == result.get('total_requested', 0)
 
-def bulk_test(client: EnhancedSessionClient, count: int = 5, processing_mode: str = "sequential"):
+async def _consume_batch_stream(client: EnhancedSessionClient, batch_id: str, total: int) -> Dict[str, Any]:
+    """Print each result as it arrives; only counters are kept, not the results"""
+    finished = 0
+    summary = {}
+    async for event in client.stream_batch(batch_id):
+        if event.get('event') == 'done':
+            summary = event
+            break
+        finished += 1
+        status = "✅" if event.get('success') else "❌"
+        reused = "🔄" if event.get('session_reused') else "🆕"
+        retries = f" ({event['attempts']} attempts)" if event.get('attempts', 1) > 1 else ""
+        print(f"   [{finished}/{total}] {status} {event.get('alias_email', 'unknown')} - "
+              f"{event.get('execution_time', 0):.2f}s {reused}{retries}")
+    return summary
+
+def stream_batch_aliases(client: EnhancedSessionClient, aliases_list: list, processing_mode: str = "parallel"):
+    """Queue a batch and stream its results as they finish (no request timeout for big batches)"""
+    print(f"\n📦 Queueing {len(aliases_list)} aliases ({processing_mode} mode)...")
+    
+    start_time = time.time()
+    submitted = client.submit_batch(aliases_list, processing_mode)
+    if "error" in submitted:
+        print(f"❌ Error: {submitted['error']}")
+        return False
+    
+    batch_id = submitted['batch_id']
+    print(f"📥 Batch {batch_id} queued, streaming results...")
+    
+    try:
+        summary = asyncio.run(_consume_batch_stream(client, batch_id, submitted['total']))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"❌ Stream interrupted: {e}")
+        print(f"💡 The batch keeps running on the server; poll {client.server_url}/jobs/{batch_id}")
+        return False
+    
+    total_time = time.time() - start_time
+    successful = summary.get('successful_count', 0)
+    total = summary.get('total_requested', submitted['total'])
+    print(f"\n🏁 Batch Complete!")
+    print(f"✅ Successful: {successful}")
+    print(f"❌ Failed: {summary.get('failed_count', 0)}")
+    print(f"🌐 Total Time: {total_time:.2f}s")
+    if total:
+        print(f"⚡ Average per alias: {total_time / total:.2f}s")
+    
+    return successful == total
+
+def bulk_test(client: EnhancedSessionClient, count: int = 5, processing_mode: str = "sequential",
+              stream: bool = False):
     """Perform a bulk test with multiple aliases"""
     print(f"\n🚀 Bulk Test: Creating {count} aliases using {processing_mode} processing...")
     
@@ -267,6 +356,8 @@ def bulk_test(client: EnhancedSessionClient, count: int = 5, processing_mode: st
             "description": f"Bulk {processing_mode} test {i+1}"
         })
     
+    if stream:
+        return stream_batch_aliases(client, aliases, processing_mode)
     return create_batch_aliases(client, aliases, processing_mode)
 
 def compare_processing_modes(client: EnhancedSessionClient, count: int = 3):
@@ -315,7 +406,9 @@ def main():
         print("Batch Commands:")
         print("  batch <alias1,target1> <alias2,target2> ... - Create multiple aliases sequentially")
         print("  batch-parallel <alias1,target1> <alias2,target2> ... - Create multiple aliases in parallel")
+        print("  batch-stream <alias1,target1> ...  - Queue aliases and stream results as they finish")
         print("  bulk <count> [mode]                - Bulk test (count aliases, mode: sequential/parallel)")
+        print("  bulk-stream <count> [mode]         - Bulk test via the job queue with streamed results")
         print("  compare [count]                    - Compare sequential vs parallel processing")
         print()
         print("System Commands:")
@@ -352,13 +445,14 @@ def main():
         if display_status(client):
             create_single_alias(client, alias_email, target_email, description)
     
-    elif command in ["batch", "batch-parallel"]:
+    elif command in ["batch", "batch-parallel", "batch-stream"]:
         if len(sys.argv) < 3:
             print("❌ Usage: batch <alias1,target1> <alias2,target2> ...")
             print("❌ Usage: batch-parallel <alias1,target1> <alias2,target2> ...")
+            print("❌ Usage: batch-stream <alias1,target1> <alias2,target2> ...")
             return
         
-        processing_mode = "parallel" if command == "batch-parallel" else "sequential"
+        processing_mode = "sequential" if command == "batch" else "parallel"
         aliases = []
         
         for arg in sys.argv[2:]:
@@ -372,9 +466,12 @@ def main():
                     })
         
         if aliases and display_status(client):
-            create_batch_aliases(client, aliases, processing_mode)
+            if command == "batch-stream":
+                stream_batch_aliases(client, aliases, processing_mode)
+            else:
+                create_batch_aliases(client, aliases, processing_mode)
     
-    elif command == "bulk":
+    elif command in ["bulk", "bulk-stream"]:
         count = 5  # default
         mode = "sequential"  # default
         
@@ -392,7 +489,7 @@ def main():
                 return
         
         if display_status(client):
-            bulk_test(client, count, mode)
+            bulk_test(client, count, mode, stream=command == "bulk-stream")
     
     elif command == "compare":
         count = 3  # default
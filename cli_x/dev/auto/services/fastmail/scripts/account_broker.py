@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Multi-Account Session Broker for Fastmail Automation
+One Chromium shared by a warm context pool + SessionBroker per account, so a single
+server process serves every configured account. Each account keeps its own token
+cache and is re-minted on a staggered schedule before its credentials expire.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Optional, Dict, Any, List, Callable
+from playwright.async_api import async_playwright, Browser
+
+from browser_pool import BrowserContextPool
+from session_broker import SessionBroker, MAX_TOKEN_AGE_SECONDS
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+REFRESH_MARGIN_SECONDS = 5 * 60  # Re-mint this long before the cached token would expire
+REFRESH_CHECK_SECONDS = 60
+
+def load_accounts() -> Dict[str, str]:
+    """
+    username -> password for every configured account: Infisical pairs FM_M_0/FM_P_0,
+    FM_M_1/FM_P_1, ... in order, else the single FASTMAIL_USERNAME/FASTMAIL_PASSWORD
+    """
+    accounts = {}
+    index = 0
+    while os.getenv(f"FM_M_{index}"):
+        username, password = os.getenv(f"FM_M_{index}"), os.getenv(f"FM_P_{index}")
+        if password:
+            accounts[username] = password
+        else:
+            logger.warning(f"⚠️  FM_M_{index} has no FM_P_{index}, skipping {username}")
+        index += 1
+    if not accounts and os.getenv("FASTMAIL_USERNAME") and os.getenv("FASTMAIL_PASSWORD"):
+        accounts[os.getenv("FASTMAIL_USERNAME")] = os.getenv("FASTMAIL_PASSWORD")
+    return accounts
+
+class UnknownAccountError(ValueError):
+    """The requested account is not configured on this server"""
+
+class AccountBroker:
+    """
+    Per-account browser pools and JMAP session brokers on one shared browser
+
+    broker(account) returns that account's SessionBroker (the first configured account
+    when none is given). A background task re-mints, one account at a time, any cached
+    credentials within `refresh_margin` of `max_token_age`, so requests rarely wait for
+    a mint. Accounts that were never used stay warm (pool min_idle) but are not minted.
+    """
+
+    def __init__(self, accounts: Dict[str, str], pool_size: int = 2, min_idle: int = 1,
+                 max_idle_seconds: int = 300, max_age_seconds: int = 90 * 60,
+                 max_token_age: int = MAX_TOKEN_AGE_SECONDS, refresh_margin: int = REFRESH_MARGIN_SECONDS,
+                 step_observer: Optional[Callable[[Dict[str, float]], None]] = None):
+        if not accounts:
+            raise ValueError("No FastMail accounts configured")
+        self.accounts: List[str] = list(accounts)
+        self.default_account = self.accounts[0]
+        self.refresh_margin = refresh_margin
+
+        self.pools: Dict[str, BrowserContextPool] = {
+            username: BrowserContextPool(
+                username, password,
+                size=pool_size,
+                min_idle=min_idle,
+                max_idle_seconds=max_idle_seconds,
+                max_age_seconds=max_age_seconds,
+                step_observer=step_observer
+            )
+            for username, password in accounts.items()
+        }
+        self.brokers: Dict[str, SessionBroker] = {
+            username: SessionBroker(pool, max_token_age=max_token_age) for username, pool in self.pools.items()
+        }
+
+        self.playwright = None
+        self.browser: Optional[Browser] = None
+        self.launch_seconds: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.stats = {'refreshes': 0, 'refresh_failures': 0}
+
+    async def start(self) -> bool:
+        """Launch the shared browser and warm every account's pool concurrently"""
+        logger.info(f"🚀 Starting account broker for {len(self.accounts)} accounts...")
+        start_time = time.perf_counter()
+        try:
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(
+                headless=True,
+                args=['--no-sandbox', '--disable-dev-shm-usage']
+            )
+            self.launch_seconds = time.perf_counter() - start_time
+        except Exception as e:
+            logger.error(f"❌ Browser launch failed: {e}")
+            await self.close()
+            return False
+
+        await asyncio.gather(*(pool.start(browser=self.browser) for pool in self.pools.values()))
+        self._refresh_task = asyncio.create_task(self._refresher())
+        logger.info(f"✅ Account broker ready ({', '.join(self.accounts)})")
+        return True
+
+    async def close(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+        for broker in self.brokers.values():
+            broker.close()
+        for pool in self.pools.values():
+            await pool.close()
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+        self.browser = self.playwright = None
+
+    def resolve(self, account: Optional[str] = None) -> str:
+        """Configured account name for `account` (default account when None)"""
+        if not account:
+            return self.default_account
+        if account not in self.brokers:
+            raise UnknownAccountError(f"Unknown account: {account}")
+        return account
+
+    def broker(self, account: Optional[str] = None) -> SessionBroker:
+        return self.brokers[self.resolve(account)]
+
+    async def reset(self, account: Optional[str] = None):
+        """Forget cached credentials and re-login pooled contexts (one account or all)"""
+        accounts = [self.resolve(account)] if account else self.accounts
+        for username in accounts:
+            await self.brokers[username].reset()
+
+    async def _refresher(self):
+        """Re-mint credentials that are about to expire, one account at a time"""
+        while True:
+            try:
+                await asyncio.sleep(REFRESH_CHECK_SECONDS)
+                for username, broker in self.brokers.items():
+                    age = broker.token_age()
+                    if age is None or age < broker.max_token_age - self.refresh_margin:
+                        continue
+                    try:
+                        await broker.refresh()
+                        self.stats['refreshes'] += 1
+                        logger.info(f"🔄 Refreshed JMAP session for {username}")
+                    except Exception as e:
+                        self.stats['refresh_failures'] += 1
+                        logger.warning(f"⚠️  Session refresh for {username} failed: {e}")
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Account refresher error: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'accounts': len(self.accounts),
+            'default_account': self.default_account,
+            **self.stats,
+            'pools': {username: pool.get_stats() for username, pool in self.pools.items()},
+            'brokers': {username: broker.get_stats() for username, broker in self.brokers.items()}
+        }
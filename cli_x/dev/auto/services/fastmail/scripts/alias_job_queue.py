@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Durable Alias Job Queue for Fastmail Automation
+SQLite-backed queue of alias jobs worked off by a fixed pool of asyncio workers, with
+per-job retries and backoff, idempotency keys and per-batch results that can be polled
+or streamed. Queued and interrupted jobs are picked up again after a server restart.
+Workers are shared fairly between accounts: the account with the fewest jobs running
+goes first, so one large batch cannot starve the others.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_DB_PATH = Path.home() / ".fastmail_automation" / "alias_jobs.db"
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_ATTEMPTS = 3
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60  # A finished job answers repeats of its key for this long
+IDLE_POLL_SECONDS = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    idempotency_key TEXT UNIQUE NOT NULL,
+    account TEXT NOT NULL DEFAULT '',
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,            -- queued | running | succeeded | failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    next_run_at REAL NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_runnable ON jobs (status, next_run_at);
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    processing_mode TEXT NOT NULL,   -- sequential batches run one job at a time
+    total INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS batch_items (
+    batch_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    job_id TEXT NOT NULL,
+    PRIMARY KEY (batch_id, position)
+);
+CREATE INDEX IF NOT EXISTS batch_items_job ON batch_items (job_id);
+"""
+
+# Next runnable job; a job in a sequential batch waits until every earlier job of that batch
+# has finished (including one waiting out a retry backoff) and while any other of its jobs
+# runs, and accounts with fewer running jobs go first
+CLAIM_QUERY = """
+SELECT j.* FROM jobs j
+WHERE j.status = 'queued' AND j.next_run_at <= ?
+  AND NOT EXISTS (
+      SELECT 1 FROM batch_items bi
+      JOIN batches b ON b.id = bi.batch_id AND b.processing_mode = 'sequential'
+      JOIN batch_items sibling ON sibling.batch_id = b.id AND sibling.job_id != j.id
+      JOIN jobs other ON other.id = sibling.job_id
+      WHERE bi.job_id = j.id
+        AND (other.status = 'running'
+             OR (sibling.position < bi.position AND other.status NOT IN ('succeeded', 'failed')))
+  )
+ORDER BY (SELECT COUNT(*) FROM jobs busy WHERE busy.status = 'running' AND busy.account = j.account),
+         j.next_run_at, j.created_at
+LIMIT 1
+"""
+
+FINISHED = ('succeeded', 'failed')
+
+def default_idempotency_key(item: Dict[str, Any]) -> str:
+    """Same account + alias -> same target is the same job unless the caller says otherwise"""
+    return (f"{(item.get('account') or '').lower()}:"
+            f"{item.get('alias_email', '').lower()}->{item.get('target_email', '').lower()}")
+
+class AliasJobQueue:
+    """
+    Durable queue of alias jobs with a bounded worker pool
+
+    `handler(payload)` does the work for one job and returns a result dict with a
+    'success' key. A False result is final (the API answered); an exception is treated as
+    transient and retried with exponential backoff up to `max_attempts`. All SQLite access
+    runs on one dedicated thread, so the event loop never blocks on disk.
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                 db_path: Optional[Path] = None, workers: int = DEFAULT_WORKERS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.handler = handler
+        self.db_path = Path(db_path or os.getenv("FM_JOB_DB") or DEFAULT_DB_PATH)
+        self.workers = workers
+        self.max_attempts = max_attempts
+
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alias-jobs-db")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()          # New or retried work is available
+        self._progress = asyncio.Condition()    # A job finished (wakes result streams)
+        self._finished_generation = 0
+        self._running = False
+
+        self.stats = {'processed': 0, 'succeeded': 0, 'failed': 0, 'retries': 0, 'deduplicated': 0, 'recovered': 0}
+
+    # ─── Database (dedicated thread) ───
+
+    async def _db(self, fn: Callable, *args):
+        return await asyncio.get_event_loop().run_in_executor(self._db_executor, fn, *args)
+
+    def _open(self) -> int:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if 'account' not in columns:  # Databases from before multi-account support
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN account TEXT NOT NULL DEFAULT ''")
+        # Jobs that were running when the process died go back to the queue
+        recovered = self._conn.execute(
+            "UPDATE jobs SET status = 'queued', next_run_at = ?, updated_at = ? WHERE status = 'running'",
+            (time.time(), time.time())
+        ).rowcount
+        self._conn.commit()
+        return recovered
+
+    def _insert_batch(self, batch_id: str, items: List[Dict[str, Any]], processing_mode: str) -> int:
+        now = time.time()
+        deduplicated = 0
+        with self._conn:
+            self._conn.execute("INSERT INTO batches (id, processing_mode, total, created_at) VALUES (?, ?, ?, ?)",
+                               (batch_id, processing_mode, len(items), now))
+            for position, item in enumerate(items):
+                key = item.get('idempotency_key') or default_idempotency_key(item)
+                payload = {k: item.get(k) or '' for k in ('alias_email', 'target_email', 'description', 'account')}
+                existing = self._conn.execute("SELECT id, status, updated_at FROM jobs WHERE idempotency_key = ?",
+                                              (key,)).fetchone()
+                if existing and (existing['status'] not in FINISHED
+                                 or (existing['status'] == 'succeeded' and now - existing['updated_at'] < IDEMPOTENCY_TTL_SECONDS)):
+                    job_id = existing['id']  # Already queued/running/done: share it
+                    deduplicated += 1
+                elif existing:
+                    # Failed (or stale) job: run it again under the same key
+                    job_id = existing['id']
+                    self._conn.execute(
+                        "UPDATE jobs SET account = ?, payload = ?, status = 'queued', attempts = 0, max_attempts = ?, "
+                        "next_run_at = ?, result = NULL, error = NULL, updated_at = ? WHERE id = ?",
+                        (payload['account'], json.dumps(payload), self.max_attempts, now, now, job_id)
+                    )
+                else:
+                    job_id = uuid.uuid4().hex
+                    self._conn.execute(
+                        "INSERT INTO jobs (id, idempotency_key, account, payload, status, max_attempts, next_run_at, "
+                        "created_at, updated_at) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                        (job_id, key, payload['account'], json.dumps(payload), self.max_attempts, now,
+                         now + position * 1e-6, now)
+                    )
+                self._conn.execute("INSERT INTO batch_items (batch_id, position, job_id) VALUES (?, ?, ?)",
+                                   (batch_id, position, job_id))
+        return deduplicated
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        with self._conn:
+            job = self._conn.execute(CLAIM_QUERY, (time.time(),)).fetchone()
+            if job:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (time.time(), job['id'])
+                )
+            return job
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]], error: Optional[str]):
+        with self._conn:
+            self._conn.execute("UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                               (status, json.dumps(result) if result else None, error, time.time(), job_id))
+
+    def _requeue(self, job_id: str, delay: float, error: str):
+        with self._conn:
+            self._conn.execute("UPDATE jobs SET status = 'queued', next_run_at = ?, error = ?, updated_at = ? "
+                               "WHERE id = ?", (time.time() + delay, error, time.time(), job_id))
+
+    def _next_run_at(self) -> Optional[float]:
+        # Due jobs still queued are blocked behind a batch sibling; finishing that wakes workers
+        row = self._conn.execute("SELECT MIN(next_run_at) FROM jobs WHERE status = 'queued' AND next_run_at > ?",
+                                 (time.time(),)).fetchone()
+        return row[0]
+
+    def _batch_rows(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        batch = self._conn.execute("SELECT * FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        if not batch:
+            return None
+        items = self._conn.execute(
+            "SELECT bi.position, j.* FROM batch_items bi JOIN jobs j ON j.id = bi.job_id "
+            "WHERE bi.batch_id = ? ORDER BY bi.position", (batch_id,)
+        ).fetchall()
+        return {'batch': dict(batch), 'items': [dict(item) for item in items]}
+
+    def _unfinished_batches(self) -> List[Dict[str, Any]]:
+        rows = self._conn.execute(
+            "SELECT b.id, b.processing_mode, b.total, b.created_at, "
+            "SUM(j.status IN ('succeeded', 'failed')) AS finished, SUM(j.status = 'running') AS running "
+            "FROM batches b JOIN batch_items bi ON bi.batch_id = b.id JOIN jobs j ON j.id = bi.job_id "
+            "GROUP BY b.id HAVING finished < b.total ORDER BY b.created_at"
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _counts(self) -> Dict[str, int]:
+        rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    # ─── Lifecycle ───
+
+    async def start(self):
+        recovered = await self._db(self._open)
+        self.stats['recovered'] = recovered
+        if recovered:
+            logger.info(f"♻️  Re-queued {recovered} alias jobs interrupted by the last shutdown")
+        self._running = True
+        self._worker_tasks = [asyncio.create_task(self._worker(i + 1)) for i in range(self.workers)]
+        self._wakeup.set()
+        logger.info(f"📬 Alias job queue started ({self.workers} workers, {self.db_path})")
+
+    async def close(self):
+        """Stop the workers; running jobs are re-queued on the next start"""
+        self._running = False
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        if self._conn:
+            await self._db(self._conn.close)
+        self._db_executor.shutdown(wait=True)
+
+    # ─── Workers ───
+
+    async def _worker(self, number: int):
+        while self._running:
+            try:
+                job = await self._db(self._claim)
+                if job is None:
+                    await self._idle()
+                    continue
+                await self._run(job, number)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Alias job worker {number} error: {e}")
+                await asyncio.sleep(IDLE_POLL_SECONDS)
+
+    async def _idle(self):
+        """Sleep until new work is submitted or the earliest backoff expires"""
+        self._wakeup.clear()
+        next_run_at = await self._db(self._next_run_at)
+        timeout = IDLE_POLL_SECONDS if next_run_at is None else max(0.0, min(next_run_at - time.time(), IDLE_POLL_SECONDS))
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self, job: sqlite3.Row, number: int):
+        payload = json.loads(job['payload'])
+        attempt = job['attempts'] + 1
+        try:
+            result = await self.handler(payload)
+        except Exception as e:
+            if attempt < job['max_attempts']:
+                delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+                self.stats['retries'] += 1
+                logger.warning(f"⚠️  [worker-{number}] {payload['alias_email']} attempt {attempt} failed ({e}), "
+                               f"retrying in {delay:.1f}s")
+                await self._db(self._requeue, job['id'], delay, str(e))
+                return
+            result, status, error = None, 'failed', str(e)
+        else:
+            status, error = ('succeeded' if result.get('success') else 'failed'), None
+        await self._db(self._finish, job['id'], status, result, error)
+
+        self.stats['processed'] += 1
+        self.stats[status] += 1
+        icon = "✅" if status == 'succeeded' else "❌"
+        logger.info(f"{icon} [worker-{number}] {payload['alias_email']} {status} (attempt {attempt})")
+        async with self._progress:
+            self._finished_generation += 1
+            self._progress.notify_all()
+        self._wakeup.set()  # A sequential batch may have its next job runnable now
+
+    # ─── Public API ───
+
+    async def submit(self, items: List[Dict[str, Any]], processing_mode: str = "parallel") -> str:
+        """
+        Queue a batch of {'alias_email', 'target_email', 'description'[, 'account', 'idempotency_key']};
+        returns its id
+        """
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        deduplicated = await self._db(self._insert_batch, batch_id, items, processing_mode)
+        self.stats['deduplicated'] += deduplicated
+        self._wakeup.set()
+        logger.info(f"📥 [{batch_id}] Queued {len(items)} alias jobs ({processing_mode}, {deduplicated} deduplicated)")
+        return batch_id
+
+    async def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Progress and the finished results of a batch (None if unknown)"""
+        rows = await self._db(self._batch_rows, batch_id)
+        if rows is None:
+            return None
+        items = rows['items']
+        finished = [item for item in items if item['status'] in FINISHED]
+        return {
+            'batch_id': batch_id,
+            'processing_mode': rows['batch']['processing_mode'],
+            'created_at': rows['batch']['created_at'],
+            'total': rows['batch']['total'],
+            'finished': len(finished),
+            'succeeded': sum(1 for item in finished if item['status'] == 'succeeded'),
+            'failed': sum(1 for item in finished if item['status'] == 'failed'),
+            'done': len(finished) == rows['batch']['total'],
+            'results': [self._item_result(item) for item in finished]
+        }
+
+    async def stream_batch(self, batch_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield each item result of a batch as it finishes (already finished ones first)"""
+        seen = set()
+        while True:
+            generation = self._finished_generation
+            rows = await self._db(self._batch_rows, batch_id)
+            if rows is None:
+                return
+            for item in rows['items']:
+                if item['status'] in FINISHED and item['position'] not in seen:
+                    seen.add(item['position'])
+                    yield self._item_result(item)
+            if len(seen) == rows['batch']['total']:
+                return
+            async with self._progress:
+                try:
+                    await asyncio.wait_for(
+                        self._progress.wait_for(lambda: self._finished_generation != generation),
+                        IDLE_POLL_SECONDS * 5
+                    )
+                except asyncio.TimeoutError:
+                    pass  # Re-check anyway; another process may share the database
+
+    @staticmethod
+    def _item_result(item: Dict[str, Any]) -> Dict[str, Any]:
+        payload = json.loads(item['payload'])
+        result = json.loads(item['result']) if item['result'] else {
+            'success': False,
+            **payload,
+            'alias_id': None,
+            'execution_time': 0,
+            'session_reused': False,
+            'message': f"Error: {item['error']}"
+        }
+        return {**result, 'position': item['position'], 'job_id': item['id'], 'attempts': item['attempts']}
+
+    async def active_batches(self) -> List[Dict[str, Any]]:
+        return await self._db(self._unfinished_batches)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        counts = await self._db(self._counts)
+        return {
+            'workers': self.workers,
+            'queued': counts.get('queued', 0),
+            'running': counts.get('running', 0),
+            **self.stats
+        }
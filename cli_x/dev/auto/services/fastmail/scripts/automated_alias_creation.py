@@ -14,14 +14,59 @@ import requests
 import json
 import time
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent.parent / ".env")  # Load from Y/.env
 
-def create_alias_with_playwright(alias_email, target_email, description="", username=None, password=None):
-    """Create an alias using Playwright to extract session data automatically"""
+# Encrypted storage_state persistence
+sys.path.append(str(Path(__file__).parent.parent.parent.parent / "shared" / "utils"))
+from encrypted_state_store import get_state_store
+from step_timer import StepTimer
+from resource_blocker import get_resource_blocker
+
+def is_jmap_call(request):
+    """An authenticated request from the web app to the JMAP API"""
+    return 'api.fastmail.com/jmap/api/' in request.url and request.headers.get('authorization', '').startswith('Bearer ')
+
+def restore_saved_session(page, timeout=15000):
+    """
+    One check for a context restored from saved state: open the mail view and see
+    whether an authenticated JMAP call (session valid) or the login page comes first
+    """
+    try:
+        with page.expect_event(
+            'request',
+            predicate=lambda r: is_jmap_call(r) or (r.is_navigation_request() and '/login' in r.url),
+            timeout=timeout
+        ) as first_request:
+            page.goto("https://app.fastmail.com/mail/", wait_until="commit")
+        return is_jmap_call(first_request.value)
+    except Exception:
+        return False
+
+def wait_for_jmap_call(page, captured, timeout=15000):
+    """
+    Block until the web app has made an authenticated JMAP call (the session is usable);
+    `captured` says whether the request handler has already seen one
+    """
+    if captured():
+        return True
+    try:
+        page.wait_for_event('request', predicate=is_jmap_call, timeout=timeout)
+        return True
+    except Exception:
+        return captured()
+
+def create_alias_with_playwright(alias_email, target_email, description="", username=None, password=None, timings=None):
+    """
+    Create an alias using Playwright to extract session data automatically
+
+    Pass a dict as `timings` to get the per-step durations (browser_launch, restore/login,
+    token_capture, account_id, api_call, total) in seconds.
+    """
     
     # Use provided credentials or load from environment (Infisical format first, then fallback)
     username = username or os.getenv("FM_M_0") or os.getenv("FASTMAIL_USERNAME")
@@ -32,16 +77,59 @@ def create_alias_with_playwright(alias_email, target_email, description="", user
         print("Looking for either Infisical secrets (FM_M_0, FM_P_0) or .env variables (FASTMAIL_USERNAME, FASTMAIL_PASSWORD)")
         return False
     
+    timer = StepTimer(timings)
+    state_store = get_state_store()
+    saved_state = state_store.load(username)
+    
     with sync_playwright() as p:
         # Launch browser in headless mode for automation
         browser = p.chromium.launch(headless=True)
-        context = browser.new_context()
+        context = browser.new_context(storage_state=saved_state)
+        # Only documents, scripts and XHR/fetch are needed to log in and capture the token
+        resource_blocker = get_resource_blocker()
+        context.route("**/*", resource_blocker.handle)
         page = context.new_page()
+        timer.lap("browser_launch")
+        
+        # Capture the Bearer token from the first JMAP call the web app makes, from the start
+        bearer_token = None
+        user_id = None
+        account_id = None
+        
+        def handle_request(request):
+            nonlocal bearer_token, user_id
+            if is_jmap_call(request) and not bearer_token:
+                # Extract user ID from URL
+                if 'u=' in request.url:
+                    user_id = request.url.split('u=')[1].split('&')[0]
+                
+                # Extract Bearer token
+                bearer_token = request.headers['authorization'].replace('Bearer ', '')
+                
+                print(f"✅ Captured Bearer token: {bearer_token[:20]}...")
+                print(f"✅ Captured User ID: {user_id}")
         
-        print("🌐 Navigating to Fastmail...")
-        page.goto("https://app.fastmail.com")
+        def token_captured():
+            return bool(bearer_token and user_id)
         
-        if username and password:
+        page.on('request', handle_request)
+        
+        restored = False
+        if saved_state:
+            print("♻️  Restoring saved browser session...")
+            restored = restore_saved_session(page)
+            timer.lap("restore")
+            if not restored:
+                print("🔐 Saved session rejected, logging in...")
+                state_store.discard(username)
+        
+        if not restored:
+            print("🌐 Navigating to Fastmail...")
+            page.goto("https://app.fastmail.com")
+        
+        if restored:
+            print("✅ Logged in from saved session")
+        elif username and password:
             print("🔐 Attempting automatic login...")
             try:
                 # Wait for login form to appear
@@ -161,36 +249,13 @@ def create_alias_with_playwright(alias_email, target_email, description="", user
                             except:
                                 print("⚠️  Enter key failed too")
                         
-                        # Wait for login processing to start
-                        print("⏳ Waiting for login to process...")
-                        page.wait_for_timeout(1000)  # Brief wait to allow login to initiate
-                        
-                        # Wait for login to complete
+                        # The web app's first authenticated JMAP call means the login went through
                         print("⏳ Waiting for login to complete...")
-                        try:
-                            page.wait_for_url("**/app.fastmail.com/**", timeout=15000)
+                        timer.lap("login")
+                        if wait_for_jmap_call(page, token_captured, timeout=20000):
                             print("✅ Login successful!")
-                        except:
-                            print("⚠️  URL didn't change, but continuing - login might still be successful...")
-                        
-                        # Wait for session to be established with balanced timing
-                        print("⏳ Waiting for session to be established...")
-                        
-                        # Initial wait for session to settle
-                        page.wait_for_timeout(2500)  # Conservative wait for session
-                        
-                        # Check cookie count
-                        cookies = context.cookies()
-                        fastmail_cookies = [c for c in cookies if '.fastmail.com' in c['domain'] or 'app.fastmail.com' in c['domain']]
-                        
-                        if len(fastmail_cookies) >= 2:
-                            print(f"✅ Session ready with {len(fastmail_cookies)} cookies")
                         else:
-                            print(f"⚠️  Only {len(fastmail_cookies)} cookies found, adding extra wait...")
-                            page.wait_for_timeout(2000)  # Extra wait if needed
-                            cookies = context.cookies()
-                            fastmail_cookies = [c for c in cookies if '.fastmail.com' in c['domain'] or 'app.fastmail.com' in c['domain']]
-                            print(f"📊 Final cookie count: {len(fastmail_cookies)}")
+                            print("⚠️  No JMAP call after login yet, but continuing - login might still be successful...")
                     else:
                         print("⚠️  Could not find password field, please complete login manually...")
                         print("⏳ Press Enter here when you're logged in and on the main Fastmail page...")
@@ -214,8 +279,25 @@ def create_alias_with_playwright(alias_email, target_email, description="", user
         
         print("🔍 Extracting session data...")
         
-        # Give a moment for any final session setup
-        page.wait_for_timeout(1000)
+        # Usually captured already during restore/login; otherwise open the aliases page,
+        # which always talks to the JMAP API
+        print("⏳ Waiting for Bearer token capture...")
+        if not token_captured():
+            print("🔗 Opening aliases page to trigger a JMAP call...")
+            try:
+                with page.expect_request(is_jmap_call, timeout=10000):
+                    page.goto("https://app.fastmail.com/settings/aliases", wait_until="commit")
+            except Exception:
+                print("⚠️  Couldn't load aliases page, trying alternative method...")
+                # Try making any action that triggers an API call
+                page.evaluate("window.location.reload()")
+                wait_for_jmap_call(page, token_captured, timeout=10000)
+        
+        if token_captured():
+            print("✅ Bearer token captured successfully!")
+        else:
+            print("⚠️  Bearer token not captured, will try to proceed...")
+        timer.lap("token_capture")
         
         # Extract cookies
         cookies_dict = {}
@@ -226,63 +308,6 @@ def create_alias_with_playwright(alias_email, target_email, description="", user
         
         print(f"🍪 Found {len(cookies_dict)} cookies")
         
-        # Navigate to trigger a JMAP API call to get the Bearer token
-        print("🔗 Making a request to extract Bearer token...")
-        
-        # Set up request interception to capture the Bearer token
-        bearer_token = None
-        user_id = None
-        account_id = None
-        
-        def handle_request(request):
-            nonlocal bearer_token, user_id, account_id
-            if 'api.fastmail.com/jmap/api/' in request.url:
-                # Extract user ID from URL
-                if 'u=' in request.url:
-                    user_id = request.url.split('u=')[1].split('&')[0]
-                
-                # Extract Bearer token
-                auth_header = request.headers.get('authorization', '')
-                if auth_header.startswith('Bearer '):
-                    bearer_token = auth_header.replace('Bearer ', '')
-                
-                print(f"✅ Captured Bearer token: {bearer_token[:20]}...")
-                print(f"✅ Captured User ID: {user_id}")
-        
-        page.on('request', handle_request)
-        
-        # Wait for Bearer token capture with timeout
-        bearer_captured = False
-        def check_bearer_captured():
-            nonlocal bearer_captured
-            if bearer_token and user_id:
-                bearer_captured = True
-                return True
-            return False
-        
-        # Navigate to aliases page to trigger API calls
-        try:
-            page.goto("https://app.fastmail.com/settings/aliases")
-            # Wait for page to load (domcontentloaded is more reliable than networkidle)
-            page.wait_for_load_state("domcontentloaded", timeout=8000)
-            page.wait_for_timeout(2000)  # Wait for initial API calls to trigger
-        except:
-            print("⚠️  Couldn't navigate to aliases page, trying alternative method...")
-            # Try making any action that triggers an API call
-            page.evaluate("window.location.reload()")
-            page.wait_for_load_state("domcontentloaded", timeout=5000)
-            page.wait_for_timeout(2000)
-        
-        # Wait for Bearer token to be captured
-        print("⏳ Waiting for Bearer token capture...")
-        for i in range(20):  # Max 10 seconds
-            if bearer_token and user_id:
-                print("✅ Bearer token captured successfully!")
-                break
-            page.wait_for_timeout(500)
-        else:
-            print("⚠️  Bearer token not captured, will try to proceed...")
-        
         # Try to extract account ID from page content or storage
         try:
             # Check if we can get account ID from localStorage or similar
@@ -302,34 +327,47 @@ def create_alias_with_playwright(alias_email, target_email, description="", user
                     return null;
                 }
             """)
-            
-            if not account_id:
-                # Fallback: use the known account ID from the logs
-                account_id = "c75164099"
-                print(f"⚠️  Using fallback account ID: {account_id}")
-            else:
-                print(f"✅ Extracted Account ID: {account_id}")
-                
         except:
-            account_id = "c75164099"  # Fallback
-            print(f"⚠️  Using fallback account ID: {account_id}")
+            account_id = None
+        
+        if not account_id and bearer_token:
+            # Ask the JMAP session resource which account is this login's mail account
+            account_id = fetch_account_id(bearer_token, cookies_dict)
+        
+        if account_id:
+            print(f"✅ Extracted Account ID: {account_id}")
+        else:
+            print("⚠️  Could not determine the account ID")
+        
+        timer.lap("account_id")
+        
+        if bearer_token and user_id:
+            # Next run starts from this session instead of typing credentials
+            state_store.save(username, context.storage_state())
         
         browser.close()
         
-        if not bearer_token or not user_id:
+        if not bearer_token or not user_id or not account_id:
             print("❌ Failed to extract session data. Please try again.")
+            print(f"⏱️  {timer.format()}")
+            print(f"🚫 {resource_blocker.format()}")
             return False
         
         # Now create the alias using the extracted data
         print(f"🎯 Creating alias: {alias_email} -> {target_email}")
-        return create_alias_api(bearer_token, user_id, account_id, cookies_dict, alias_email, target_email, description)
+        with timer.step("api_call"):
+            success = create_alias_api(bearer_token, user_id, account_id, cookies_dict, alias_email, target_email, description)
+        print(f"⏱️  {timer.format()}")
+        print(f"🚫 {resource_blocker.format()}")
+        return success
 
-def create_alias_api(bearer_token, user_id, account_id, cookies, alias_email, target_email, description=""):
-    """Create alias using the JMAP API with extracted session data"""
-    
-    jmap_url = f"https://api.fastmail.com/jmap/api/?u={user_id}"
+JMAP_API_URL = "https://api.fastmail.com/jmap/api/"
+JMAP_SESSION_URL = "https://api.fastmail.com/jmap/session"
+
+def jmap_headers(bearer_token):
+    """Headers the FastMail web app sends with its JMAP calls"""
     
-    headers = {
+    return {
         "Content-Type": "application/json",
         "Accept": "application/json",
         "Authorization": f"Bearer {bearer_token}",
@@ -339,8 +377,29 @@ def create_alias_api(bearer_token, user_id, account_id, cookies, alias_email, ta
         "Sec-Fetch-Mode": "cors",
         "Sec-Fetch-Dest": "empty",
     }
+
+def primary_account_id(session_resource):
+    """The login's mail account ID from a JMAP session resource (None if absent)"""
+    
+    primary_accounts = session_resource.get('primaryAccounts', {})
+    return primary_accounts.get('urn:ietf:params:jmap:mail') or primary_accounts.get('urn:ietf:params:jmap:core')
+
+def fetch_account_id(bearer_token, cookies=None):
+    """Look up the mail account ID of the bearer token's login via the JMAP session resource"""
     
-    payload = {
+    try:
+        response = requests.get(JMAP_SESSION_URL, headers=jmap_headers(bearer_token), cookies=cookies, timeout=15)
+        if response.status_code == 200:
+            return primary_account_id(response.json())
+        print(f"⚠️  JMAP session lookup failed: HTTP {response.status_code}")
+    except Exception as e:
+        print(f"⚠️  JMAP session lookup failed: {e}")
+    return None
+
+def build_alias_payload(account_id, alias_email, target_email, description=""):
+    """JMAP request body for a single Alias/set create"""
+    
+    return {
         "using": [
             "urn:ietf:params:jmap:principals",
             "https://www.fastmail.com/dev/contacts",
@@ -385,6 +444,25 @@ def create_alias_api(bearer_token, user_id, account_id, cookies, alias_email, ta
         "lastActivity": 0,
         "clientVersion": "b457b8b325-5000d76b8ac6ae6b"
     }
+
+def parse_alias_set(result):
+    """(created alias, None) or (None, error) from a JMAP Alias/set response body"""
+    
+    for method_response in result.get('methodResponses', []):
+        if len(method_response) > 1 and method_response[0] == "Alias/set":
+            alias_result = method_response[1]
+            if alias_result.get('created'):
+                return list(alias_result['created'].values())[0], None
+            if alias_result.get('notCreated'):
+                return None, alias_result['notCreated']
+    return None, "Unexpected API response format"
+
+def create_alias_api(bearer_token, user_id, account_id, cookies, alias_email, target_email, description=""):
+    """Create alias using the JMAP API with extracted session data"""
+    
+    jmap_url = f"{JMAP_API_URL}?u={user_id}"
+    headers = jmap_headers(bearer_token)
+    payload = build_alias_payload(account_id, alias_email, target_email, description)
     
     try:
         response = requests.post(jmap_url, json=payload, headers=headers, cookies=cookies)
@@ -428,7 +506,6 @@ if __name__ == "__main__":
         exit(1)
     
     # Get alias details from command line or use defaults for testing
-    import sys
     if len(sys.argv) >= 3:
         alias_email = sys.argv[1]
         target_email = sys.argv[2]
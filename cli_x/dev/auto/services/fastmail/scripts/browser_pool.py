@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+Browser Context Pool for Fastmail Automation
+One long-lived Chromium with a pool of warm, logged-in contexts. Callers check a
+context out, use its captured JMAP session and check it back in, so nobody pays
+for a browser launch + login per alias. New contexts start from the account's
+saved (encrypted) storage_state and only type credentials when it is rejected.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, Callable
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+
+from automated_alias_creation import JMAP_API_URL, JMAP_SESSION_URL, jmap_headers, primary_account_id
+
+# Encrypted storage_state persistence
+sys.path.append(str(Path(__file__).parent.parent.parent.parent / "shared" / "utils"))
+from encrypted_state_store import get_state_store
+from step_timer import StepTimer
+from resource_blocker import get_resource_blocker
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+TOKEN_CAPTURE_TIMEOUT = 15  # seconds
+
+class PooledContext:
+    """A logged-in browser context plus the JMAP session captured from it"""
+
+    def __init__(self, context: BrowserContext, page: Page):
+        self.context = context
+        self.page = page
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+        self.retired = False  # Set by a pool reset; discarded on checkin
+        self.session_data = {
+            'bearer_token': None,
+            'user_id': None,
+            'account_id': None
+        }
+        self._token_captured = asyncio.get_event_loop().create_future()
+        page.on('request', self._capture_session)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+    @property
+    def idle_for(self) -> float:
+        return time.monotonic() - self.last_used
+
+    @property
+    def jmap_url(self) -> str:
+        return f"{JMAP_API_URL}?u={self.session_data['user_id']}"
+
+    def _capture_session(self, request):
+        """Pick the bearer token, user and account IDs off the web app's own JMAP calls"""
+        if 'api.fastmail.com/jmap/api/' not in request.url:
+            return
+        auth_header = request.headers.get('authorization', '')
+        if auth_header.startswith('Bearer '):
+            self.session_data['bearer_token'] = auth_header.replace('Bearer ', '')
+        if 'u=' in request.url:
+            self.session_data['user_id'] = request.url.split('u=')[1].split('&')[0]
+        if not self.session_data['account_id']:
+            try:
+                for call in (request.post_data_json or {}).get('methodCalls', []):
+                    if isinstance(call[1], dict) and call[1].get('accountId'):
+                        self.session_data['account_id'] = call[1]['accountId']
+                        break
+            except Exception:
+                pass
+        if self.session_data['bearer_token'] and self.session_data['user_id'] and not self._token_captured.done():
+            self._token_captured.set_result(True)
+
+    async def wait_for_session(self, timeout: float = TOKEN_CAPTURE_TIMEOUT) -> bool:
+        try:
+            await asyncio.wait_for(asyncio.shield(self._token_captured), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def resolve_account_id(self) -> Optional[str]:
+        """Account ID from the captured calls, else from the JMAP session resource"""
+        if not self.session_data['account_id'] and self.session_data['bearer_token']:
+            try:
+                response = await self.context.request.get(
+                    JMAP_SESSION_URL, headers=jmap_headers(self.session_data['bearer_token']), timeout=15000
+                )
+                if response.ok:
+                    self.session_data['account_id'] = primary_account_id(await response.json())
+            except Exception as e:
+                logger.warning(f"⚠️  JMAP session lookup failed: {e}")
+        return self.session_data['account_id']
+
+    async def export_session(self) -> Dict[str, Any]:
+        """Captured JMAP credentials plus the context's FastMail cookies, for use outside the browser"""
+        await self.resolve_account_id()
+        cookies = await self.context.cookies()
+        return {
+            **self.session_data,
+            'cookies': {
+                cookie['name']: cookie['value']
+                for cookie in cookies
+                if '.fastmail.com' in cookie['domain'] or 'app.fastmail.com' in cookie['domain']
+            },
+            'jmap_url': self.jmap_url
+        }
+
+    async def is_alive(self) -> bool:
+        """Cheap liveness probe: the page still answers and is not on the login screen"""
+        try:
+            if self.page.is_closed():
+                return False
+            await asyncio.wait_for(self.page.evaluate("1"), 5)
+            return 'login' not in self.page.url
+        except Exception:
+            return False
+
+    async def close(self):
+        try:
+            await self.context.close()
+        except Exception:
+            pass
+
+class BrowserContextPool:
+    """
+    Pool of warm, logged-in browser contexts on one shared Chromium
+
+    checkout() hands out the most recently used idle context, or logs a new one in
+    while fewer than `size` exist, or waits for a checkin. A background reaper
+    evicts contexts idle longer than `max_idle_seconds` (down to `min_idle`),
+    recycles ones older than `max_age_seconds`, drops ones that fail a liveness
+    probe, and tops the pool back up to `min_idle` warm contexts.
+    """
+
+    def __init__(self, username: str, password: str, size: int = 2, min_idle: int = 1,
+                 max_idle_seconds: int = 300, max_age_seconds: int = 90 * 60,
+                 health_interval: int = 60, step_observer: Optional[Callable[[Dict[str, float]], None]] = None):
+        self.username = username
+        self.password = password
+        self.size = size
+        self.min_idle = min(min_idle, size)
+        self.max_idle_seconds = max_idle_seconds
+        self.max_age_seconds = max_age_seconds
+        self.health_interval = health_interval
+
+        self.state_store = get_state_store()
+        self.resource_blocker = get_resource_blocker()
+        self.playwright = None
+        self.browser: Optional[Browser] = None
+        self._idle: List[PooledContext] = []
+        self._in_use: set = set()
+        self._creating = 0
+        self._probing: List[PooledContext] = []  # Idle contexts taken out by the reaper for inspection
+        self._cond = asyncio.Condition()
+        self._reaper_task = None
+        self._closing = False
+        self.stats = {
+            'created': 0, 'restored': 0, 'checkouts': 0, 'reused': 0, 'evicted_idle': 0, 'recycled': 0,
+            'unhealthy': 0, 'login_failures': 0, 'checkout_wait_seconds': 0.0
+        }
+        self.last_create_steps: Dict[str, float] = {}  # Step timings of the newest context
+        self.step_observer = step_observer  # Called with the step timings of every new context
+
+    async def start(self, browser: Optional[Browser] = None) -> bool:
+        """
+        Launch the shared browser (or use `browser`, owned by the caller, e.g. one Chromium
+        for several accounts' pools) and log in the first `min_idle` contexts
+        """
+        logger.info("🚀 Starting browser context pool...")
+        if browser:
+            self.browser = browser
+        else:
+            try:
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(
+                    headless=True,
+                    args=['--no-sandbox', '--disable-dev-shm-usage']
+                )
+            except Exception as e:
+                logger.error(f"❌ Browser launch failed: {e}")
+                await self.close()
+                return False
+
+        await self._top_up()
+        self._reaper_task = asyncio.create_task(self._reaper())
+        logger.info(f"✅ Browser pool ready ({len(self._idle)} warm / {self.size} max)")
+        return True
+
+    async def close(self):
+        """Close every context and the browser"""
+        self._closing = True
+        if self._reaper_task:
+            self._reaper_task.cancel()
+        async with self._cond:
+            contexts = self._idle + list(self._in_use) + self._probing
+            self._idle, self._in_use = [], set()
+            self._cond.notify_all()
+        for pooled in contexts:
+            await pooled.close()
+        if self.playwright:  # Only close the browser this pool launched itself
+            if self.browser:
+                await self.browser.close()
+            await self.playwright.stop()
+        self.browser = self.playwright = None
+
+    async def reset(self):
+        """Drop every idle context; in-use ones are discarded on checkin"""
+        async with self._cond:
+            contexts, self._idle = self._idle, []
+            for pooled in list(self._in_use) + self._probing:
+                pooled.retired = True
+        for pooled in contexts:
+            await pooled.close()
+        await self._top_up()
+
+    # ─── Checkout / checkin ───────────────────────────────────────────────────
+    def _total(self) -> int:
+        return len(self._idle) + len(self._in_use) + self._creating + len(self._probing)
+
+    def _expired(self, pooled: PooledContext) -> bool:
+        return pooled.retired or pooled.age > self.max_age_seconds
+
+    async def checkout(self, timeout: float = 60) -> PooledContext:
+        """Borrow a logged-in context, creating one if the pool has room"""
+        if not self.browser:
+            raise RuntimeError("Browser pool not started")
+        start_time = time.monotonic()
+        stale = []
+        try:
+            async with self._cond:
+                while True:
+                    while self._idle:
+                        pooled = self._idle.pop()  # LIFO: the warmest context
+                        if self._expired(pooled):
+                            stale.append(pooled)
+                            self.stats['recycled'] += 1
+                            continue
+                        self._lease(pooled, start_time)
+                        self.stats['reused'] += 1
+                        return pooled
+                    if self._total() < self.size:
+                        self._creating += 1
+                        break
+                    remaining = timeout - (time.monotonic() - start_time)
+                    if remaining <= 0:
+                        raise TimeoutError(f"No browser context free after {timeout}s")
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(f"No browser context free after {timeout}s")
+        finally:
+            for pooled in stale:
+                await pooled.close()
+
+        try:
+            pooled = await self._create()
+        finally:
+            async with self._cond:
+                self._creating -= 1
+                self._cond.notify()
+        async with self._cond:
+            closing = self._closing
+            if not closing:
+                self._lease(pooled, start_time)
+        if closing:
+            await pooled.close()
+            raise RuntimeError("Browser pool closed")
+        return pooled
+
+    def _lease(self, pooled: PooledContext, start_time: float):
+        self._in_use.add(pooled)
+        pooled.uses += 1
+        self.stats['checkouts'] += 1
+        self.stats['checkout_wait_seconds'] += time.monotonic() - start_time
+
+    async def checkin(self, pooled: PooledContext, healthy: bool = True):
+        """Return a context; unhealthy or expired ones are closed instead of pooled"""
+        async with self._cond:
+            self._in_use.discard(pooled)
+            keep = healthy and not self._closing and not self._expired(pooled)
+            if keep:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            elif not healthy:
+                self.stats['unhealthy'] += 1
+            self._cond.notify()
+        if not keep:
+            await pooled.close()
+
+    @asynccontextmanager
+    async def acquire(self, timeout: float = 60):
+        """`async with pool.acquire() as pooled:` — failures inside discard the context"""
+        pooled = await self.checkout(timeout)
+        healthy = True
+        try:
+            yield pooled
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            await self.checkin(pooled, healthy)
+
+    # ─── Context lifecycle ────────────────────────────────────────────────────
+    async def _create(self) -> PooledContext:
+        """New logged-in context with its JMAP session captured; saved state first, login if rejected"""
+        timer = StepTimer()
+        loop = asyncio.get_event_loop()
+        # Decrypting may need a YubiKey touch the first time; keep it off the event loop
+        state = await loop.run_in_executor(None, self.state_store.load, self.username)
+
+        if state:
+            with timer.step("new_context"):
+                pooled = PooledContext(*await self._new_context(state))
+            with timer.step("restore"):
+                restored = await self._restore(pooled)
+            if restored:
+                self.stats['restored'] += 1
+                logger.info(f"♻️  Pooled context restored from saved state ({timer.format()})")
+                await self._save_state(pooled)
+                self._record_steps(timer)
+                return pooled
+            logger.info("🔐 Saved browser state rejected, logging in")
+            await pooled.close()
+            await loop.run_in_executor(None, self.state_store.discard, self.username)
+
+        with timer.step("new_context"):
+            pooled = PooledContext(*await self._new_context())
+        try:
+            with timer.step("login"):
+                await self._login(pooled.page)
+            with timer.step("token_capture"):
+                # The first JMAP call after submitting doubles as the login confirmation
+                if not await pooled.wait_for_session(TOKEN_CAPTURE_TIMEOUT):
+                    # The mail view normally calls JMAP at once; the aliases page always does
+                    await pooled.page.goto("https://app.fastmail.com/settings/aliases",
+                                           wait_until="commit", timeout=15000)
+                    if not await pooled.wait_for_session(TOKEN_CAPTURE_TIMEOUT):
+                        raise RuntimeError("Bearer token not captured")
+        except Exception:
+            self.stats['login_failures'] += 1
+            await pooled.close()
+            raise
+
+        self.stats['created'] += 1
+        logger.info(f"🔑 New pooled context logged in ({timer.format()})")
+        await self._save_state(pooled)
+        self._record_steps(timer)
+        return pooled
+
+    def _record_steps(self, timer: StepTimer):
+        self.last_create_steps = timer.summary()
+        if self.step_observer:
+            self.step_observer(self.last_create_steps)
+
+    async def _new_context(self, state: Optional[Dict[str, Any]] = None):
+        context = await self.browser.new_context(storage_state=state)
+        # Only documents, scripts and XHR/fetch are needed to log in and capture the token
+        await context.route("**/*", self.resource_blocker.handle_async)
+        return context, await context.new_page()
+
+    async def _restore(self, pooled: PooledContext) -> bool:
+        """
+        One check for a restored context: open the mail view and see whether the app's
+        first authenticated JMAP call or the login form shows up first
+        """
+        try:
+            await pooled.page.goto("https://app.fastmail.com/mail/", wait_until="commit", timeout=15000)
+        except Exception:
+            return False
+        token = asyncio.ensure_future(pooled.wait_for_session(TOKEN_CAPTURE_TIMEOUT))
+        login_form = asyncio.ensure_future(
+            pooled.page.wait_for_selector('input[name="username"]', timeout=TOKEN_CAPTURE_TIMEOUT * 1000)
+        )
+        done, pending = await asyncio.wait({token, login_form}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        if login_form in done:
+            login_form.exception()  # Retrieved so a selector timeout is not reported as unhandled
+        return token in done and token.result()
+
+    async def _save_state(self, pooled: PooledContext):
+        try:
+            state = await pooled.context.storage_state()
+            await asyncio.get_event_loop().run_in_executor(None, self.state_store.save, self.username, state)
+        except Exception as e:
+            logger.warning(f"⚠️  Could not save browser state: {e}")
+
+    async def _login(self, page: Page):
+        await page.goto("https://app.fastmail.com", timeout=30000)
+        await page.wait_for_selector('input[name="username"], input[type="email"]', timeout=15000)
+        await page.fill('input[name="username"]', self.username)
+        await page.click('button:has-text("Continue")')
+        await page.wait_for_selector('input[type="password"]', timeout=10000)
+        await page.fill('input[type="password"]', self.password)
+        await page.click('button[type="submit"]')
+
+    async def _top_up(self):
+        """Log in contexts concurrently until `min_idle` are idle (bounded by `size`)"""
+        async with self._cond:
+            needed = min(self.min_idle - len(self._idle), self.size - self._total())
+            if needed <= 0 or self._closing:
+                return
+            self._creating += needed
+
+        results = await asyncio.gather(*(self._create() for _ in range(needed)), return_exceptions=True)
+        stray = []
+        async with self._cond:
+            self._creating -= needed
+            for result in results:
+                if not isinstance(result, PooledContext):
+                    logger.warning(f"⚠️  Could not warm a context: {result}")
+                elif self._closing:  # close() ran while these were logging in
+                    stray.append(result)
+                else:
+                    self._idle.insert(0, result)
+            self._cond.notify_all()
+        for pooled in stray:
+            await pooled.close()
+
+    async def _reaper(self):
+        """Idle eviction, max-age recycling, liveness probes and warm top-up"""
+        while not self._closing:
+            try:
+                await asyncio.sleep(self.health_interval)
+                async with self._cond:
+                    # Still counted toward `size` (and retired by reset()) while out of _idle
+                    candidates, self._idle = self._idle, []
+                    self._probing = candidates
+
+                keep, drop = [], []
+                try:
+                    for pooled in reversed(candidates):  # Warmest first, so those are the ones kept
+                        if self._expired(pooled):
+                            self.stats['recycled'] += 1
+                            drop.append(pooled)
+                        elif pooled.idle_for > self.max_idle_seconds and len(keep) >= self.min_idle:
+                            self.stats['evicted_idle'] += 1
+                            drop.append(pooled)
+                        elif not await pooled.is_alive():
+                            self.stats['unhealthy'] += 1
+                            drop.append(pooled)
+                        else:
+                            keep.append(pooled)
+                finally:
+                    keep += [pooled for pooled in reversed(candidates) if pooled not in keep and pooled not in drop]
+                    async with self._cond:
+                        if self._closing:
+                            drop, keep = drop + keep, []
+                        # reset() may have retired some while they were being probed
+                        retired = [pooled for pooled in keep if self._expired(pooled)]
+                        self.stats['recycled'] += len(retired)
+                        keep = [pooled for pooled in keep if pooled not in retired]
+                        drop += retired
+                        # Anything checked in meanwhile stays on top
+                        self._idle = keep[::-1] + self._idle
+                        self._probing = []
+                        self._cond.notify_all()
+                for pooled in drop:
+                    await pooled.close()
+                if drop:
+                    logger.info(f"♻️  Browser pool dropped {len(drop)} context(s)")
+                await self._top_up()
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Browser pool reaper error: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'size': self.size,
+            'idle': len(self._idle),
+            'in_use': len(self._in_use),
+            'creating': self._creating,
+            'browser_active': self.browser is not None,
+            **self.stats,
+            'checkout_wait_seconds': round(self.stats['checkout_wait_seconds'], 3),
+            'last_create_steps': self.last_create_steps,
+            'resource_blocking': self.resource_blocker.get_stats()
+        }
@@ -9,14 +9,20 @@ import logging
 import requests
 import json
 import os
+import sys
 from datetime import datetime
 from typing import Dict, Any
 from pathlib import Path
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent.parent / ".env")  # Load from Y/.env
 
+# Shared adaptive rate limiter
+sys.path.append(str(Path(__file__).parent.parent.parent.parent / "shared" / "utils"))
+from rate_limiter import get_scheduler
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -144,10 +150,9 @@ class OptimizedAliasCreator:
             "Sec-Fetch-Dest": "empty",
         }
         
-        # Run request in thread pool to avoid blocking async event loop
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None, 
+        # Run request in thread pool via the shared per-host limiter (retries 429/503 after Retry-After)
+        response = await get_scheduler().request_async(
+            urlparse(jmap_url).netloc,
             lambda: requests.post(jmap_url, json=payload, headers=headers, cookies=cookies, timeout=30)
         )
         
@@ -207,29 +212,30 @@ async def create_alias_fast(session_manager, alias_email: str, target_email: str
     creator = OptimizedAliasCreator(session_manager)
     return await creator.create_alias(alias_email, target_email, description)
 
-async def batch_create_aliases(session_manager, aliases_list: list) -> list:
-    """Create multiple aliases in batch using persistent session"""
+async def batch_create_aliases(session_manager, aliases_list: list, concurrency: int = 8) -> list:
+    """Create multiple aliases concurrently using persistent session (paced by the shared rate limiter)"""
     creator = OptimizedAliasCreator(session_manager)
-    results = []
+    total = len(aliases_list)
     
-    logger.info(f"🚀 Starting batch creation of {len(aliases_list)} aliases...")
+    logger.info(f"🚀 Starting batch creation of {total} aliases (concurrency {concurrency})...")
     
-    for i, alias_data in enumerate(aliases_list, 1):
-        alias_email = alias_data['alias_email']
-        target_email = alias_data['target_email'] 
-        description = alias_data.get('description', '')
-        
-        logger.info(f"📧 [{i}/{len(aliases_list)}] Creating: {alias_email}")
-        
-        result = await creator.create_alias(alias_email, target_email, description)
-        results.append(result)
-        
-        # Small delay between requests to be respectful
-        if i < len(aliases_list):
-            await asyncio.sleep(0.5)
+    def make_call(i, alias_data):
+        async def call():
+            logger.info(f"📧 [{i}/{total}] Creating: {alias_data['alias_email']}")
+            return await creator.create_alias(
+                alias_data['alias_email'],
+                alias_data['target_email'],
+                alias_data.get('description', '')
+            )
+        return call
+    
+    results = await get_scheduler().gather(
+        [make_call(i, alias_data) for i, alias_data in enumerate(aliases_list, 1)],
+        concurrency=concurrency
+    )
     
     successful = sum(1 for r in results if r['success'])
-    logger.info(f"✅ Batch complete: {successful}/{len(aliases_list)} aliases created successfully")
+    logger.info(f"✅ Batch complete: {successful}/{total} aliases created successfully")
     
     return results
 
@@ -11,22 +11,37 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from playwright.async_api import async_playwright, Browser, BrowserContext, Page
 import json
-import time
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent.parent / ".env")  # Load from Y/.env
 
+from automated_alias_creation import JMAP_API_URL, JMAP_SESSION_URL, jmap_headers, primary_account_id
+
+# Encrypted storage_state persistence
+sys.path.append(str(Path(__file__).parent.parent.parent.parent / "shared" / "utils"))
+from encrypted_state_store import get_state_store
+from step_timer import StepTimer
+from resource_blocker import get_resource_blocker
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Constants
+MAX_CHECK_INTERVAL = 5 * 60  # Healthy sessions are probed less often, up to this
+ECHO_PROBE_TIMEOUT = 10000  # ms
+
 class PersistentSessionManager:
-    def __init__(self, username: str, password: str, check_interval: int = 30):
+    def __init__(self, username: str, password: str, check_interval: int = 30,
+                 max_check_interval: int = MAX_CHECK_INTERVAL):
         self.username = username
         self.password = password
         self.check_interval = check_interval  # seconds between health checks
+        self.max_check_interval = max_check_interval
+        self._next_check_interval = check_interval  # doubles after each healthy check
         
         # Browser components
         self.playwright = None
@@ -38,7 +53,7 @@ class PersistentSessionManager:
         self.session_data = {
             'bearer_token': None,
             'user_id': None,
-            'account_id': 'c75164099',  # Fallback account ID
+            'account_id': None,  # From the app's JMAP calls, else the JMAP session resource
             'cookies': {},
             'login_time': None,
             'last_activity': None,
@@ -50,6 +65,20 @@ class PersistentSessionManager:
         self.last_health_check = None
         self.session_failure_count = 0
         self.max_session_failures = 3
+        self.health_stats = {'api_probes': 0, 'api_probe_failures': 0, 'page_fallbacks': 0}
+        
+        # Set by the request interceptor once a bearer token + user ID have been seen
+        self._token_captured = asyncio.Event()
+        
+        # Seconds spent in each step of the last launch/login (browser_launch, restore, login, ...)
+        self.step_timings: Dict[str, float] = {}
+        
+        # Aborts images/fonts/media/beacons; health checks navigate too, so this adds up
+        self.resource_blocker = get_resource_blocker()
+        
+        # Saved (encrypted) storage_state, restored into the context when present
+        self.state_store = get_state_store()
+        self._saved_state = None
         
         # Background task management
         self._health_monitor_task = None
@@ -111,15 +140,21 @@ class PersistentSessionManager:
         try:
             logger.info("🌐 Initializing persistent browser...")
             
-            self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-dev-shm-usage']
+            timer = StepTimer(self.step_timings)
+            with timer.step("browser_launch"):
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(
+                    headless=True,
+                    args=['--no-sandbox', '--disable-dev-shm-usage']
+                )
+            # Decrypting may need a YubiKey touch the first time; keep it off the event loop
+            self._saved_state = await asyncio.get_event_loop().run_in_executor(
+                None, self.state_store.load, self.username
             )
-            self.context = await self.browser.new_context()
+            self.context = await self.browser.new_context(storage_state=self._saved_state)
             self.page = await self.context.new_page()
             
-            # Set up request interception for token capture
+            # Set up request interception for token capture and resource blocking
             await self.page.route("**/*", self._intercept_requests)
             
             logger.info("✅ Browser initialized successfully")
@@ -131,80 +166,152 @@ class PersistentSessionManager:
     
     async def _intercept_requests(self, route):
         """Intercept requests to capture session data"""
-        request = route.request
-        
         try:
-            if 'api.fastmail.com/jmap/api/' in request.url:
-                # Extract user ID from URL
-                if 'u=' in request.url:
-                    user_id = request.url.split('u=')[1].split('&')[0]
-                    if user_id != self.session_data['user_id']:
-                        self.session_data['user_id'] = user_id
-                        logger.info(f"🆔 Updated User ID: {user_id}")
-                
-                # Extract Bearer token
-                auth_header = request.headers.get('authorization', '')
-                if auth_header.startswith('Bearer '):
-                    new_token = auth_header.replace('Bearer ', '')
-                    if new_token != self.session_data['bearer_token']:
-                        self.session_data['bearer_token'] = new_token
-                        self.session_data['last_activity'] = datetime.now()
-                        self.session_data['token_refresh_count'] += 1
-                        logger.info(f"🔑 Token refreshed #{self.session_data['token_refresh_count']}: {new_token[:20]}...")
-            
+            self._capture_session(route.request)
+            if self.resource_blocker.should_block(route.request):
+                await route.abort("blockedbyclient")
+                return
             await route.continue_()
             
         except Exception as e:
             logger.warning(f"⚠️  Request interception error: {e}")
             await route.continue_()
     
+    def _capture_session(self, request):
+        """Take the user ID and bearer token from a JMAP API request"""
+        if 'api.fastmail.com/jmap/api/' not in request.url:
+            return
+        
+        # Extract user ID from URL
+        if 'u=' in request.url:
+            user_id = request.url.split('u=')[1].split('&')[0]
+            if user_id != self.session_data['user_id']:
+                self.session_data['user_id'] = user_id
+                logger.info(f"🆔 Updated User ID: {user_id}")
+        
+        # Extract account ID from the app's own method calls
+        if not self.session_data['account_id']:
+            try:
+                for call in (request.post_data_json or {}).get('methodCalls', []):
+                    if isinstance(call[1], dict) and call[1].get('accountId'):
+                        self.session_data['account_id'] = call[1]['accountId']
+                        logger.info(f"🏷️  Account ID: {self.session_data['account_id']}")
+                        break
+            except Exception:
+                pass
+        
+        # Extract Bearer token
+        auth_header = request.headers.get('authorization', '')
+        if auth_header.startswith('Bearer '):
+            new_token = auth_header.replace('Bearer ', '')
+            if new_token != self.session_data['bearer_token']:
+                self.session_data['bearer_token'] = new_token
+                self.session_data['last_activity'] = datetime.now()
+                self.session_data['token_refresh_count'] += 1
+                logger.info(f"🔑 Token refreshed #{self.session_data['token_refresh_count']}: {new_token[:20]}...")
+        
+        if self.session_data['bearer_token'] and self.session_data['user_id']:
+            self._token_captured.set()
+    
+    async def _restore_session(self) -> bool:
+        """
+        One check for a context restored from saved state: open the mail view and see
+        whether the app's first authenticated JMAP call or the login form shows up first
+        """
+        logger.info("♻️  Restoring saved browser session...")
+        jmap_call = asyncio.ensure_future(self.page.wait_for_request(
+            lambda r: 'api.fastmail.com/jmap/api/' in r.url
+            and r.headers.get('authorization', '').startswith('Bearer '),
+            timeout=15000
+        ))
+        login_form = asyncio.ensure_future(self.page.wait_for_selector('input[name="username"]', timeout=15000))
+        try:
+            await self.page.goto("https://app.fastmail.com/mail/", wait_until="commit", timeout=15000)
+            done, _ = await asyncio.wait({jmap_call, login_form}, return_when=asyncio.FIRST_COMPLETED)
+        except Exception as e:
+            logger.warning(f"⚠️  Could not open saved session: {e}")
+            done = set()
+        finally:
+            for task in (jmap_call, login_form):
+                if not task.done():
+                    task.cancel()
+        
+        if jmap_call in done and not jmap_call.exception():
+            self._capture_session(jmap_call.result())
+            return bool(self.session_data['bearer_token'] and self.session_data['user_id'])
+        if login_form in done:
+            login_form.exception()  # Retrieved so a selector timeout is not reported as unhandled
+        return False
+    
+    async def _save_state(self):
+        """Persist the logged-in storage_state (encrypted) for the next start"""
+        try:
+            state = await self.context.storage_state()
+            await asyncio.get_event_loop().run_in_executor(None, self.state_store.save, self.username, state)
+        except Exception as e:
+            logger.warning(f"⚠️  Could not save browser state: {e}")
+    
     async def _perform_login(self) -> bool:
         """Perform login to Fastmail"""
+        timer = StepTimer()
+        if self._saved_state:
+            with timer.step("restore"):
+                restored = await self._restore_session()
+            self._saved_state = None  # One attempt; refreshes always do a full login
+            if restored:
+                await self._update_session_data()
+                self.is_logged_in = True
+                self.session_failure_count = 0
+                self.last_health_check = datetime.now()
+                logger.info("🎉 Logged in from saved session")
+                await self._save_state()
+                self._record_timings(timer)
+                return True
+            logger.info("🔐 Saved session rejected")
+            await asyncio.get_event_loop().run_in_executor(None, self.state_store.discard, self.username)
+        
         logger.info("🔐 Performing login to Fastmail...")
         
         try:
-            # Navigate to Fastmail
-            await self.page.goto("https://app.fastmail.com", timeout=30000)
-            
-            # Fill username
-            await self.page.wait_for_selector('input[name="username"], input[type="email"]', timeout=15000)
-            await self.page.fill('input[name="username"]', self.username)
-            logger.info("✅ Username filled")
-            
-            # Click Continue
-            await self.page.click('button:has-text("Continue")')
-            logger.info("✅ Continue clicked")
-            
-            # Fill password
-            await self.page.wait_for_selector('input[type="password"]', timeout=10000)
-            await self.page.fill('input[type="password"]', self.password)
-            logger.info("✅ Password filled")
-            
-            # Submit login
-            await self.page.click('button[type="submit"]')
-            logger.info("✅ Login submitted")
-            
-            # Wait for login completion
-            await self.page.wait_for_url("**/app.fastmail.com/**", timeout=20000)
-            logger.info("✅ Login successful!")
+            with timer.step("login"):
+                # Navigate to Fastmail
+                await self.page.goto("https://app.fastmail.com", timeout=30000)
+                
+                # Fill username
+                await self.page.wait_for_selector('input[name="username"], input[type="email"]', timeout=15000)
+                await self.page.fill('input[name="username"]', self.username)
+                logger.info("✅ Username filled")
+                
+                # Click Continue
+                await self.page.click('button:has-text("Continue")')
+                logger.info("✅ Continue clicked")
+                
+                # Fill password
+                await self.page.wait_for_selector('input[type="password"]', timeout=10000)
+                await self.page.fill('input[type="password"]', self.password)
+                logger.info("✅ Password filled")
+                
+                # Submit login
+                await self.page.click('button[type="submit"]')
+                logger.info("✅ Login submitted")
             
-            # Wait for session establishment
-            await asyncio.sleep(3)
+            with timer.step("token_capture"):
+                # The web app's first JMAP calls after login carry the Bearer token
+                if not await self._wait_for_token_capture(timeout=20):
+                    # Still nothing: open a page that always talks to the API
+                    await self._trigger_api_calls()
+                    await self._wait_for_token_capture()
             
             # Update session data
             await self._update_session_data()
             
-            # Trigger API calls to get Bearer token
-            await self._trigger_api_calls()
-            
-            # Wait for token capture
-            await self._wait_for_token_capture()
-            
             self.is_logged_in = True
             self.session_failure_count = 0
             self.last_health_check = datetime.now()
             
             logger.info(f"🎉 Login complete! Session data captured.")
+            await self._save_state()
+            self._record_timings(timer)
             return True
             
         except Exception as e:
@@ -212,8 +319,25 @@ class PersistentSessionManager:
             self.is_logged_in = False
             return False
     
+    async def _resolve_account_id(self):
+        """Ask the JMAP session resource for the account ID if no captured call carried one"""
+        if self.session_data['account_id'] or not self.session_data['bearer_token']:
+            return
+        try:
+            response = await self.context.request.get(
+                JMAP_SESSION_URL, headers=jmap_headers(self.session_data['bearer_token']), timeout=ECHO_PROBE_TIMEOUT
+            )
+            if response.ok:
+                self.session_data['account_id'] = primary_account_id(await response.json())
+                logger.info(f"🏷️  Account ID: {self.session_data['account_id']}")
+            else:
+                logger.warning(f"⚠️  JMAP session lookup failed: HTTP {response.status}")
+        except Exception as e:
+            logger.warning(f"⚠️  JMAP session lookup failed: {e}")
+    
     async def _update_session_data(self):
-        """Update session data with current cookies"""
+        """Update session data with current cookies (and the account ID if still unknown)"""
+        await self._resolve_account_id()
         try:
             cookies = await self.context.cookies()
             self.session_data['cookies'] = {
@@ -232,27 +356,28 @@ class PersistentSessionManager:
         """Navigate to trigger JMAP API calls for Bearer token"""
         try:
             logger.info("🔗 Triggering API calls for Bearer token...")
-            await self.page.goto("https://app.fastmail.com/settings/aliases", timeout=15000)
-            await self.page.wait_for_load_state("domcontentloaded", timeout=10000)
-            await asyncio.sleep(2)  # Wait for API calls
+            # The interceptor picks up the JMAP calls; no need to wait for the page itself
+            await self.page.goto("https://app.fastmail.com/settings/aliases", wait_until="commit", timeout=15000)
             logger.info("✅ API calls triggered")
             
         except Exception as e:
             logger.warning(f"⚠️  Could not trigger API calls: {e}")
     
     async def _wait_for_token_capture(self, timeout: int = 10):
-        """Wait for Bearer token to be captured"""
+        """Wait for the request interceptor to capture the Bearer token"""
         logger.info("⏳ Waiting for Bearer token capture...")
         
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if self.session_data['bearer_token'] and self.session_data['user_id']:
-                logger.info("✅ Bearer token captured successfully!")
-                return True
-            await asyncio.sleep(0.5)
-        
-        logger.warning("⚠️  Token capture timeout")
-        return False
+        try:
+            await asyncio.wait_for(self._token_captured.wait(), timeout)
+            logger.info("✅ Bearer token captured successfully!")
+            return True
+        except asyncio.TimeoutError:
+            logger.warning("⚠️  Token capture timeout")
+            return False
+    
+    def _record_timings(self, timer: StepTimer):
+        self.step_timings.update(timer.summary())
+        logger.info(f"⏱️  {timer.format()}")
     
     async def _background_health_monitor(self):
         """Background task to monitor session health"""
@@ -260,7 +385,7 @@ class PersistentSessionManager:
         
         while self._running:
             try:
-                await asyncio.sleep(self.check_interval)
+                await asyncio.sleep(self._next_check_interval)
                 
                 if not self._running:
                     break
@@ -268,6 +393,12 @@ class PersistentSessionManager:
                 health_status = await self._check_session_health()
                 self.last_health_check = datetime.now()
                 
+                # Back off while the session stays healthy; re-check soon after a failure
+                if health_status:
+                    self._next_check_interval = min(self._next_check_interval * 2, self.max_check_interval)
+                else:
+                    self._next_check_interval = self.check_interval
+                
                 if not health_status:
                     logger.warning("⚠️  Session health check failed!")
                     self.session_failure_count += 1
@@ -332,7 +463,12 @@ class PersistentSessionManager:
                 logger.warning("⚠️  Missing essential session data")
                 return False
             
-            # Try a simple API test (navigate to a page that triggers API calls)
+            # A JMAP Core/echo with the captured token; no page reload
+            if await self._probe_jmap():
+                return True
+            
+            # Fall back to reloading the app, which also lets it hand out a fresh token
+            self.health_stats['page_fallbacks'] += 1
             try:
                 await self.page.goto("https://app.fastmail.com/mail", wait_until="domcontentloaded", timeout=10000)
                 return True
@@ -344,6 +480,29 @@ class PersistentSessionManager:
             logger.warning(f"⚠️  Health check error: {e}")
             return False
     
+    async def _probe_jmap(self) -> bool:
+        """Minimal authenticated JMAP request (Core/echo) through the context's own cookies"""
+        self.health_stats['api_probes'] += 1
+        try:
+            response = await self.context.request.post(
+                f"{JMAP_API_URL}?u={self.session_data['user_id']}",
+                headers=jmap_headers(self.session_data['bearer_token']),
+                data=json.dumps({
+                    "using": ["urn:ietf:params:jmap:core"],
+                    "methodCalls": [["Core/echo", {"ping": "health"}, "0"]]
+                }),
+                timeout=ECHO_PROBE_TIMEOUT
+            )
+            if response.ok:
+                method_responses = (await response.json()).get('methodResponses', [])
+                if method_responses and method_responses[0][0] == "Core/echo":
+                    return True
+            logger.warning(f"⚠️  JMAP echo probe failed: HTTP {response.status}")
+        except Exception as e:
+            logger.warning(f"⚠️  JMAP echo probe error: {e}")
+        self.health_stats['api_probe_failures'] += 1
+        return False
+    
     async def _refresh_session(self):
         """Refresh the session by re-logging"""
         logger.info("🔄 Refreshing session...")
@@ -356,6 +515,7 @@ class PersistentSessionManager:
             self.session_data['bearer_token'] = None
             self.session_data['user_id'] = None
             self.session_data['cookies'] = {}
+            self._token_captured.clear()
             
             # Perform fresh login
             if await self._perform_login():
@@ -386,7 +546,8 @@ class PersistentSessionManager:
         return (
             self.is_logged_in and 
             self.session_data['bearer_token'] and 
-            self.session_data['user_id']
+            self.session_data['user_id'] and
+            self.session_data['account_id']
         )
     
     async def get_session_stats(self) -> Dict[str, Any]:
@@ -403,7 +564,11 @@ class PersistentSessionManager:
             'session_failure_count': self.session_failure_count,
             'cookies_count': len(self.session_data['cookies']),
             'bearer_token_present': bool(self.session_data['bearer_token']),
-            'user_id': self.session_data['user_id']
+            'user_id': self.session_data['user_id'],
+            'next_health_check_seconds': self._next_check_interval,
+            'health_probes': self.health_stats,
+            'step_timings': self.step_timings,
+            'resource_blocking': self.resource_blocker.get_stats()
         }
 
 # Example usage
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+JMAP Session Broker for Fastmail Automation
+Hands out a cached bearer token / user / account / cookies and talks JMAP over a
+pooled HTTP session. The browser pool is only used to mint credentials when none
+are cached, when they are too old, or when the API rejects them.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from automated_alias_creation import jmap_headers, build_alias_payload, parse_alias_set
+from browser_pool import BrowserContextPool
+
+# Shared adaptive rate limiter
+sys.path.append(str(Path(__file__).parent.parent.parent.parent / "shared" / "utils"))
+from rate_limiter import get_scheduler
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+MAX_TOKEN_AGE_SECONDS = 60 * 60  # Re-mint proactively even if the API still accepts it
+HTTP_POOL_SIZE = 16
+
+class SessionExpiredError(Exception):
+    """The JMAP API rejected the brokered credentials"""
+
+class SessionBroker:
+    """
+    Credential cache in front of the browser pool plus a pooled JMAP client
+
+    get_session() returns cached credentials or mints new ones from a pooled
+    context (one mint at a time; concurrent callers wait for it). On 401/403 the
+    credentials are invalidated, the pooled contexts carrying them are retired and the
+    call is retried once with freshly minted ones.
+    """
+
+    def __init__(self, browser_pool: BrowserContextPool, max_token_age: int = MAX_TOKEN_AGE_SECONDS,
+                 http_pool_size: int = HTTP_POOL_SIZE):
+        self.browser_pool = browser_pool
+        self.max_token_age = max_token_age
+        self._session: Optional[Dict[str, Any]] = None
+        self._minted_at = 0.0
+        self._mint_lock = asyncio.Lock()
+
+        # Keep-alive connections shared by every JMAP call (requests' default pool holds 10)
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=http_pool_size)
+        self.http.mount("https://", adapter)
+
+        self.stats = {'mints': 0, 'mint_seconds': 0.0, 'api_calls': 0, 'rejected': 0}
+
+    def _fresh(self) -> bool:
+        return self._session is not None and time.monotonic() - self._minted_at < self.max_token_age
+
+    async def get_session(self) -> Dict[str, Any]:
+        """Current JMAP credentials, minting them from the browser pool if needed"""
+        if self._fresh():
+            return self._session
+        async with self._mint_lock:
+            if not self._fresh():  # Another caller may have minted while we waited
+                await self._mint()
+            return self._session
+
+    async def _mint(self):
+        start_time = time.monotonic()
+        async with self.browser_pool.acquire() as pooled:
+            session = await pooled.export_session()
+        if not session['bearer_token'] or not session['user_id']:
+            raise SessionExpiredError("Browser session has no captured bearer token")
+        if not session['account_id']:
+            raise SessionExpiredError("Could not determine the JMAP account ID")
+        self._session = session
+        self._minted_at = time.monotonic()
+        self.stats['mints'] += 1
+        self.stats['mint_seconds'] += time.monotonic() - start_time
+        logger.info(f"🔑 Minted JMAP session for user {session['user_id']} "
+                    f"({time.monotonic() - start_time:.2f}s)")
+
+    def token_age(self) -> Optional[float]:
+        """Seconds since the cached credentials were minted (None if nothing is cached)"""
+        return time.monotonic() - self._minted_at if self._session else None
+
+    async def refresh(self):
+        """
+        Mint credentials from freshly started contexts ahead of expiry; callers keep
+        using the cached ones until the new ones are in
+        """
+        async with self._mint_lock:
+            await self.browser_pool.reset()
+            await self._mint()
+
+    async def invalidate(self, bearer_token: str):
+        """Drop `bearer_token` (if still current) and the pooled contexts that carry it"""
+        async with self._mint_lock:
+            if self._session and self._session['bearer_token'] == bearer_token:
+                self._session = None
+                await self.browser_pool.reset()
+
+    async def reset(self):
+        """Forget the cached credentials and re-login every pooled context"""
+        async with self._mint_lock:
+            self._session = None
+            await self.browser_pool.reset()
+
+    async def call(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST a JMAP request with brokered credentials; one retry after re-minting on 401/403"""
+        for attempt in range(2):
+            session = await self.get_session()
+            try:
+                return await self._post(session, payload)
+            except SessionExpiredError:
+                self.stats['rejected'] += 1
+                logger.warning("⚠️  JMAP session rejected, re-minting credentials...")
+                await self.invalidate(session['bearer_token'])
+                if attempt:
+                    raise
+
+    async def _post(self, session: Dict[str, Any], payload: Dict[str, Any]) -> Dict[str, Any]:
+        jmap_url = session['jmap_url']
+        headers = jmap_headers(session['bearer_token'])
+        # Blocking send runs in the executor via the shared per-host limiter (retries 429/503)
+        response = await get_scheduler().request_async(
+            urlparse(jmap_url).netloc,
+            lambda: self.http.post(jmap_url, json=payload, headers=headers,
+                                   cookies=session['cookies'], timeout=30)
+        )
+        self.stats['api_calls'] += 1
+        if response.status_code in (401, 403):
+            raise SessionExpiredError(f"HTTP {response.status_code}")
+        if response.status_code != 200:
+            raise Exception(f"HTTP {response.status_code}: {response.text[:200]}")
+        return response.json()
+
+    async def create_alias(self, alias_email: str, target_email: str, description: str = "") -> Dict[str, Any]:
+        """Alias/set over plain HTTP; returns {'success', 'alias_id', 'message'}"""
+        session = await self.get_session()
+        result = await self.call(build_alias_payload(session['account_id'], alias_email, target_email, description))
+        created_alias, error = parse_alias_set(result)
+        if created_alias:
+            return {
+                'success': True,
+                'alias_id': created_alias.get('id'),
+                'message': f'Alias {alias_email} created successfully'
+            }
+        return {'success': False, 'alias_id': None, 'message': f"API error: {error}"}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'mint_seconds': round(self.stats['mint_seconds'], 3),
+            'session_cached': self._session is not None,
+            'session_age_seconds': round(self.token_age(), 1) if self._session else None
+        }
+
+    def close(self):
+        self.http.close()
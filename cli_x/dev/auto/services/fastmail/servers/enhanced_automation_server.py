@@ -4,12 +4,15 @@ Enhanced FastMail Automation Server
 Based on the working server but with session reuse for speed improvement
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
 import uvicorn
 from datetime import datetime
 import asyncio
+import json
+import time
 import logging
 import sys
 import os
@@ -20,78 +23,79 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent.parent / ".env")  # Load from Y/.env
 
-# Import the working sync function
+# Import the working sync function (fallback) and the per-account pools / JMAP session brokers
 sys.path.append(str(Path(__file__).parent.parent / "scripts"))
 from automated_alias_creation import create_alias_with_playwright
+from account_broker import AccountBroker, UnknownAccountError, load_accounts
+from alias_job_queue import AliasJobQueue
+
+# Shared adaptive rate limiter
+sys.path.append(str(Path(__file__).parent.parent.parent.parent / "shared" / "utils"))
+from rate_limiter import get_scheduler
+from resource_blocker import get_resource_blocker
+from metrics import get_registry, request_timing_middleware, record_executor_usage, CONTENT_TYPE
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global browser state for session reuse
-global_browser_session = {
-    'playwright': None,
-    'browser': None,
-    'context': None,
-    'page': None,
-    'last_used': None,
-    'session_count': 0
-}
+# Per account: warm browser contexts that mint JMAP credentials and the broker that caches
+# and uses them (None until started / if the browser could not launch)
+account_broker: AccountBroker = None
+
+# Durable queue every batch goes through (SQLite, survives restarts)
+job_queue: AliasJobQueue = None
+
+# Pool sizing, per account; each context is one logged-in FastMail session
+POOL_SIZE = int(os.getenv("FM_POOL_SIZE", "2"))
+POOL_MIN_IDLE = int(os.getenv("FM_POOL_MIN_IDLE", "1"))
+POOL_MAX_IDLE_SECONDS = int(os.getenv("FM_POOL_MAX_IDLE_SECONDS", "300"))
+POOL_MAX_AGE_SECONDS = int(os.getenv("FM_POOL_MAX_AGE_SECONDS", str(90 * 60)))
+# Aliases in flight at once for parallel batches (API calls, not browsers)
+BATCH_CONCURRENCY = int(os.getenv("FM_BATCH_CONCURRENCY", "8"))
+# Without the pool every job launches its own Chromium; keep that to a couple at a time
+LEGACY_BATCH_CONCURRENCY = int(os.getenv("FM_LEGACY_BATCH_CONCURRENCY", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("FM_JOB_MAX_ATTEMPTS", "3"))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Manage browser session lifecycle"""
-    global global_browser_session
+    """Manage the account broker (browser pools + session brokers) and job queue lifecycle"""
+    global account_broker, job_queue
     
     # Startup
     logger.info("🚀 Starting Enhanced Automation Server...")
-    logger.info("🔄 Session reuse enabled for faster alias creation")
+    account_broker = AccountBroker(
+        ACCOUNTS,
+        pool_size=POOL_SIZE,
+        min_idle=POOL_MIN_IDLE,
+        max_idle_seconds=POOL_MAX_IDLE_SECONDS,
+        max_age_seconds=POOL_MAX_AGE_SECONDS,
+        step_observer=_observe_context_steps
+    )
+    if await account_broker.start():
+        STAGE_SECONDS.observe(account_broker.launch_seconds, stage="browser_launch")
+        logger.info(f"🔄 Browser pools enabled for {len(ACCOUNTS)} accounts ({POOL_SIZE} contexts max each), "
+                    f"aliases via direct JMAP calls")
+    else:
+        logger.warning("⚠️  Browser pools unavailable, falling back to a browser per alias")
+        account_broker = None
+    
+    job_queue = AliasJobQueue(
+        _run_alias_job,
+        workers=BATCH_CONCURRENCY if account_broker else LEGACY_BATCH_CONCURRENCY,
+        max_attempts=JOB_MAX_ATTEMPTS
+    )
+    await job_queue.start()
     
     yield
     
     # Shutdown
     logger.info("🛑 Shutting down Enhanced Automation Server...")
-    await cleanup_browser_session()
+    await job_queue.close()
+    if account_broker:
+        await account_broker.close()
     logger.info("✅ Shutdown complete")
 
-async def cleanup_browser_session():
-    """Clean up browser session resources"""
-    global global_browser_session
-    
-    if global_browser_session['page']:
-        try:
-            await global_browser_session['page'].close()
-        except:
-            pass
-    
-    if global_browser_session['context']:
-        try:
-            await global_browser_session['context'].close()
-        except:
-            pass
-            
-    if global_browser_session['browser']:
-        try:
-            await global_browser_session['browser'].close()
-        except:
-            pass
-            
-    if global_browser_session['playwright']:
-        try:
-            await global_browser_session['playwright'].stop()
-        except:
-            pass
-    
-    # Reset state
-    global_browser_session.update({
-        'playwright': None,
-        'browser': None,
-        'context': None,
-        'page': None,
-        'last_used': None,
-        'session_count': 0
-    })
-
 app = FastAPI(
     title="Enhanced FastMail Automation Server",
     description="Working server with session reuse for speed",
@@ -108,15 +112,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Prometheus-style metrics, served at /metrics
+metrics = get_registry()
+app.middleware("http")(request_timing_middleware(metrics, "fastmail"))
+
 # Request/Response Models
 class CreateAliasRequest(BaseModel):
     alias_email: str
     target_email: str
     description: str = ""
+    account: str = None  # FastMail login to create it in; default: the first configured account
 
 class BatchAliasRequest(BaseModel):
-    aliases: list[dict]  # [{"alias_email": "...", "target_email": "...", "description": "..."}]
+    aliases: list[dict]  # [{"alias_email": "...", "target_email": "...", "description": "...", "account": "..."}]
     processing_mode: str = "sequential"  # "sequential" or "parallel"
+    account: str = None  # Default for items without their own "account"
 
 class ServerStatus(BaseModel):
     status: str
@@ -125,6 +135,10 @@ class ServerStatus(BaseModel):
     version: str
     uptime_seconds: float
     session_reuse_stats: dict
+    browser_pool_stats: dict = {}
+    session_broker_stats: dict = {}
+    job_queue_stats: dict = {}
+    rate_limit_stats: dict = {}
 
 class AliasResponse(BaseModel):
     success: bool
@@ -147,16 +161,31 @@ class BatchAliasResponse(BaseModel):
 
 # Server state
 server_start_time = datetime.now()
-active_tasks = {}
+session_stats = {'alias_count': 0, 'last_used': None}
+
+# Every alias flow drives the FastMail web app; pace them through one per-host bucket
+FASTMAIL_HOST = "app.fastmail.com"
+request_scheduler = get_scheduler()
+
+# Per-stage latency: browser_launch, new_context, restore, login, token_capture,
+# session_mint, api_call, context_create (whole pooled context) and total (per alias)
+STAGE_SECONDS = metrics.histogram("fastmail_stage_seconds", "Duration of alias automation stages", ("stage",))
+ALIASES_TOTAL = metrics.counter("fastmail_aliases_total", "Alias creations by account and outcome",
+                                ("account", "outcome"))
+
+def _observe_context_steps(steps: dict):
+    """Browser pool callback with the step timings of every new context"""
+    for stage, seconds in steps.items():
+        STAGE_SECONDS.observe(seconds, stage="context_create" if stage == "total" else stage)
 
-# Load credentials from environment variables (Infisical format)
-USERNAME = os.getenv("FM_M_0") or os.getenv("FASTMAIL_USERNAME")  # Try Infisical first, then fallback
-PASSWORD = os.getenv("FM_P_0") or os.getenv("FASTMAIL_PASSWORD")  # Try Infisical first, then fallback
+# Load credentials from environment variables (Infisical FM_M_n/FM_P_n pairs first, then fallback)
+ACCOUNTS = load_accounts()
+DEFAULT_ACCOUNT = next(iter(ACCOUNTS), None)
 
 # Validate that credentials are loaded
-if not USERNAME or not PASSWORD:
+if not ACCOUNTS:
     logger.error("❌ FastMail credentials not found in environment variables!")
-    logger.error("Looking for either Infisical secrets (FM_M_0, FM_P_0) or .env variables (FASTMAIL_USERNAME, FASTMAIL_PASSWORD)")
+    logger.error("Looking for either Infisical secrets (FM_M_0, FM_P_0, FM_M_1, FM_P_1, ...) or .env variables (FASTMAIL_USERNAME, FASTMAIL_PASSWORD)")
     logger.error("Available environment variables:")
     for key in sorted(os.environ.keys()):
         if any(x in key.upper() for x in ['FM_', 'FASTMAIL', 'USERNAME', 'PASSWORD']):
@@ -169,119 +198,244 @@ async def root():
         "message": "Enhanced FastMail Automation Server",
         "status": "running",
         "version": "2.5.0",
-        "features": ["session_reuse", "working_logic", "speed_optimization", "batch_processing"],
-        "endpoints": ["/status", "/create-alias", "/batch-create", "/health", "/docs"]
+        "features": ["session_reuse", "browser_pool", "multi_account", "jmap_fast_path", "working_logic", "speed_optimization", "batch_processing"],
+        "endpoints": ["/status", "/create-alias", "/batch-create", "/jobs", "/jobs/{batch_id}", "/jobs/{batch_id}/stream",
+                      "/tasks", "/health", "/metrics", "/docs"]
     }
 
 @app.get("/status", response_model=ServerStatus)
 async def get_status():
     """Get detailed server status"""
     uptime = (datetime.now() - server_start_time).total_seconds()
+    queue_stats = await job_queue.get_stats()
+    broker_stats = account_broker.get_stats() if account_broker else {}
     
     return ServerStatus(
         status="healthy",
         timestamp=datetime.now().isoformat(),
-        message=f"Server running with session reuse, {len(active_tasks)} active tasks",
+        message=f"Server running with session reuse, {queue_stats['queued'] + queue_stats['running']} queued jobs",
         version="2.5.0",
         uptime_seconds=uptime,
         session_reuse_stats={
-            "sessions_created": global_browser_session['session_count'],
-            "last_used": global_browser_session['last_used'].isoformat() if global_browser_session['last_used'] else None,
-            "browser_active": global_browser_session['browser'] is not None
-        }
+            "sessions_created": (sum(pool.stats['created'] for pool in account_broker.pools.values())
+                                 if account_broker else session_stats['alias_count']),
+            "aliases_created": session_stats['alias_count'],
+            "last_used": session_stats['last_used'].isoformat() if session_stats['last_used'] else None,
+            "browser_active": account_broker is not None,
+            "accounts": list(ACCOUNTS)
+        },
+        browser_pool_stats=broker_stats['pools'] if account_broker else {},
+        session_broker_stats={**broker_stats['brokers'], 'refreshes': broker_stats['refreshes'],
+                              'refresh_failures': broker_stats['refresh_failures']} if account_broker else {},
+        job_queue_stats=queue_stats,
+        rate_limit_stats=request_scheduler.stats()
     )
 
+async def _refresh_metrics():
+    """Copy pool, broker, queue, rate limiter and executor state into the registry"""
+    if account_broker:
+        contexts = metrics.gauge("fastmail_pool_contexts", "Pooled browser contexts by state", ("account", "state"))
+        pool_size = metrics.gauge("fastmail_pool_size", "Maximum pooled browser contexts", ("account",))
+        pool_events = metrics.counter("fastmail_pool_events_total", "Browser pool lifecycle events",
+                                      ("account", "event"))
+        for account, pool in account_broker.pools.items():
+            stats = pool.get_stats()
+            pool_size.set(stats['size'], account=account)
+            for state in ('idle', 'in_use', 'creating'):
+                contexts.set(stats[state], account=account, state=state)
+            for event in ('created', 'restored', 'checkouts', 'reused', 'evicted_idle', 'recycled',
+                          'unhealthy', 'login_failures'):
+                pool_events.set_total(stats[event], account=account, event=event)
+        
+        mints = metrics.counter("fastmail_session_mints_total", "JMAP credentials minted", ("account",))
+        rejected = metrics.counter("fastmail_session_rejected_total", "Brokered API calls rejected as unauthorized",
+                                   ("account",))
+        api_calls = metrics.counter("fastmail_jmap_api_calls_total", "Direct JMAP API calls", ("account",))
+        for account, broker in account_broker.brokers.items():
+            mints.set_total(broker.stats['mints'], account=account)
+            rejected.set_total(broker.stats['rejected'], account=account)
+            api_calls.set_total(broker.stats['api_calls'], account=account)
+        refreshes = metrics.counter("fastmail_session_refreshes_total", "Background credential refreshes", ("outcome",))
+        refreshes.set_total(account_broker.stats['refreshes'], outcome="success")
+        refreshes.set_total(account_broker.stats['refresh_failures'], outcome="failure")
+    
+    queue_stats = await job_queue.get_stats()
+    queue_jobs = metrics.gauge("fastmail_job_queue_jobs", "Jobs in the durable queue by status", ("status",))
+    for status in ('queued', 'running'):
+        queue_jobs.set(queue_stats[status], status=status)
+    metrics.gauge("fastmail_job_queue_workers", "Job queue worker tasks").set(queue_stats['workers'])
+    metrics.counter("fastmail_job_retries_total", "Job attempts retried after an error").set_total(queue_stats['retries'])
+    processed = metrics.counter("fastmail_jobs_total", "Finished jobs by outcome", ("outcome",))
+    for outcome in ('succeeded', 'failed', 'deduplicated', 'recovered'):
+        processed.set_total(queue_stats[outcome], outcome=outcome)
+    
+    requests_total = metrics.counter("fastmail_rate_limited_requests_total", "Requests paced by the rate limiter",
+                                     ("host",))
+    throttled = metrics.counter("fastmail_throttled_responses_total", "Throttled (429/503) responses", ("host",))
+    rate = metrics.gauge("fastmail_rate_limit_per_second", "Current adaptive request rate", ("host",))
+    for host, stats in request_scheduler.stats().items():
+        requests_total.set_total(stats['requests'], host=host)
+        throttled.set_total(stats['throttled'], host=host)
+        rate.set(stats['rate_per_second'], host=host)
+    
+    blocker_stats = get_resource_blocker().get_stats()
+    metrics.counter("fastmail_blocked_resources_total", "Browser requests aborted by the resource blocker").set_total(
+        blocker_stats['blocked'])
+    
+    record_executor_usage(metrics, "fastmail")
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text exposition of latency histograms, pool/queue state and counters"""
+    await _refresh_metrics()
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
     """Simple health check"""
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
-@app.post("/create-alias", response_model=AliasResponse)
-async def create_alias_endpoint(request: CreateAliasRequest):
-    """Create alias using working logic with potential session reuse"""
-    
-    task_id = f"alias_{int(datetime.now().timestamp())}"
-    logger.info(f"[{task_id}] Creating alias: {request.alias_email} -> {request.target_email}")
-    
+def _resolve_account(account: str = None) -> str:
+    """Configured account for a request (default account when None); UnknownAccountError otherwise"""
+    if not account:
+        return DEFAULT_ACCOUNT
+    if account not in ACCOUNTS:
+        raise UnknownAccountError(f"Unknown account: {account}")
+    return account
+
+async def _create_alias(alias_email: str, target_email: str, description: str = "", account: str = None) -> dict:
+    """
+    Create one alias in `account` with a direct JMAP call on that account's brokered
+    credentials (falls back to a fresh browser per alias if the pools are unavailable).
+    Returns the per-alias result dict used by every endpoint.
+    """
     start_time = datetime.now()
+    account = _resolve_account(account)
     
-    try:
-        # Run the working sync Playwright function in thread pool
+    if account_broker:
+        session_broker = account_broker.broker(account)
+        mints_before = session_broker.stats['mints']
+        mint_seconds_before = session_broker.stats['mint_seconds']
+        call_start = time.perf_counter()
+        result = await session_broker.create_alias(alias_email, target_email, description)
+        session_reused = session_broker.stats['mints'] == mints_before
+        mint_seconds = 0.0 if session_reused else session_broker.stats['mint_seconds'] - mint_seconds_before
+        if not session_reused:
+            STAGE_SECONDS.observe(mint_seconds, stage="session_mint")
+        STAGE_SECONDS.observe(max(0.0, time.perf_counter() - call_start - mint_seconds), stage="api_call")
+    else:
+        # Each of these drives the web app; pace them through the app host's bucket
+        await request_scheduler.wait_async(FASTMAIL_HOST)
         loop = asyncio.get_event_loop()
         
+        step_timings = {}
+        
         def run_playwright_task():
             """Wrapper function to run in thread pool"""
             return create_alias_with_playwright(
-                alias_email=request.alias_email,
-                target_email=request.target_email,
-                description=request.description,
-                username=USERNAME,
-                password=PASSWORD
+                alias_email=alias_email,
+                target_email=target_email,
+                description=description,
+                username=account,
+                password=ACCOUNTS[account],
+                timings=step_timings
             )
         
         # Execute in thread pool to avoid blocking the event loop
-        active_tasks[task_id] = start_time
         success = await loop.run_in_executor(None, run_playwright_task)
-        
-        execution_time = (datetime.now() - start_time).total_seconds()
-        
-        # Update session stats
-        global_browser_session['last_used'] = datetime.now()
-        global_browser_session['session_count'] += 1
-        
-        # Clean up task tracking
-        if task_id in active_tasks:
-            del active_tasks[task_id]
-        
-        if success:
-            logger.info(f"[{task_id}] Alias created successfully in {execution_time:.2f}s")
-            return AliasResponse(
-                success=True,
-                message=f"Alias {request.alias_email} created successfully",
-                timestamp=datetime.now().isoformat(),
-                execution_time=execution_time,
-                session_reused=global_browser_session['session_count'] > 1
-            )
-        else:
-            logger.error(f"[{task_id}] Alias creation failed")
-            raise HTTPException(status_code=500, detail="Alias creation failed")
-            
+        logger.info(f"⏱️  {alias_email} step timings: {step_timings}")
+        for stage, seconds in step_timings.items():
+            if stage != 'total':
+                STAGE_SECONDS.observe(seconds, stage=stage)
+        result = {
+            'success': bool(success),
+            'message': f'Alias {alias_email} created successfully' if success else 'Alias creation failed'
+        }
+        session_reused = False
+    
+    # Update session stats
+    session_stats['last_used'] = datetime.now()
+    if result['success']:
+        session_stats['alias_count'] += 1
+    execution_time = (datetime.now() - start_time).total_seconds()
+    STAGE_SECONDS.observe(execution_time, stage="total")
+    ALIASES_TOTAL.inc(account=account, outcome="success" if result['success'] else "failure")
+    
+    return {
+        'success': result['success'],
+        'alias_email': alias_email,
+        'target_email': target_email,
+        'description': description,
+        'account': account,
+        'alias_id': result.get('alias_id'),
+        'execution_time': execution_time,
+        'session_reused': session_reused,
+        'message': result['message']
+    }
+
+def _batch_items(request: BatchAliasRequest) -> list:
+    """Batch items with their account resolved (400 for unknown accounts, before anything is queued)"""
+    try:
+        return [{**item, 'account': _resolve_account(item.get('account') or request.account)}
+                for item in request.aliases]
+    except UnknownAccountError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _run_alias_job(payload: dict) -> dict:
+    """Job queue handler; exceptions are retried by the queue with backoff"""
+    return await _create_alias(payload['alias_email'], payload['target_email'], payload['description'],
+                               payload.get('account'))
+
+@app.post("/create-alias", response_model=AliasResponse)
+async def create_alias_endpoint(request: CreateAliasRequest):
+    """Create alias on a warm pooled browser context"""
+    
+    task_id = f"alias_{int(datetime.now().timestamp())}"
+    logger.info(f"[{task_id}] Creating alias: {request.alias_email} -> {request.target_email}")
+    
+    try:
+        result = await _create_alias(request.alias_email, request.target_email, request.description,
+                                     request.account)
+    except UnknownAccountError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        # Clean up task tracking
-        if task_id in active_tasks:
-            del active_tasks[task_id]
-            
-        execution_time = (datetime.now() - start_time).total_seconds()
         logger.error(f"[{task_id}] Error creating alias: {e}")
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    
+    if result['success']:
+        logger.info(f"[{task_id}] Alias created successfully in {result['execution_time']:.2f}s")
+        return AliasResponse(
+            success=True,
+            message=result['message'],
+            timestamp=datetime.now().isoformat(),
+            alias_id=result['alias_id'],
+            execution_time=result['execution_time'],
+            session_reused=result['session_reused']
+        )
+    else:
+        logger.error(f"[{task_id}] Alias creation failed: {result['message']}")
+        raise HTTPException(status_code=500, detail=f"Alias creation failed: {result['message']}")
 
 @app.post("/batch-create", response_model=BatchAliasResponse)
 async def batch_create_aliases_endpoint(request: BatchAliasRequest):
-    """Create multiple aliases in batch - sequential or parallel processing"""
+    """Create multiple aliases in batch - sequential or parallel processing (via the durable job queue)"""
     
-    task_id = f"batch_{int(datetime.now().timestamp())}"
     total_aliases = len(request.aliases)
-    
-    logger.info(f"[{task_id}] Batch creation of {total_aliases} aliases ({request.processing_mode} mode)")
-    
     start_time = datetime.now()
-    active_tasks[task_id] = start_time
+    items = _batch_items(request)
     
     try:
-        if request.processing_mode == "parallel":
-            results = await _batch_create_parallel(request.aliases, task_id)
-        else:
-            results = await _batch_create_sequential(request.aliases, task_id)
+        batch_id = await job_queue.submit(items, request.processing_mode)
+        logger.info(f"[{batch_id}] Batch creation of {total_aliases} aliases ({request.processing_mode} mode)")
+        
+        results = [result async for result in job_queue.stream_batch(batch_id)]
+        results.sort(key=lambda r: r['position'])
         
         execution_time = (datetime.now() - start_time).total_seconds()
         successful_count = sum(1 for r in results if r['success'])
         failed_count = total_aliases - successful_count
         
-        # Clean up task tracking
-        if task_id in active_tasks:
-            del active_tasks[task_id]
-        
-        logger.info(f"[{task_id}] Batch complete: {successful_count}/{total_aliases} successful in {execution_time:.2f}s")
+        logger.info(f"[{batch_id}] Batch complete: {successful_count}/{total_aliases} successful in {execution_time:.2f}s")
         
         return BatchAliasResponse(
             success=failed_count == 0,
@@ -296,198 +450,91 @@ async def batch_create_aliases_endpoint(request: BatchAliasRequest):
         )
         
     except Exception as e:
-        # Clean up task tracking
-        if task_id in active_tasks:
-            del active_tasks[task_id]
-            
-        execution_time = (datetime.now() - start_time).total_seconds()
-        logger.error(f"[{task_id}] Batch creation error: {e}")
+        logger.error(f"Batch creation error: {e}")
         raise HTTPException(status_code=500, detail=f"Batch error: {str(e)}")
 
-async def _batch_create_sequential(aliases_list: list, batch_id: str) -> list:
-    """Create aliases sequentially (one after another)"""
-    logger.info(f"[{batch_id}] Processing {len(aliases_list)} aliases sequentially...")
-    
-    results = []
-    loop = asyncio.get_event_loop()
-    
-    for i, alias_data in enumerate(aliases_list, 1):
-        alias_email = alias_data.get('alias_email', '')
-        target_email = alias_data.get('target_email', '')
-        description = alias_data.get('description', '')
-        
-        logger.info(f"[{batch_id}] [{i}/{len(aliases_list)}] Creating: {alias_email}")
-        
-        start_time = datetime.now()
-        
-        try:
-            def run_playwright_task():
-                return create_alias_with_playwright(
-                    alias_email=alias_email,
-                    target_email=target_email,
-                    description=description,
-                    username=USERNAME,
-                    password=PASSWORD
-                )
-            
-            success = await loop.run_in_executor(None, run_playwright_task)
-            execution_time = (datetime.now() - start_time).total_seconds()
-            
-            # Update session stats
-            global_browser_session['last_used'] = datetime.now()
-            global_browser_session['session_count'] += 1
-            
-            if success:
-                logger.info(f"[{batch_id}] [{i}/{len(aliases_list)}] ✅ Success in {execution_time:.2f}s")
-                results.append({
-                    'success': True,
-                    'alias_email': alias_email,
-                    'target_email': target_email,
-                    'description': description,
-                    'execution_time': execution_time,
-                    'session_reused': global_browser_session['session_count'] > 1,
-                    'message': f'Alias {alias_email} created successfully'
-                })
-            else:
-                logger.error(f"[{batch_id}] [{i}/{len(aliases_list)}] ❌ Failed in {execution_time:.2f}s")
-                results.append({
-                    'success': False,
-                    'alias_email': alias_email,
-                    'target_email': target_email,
-                    'description': description,
-                    'execution_time': execution_time,
-                    'session_reused': False,
-                    'message': 'Alias creation failed'
-                })
-                
-        except Exception as e:
-            execution_time = (datetime.now() - start_time).total_seconds()
-            logger.error(f"[{batch_id}] [{i}/{len(aliases_list)}] ❌ Error: {e}")
-            results.append({
-                'success': False,
-                'alias_email': alias_email,
-                'target_email': target_email,
-                'description': description,
-                'execution_time': execution_time,
-                'session_reused': False,
-                'message': f'Error: {str(e)}'
-            })
-        
-        # Small delay between requests to be respectful
-        if i < len(aliases_list):
-            await asyncio.sleep(0.5)
-    
-    return results
+@app.post("/jobs", status_code=202)
+async def submit_batch_job(request: BatchAliasRequest):
+    """Queue a batch and return at once; follow it via /jobs/{batch_id} or /jobs/{batch_id}/stream"""
+    batch_id = await job_queue.submit(_batch_items(request), request.processing_mode)
+    return {
+        "batch_id": batch_id,
+        "total": len(request.aliases),
+        "processing_mode": request.processing_mode,
+        "status_url": f"/jobs/{batch_id}",
+        "stream_url": f"/jobs/{batch_id}/stream",
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/jobs/{batch_id}")
+async def get_batch_job(batch_id: str):
+    """Poll a queued batch: progress counters plus the results finished so far"""
+    batch = await job_queue.get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Unknown batch: {batch_id}")
+    return batch
 
-async def _batch_create_parallel(aliases_list: list, batch_id: str) -> list:
-    """Create aliases in parallel (simultaneously)"""
-    logger.info(f"[{batch_id}] Processing {len(aliases_list)} aliases in parallel...")
+@app.get("/jobs/{batch_id}/stream")
+async def stream_batch_job(batch_id: str, request: Request, format: str = None):
+    """
+    Per-alias results as they finish, then a final summary: NDJSON by default, Server-Sent
+    Events with ?format=sse or `Accept: text/event-stream`. Already finished items come first,
+    so reconnecting replays the batch from the start.
+    """
+    batch = await job_queue.get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Unknown batch: {batch_id}")
+    use_sse = format == "sse" or (format is None and "text/event-stream" in request.headers.get("accept", ""))
     
-    loop = asyncio.get_event_loop()
+    def encode(event: str, data: dict) -> str:
+        if use_sse:
+            return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        return json.dumps({"event": event, **data}) + "\n"
     
-    async def create_single_alias(alias_data: dict, index: int):
-        """Create a single alias in parallel"""
-        alias_email = alias_data.get('alias_email', '')
-        target_email = alias_data.get('target_email', '')
-        description = alias_data.get('description', '')
-        
+    async def events():
         start_time = datetime.now()
-        
-        try:
-            def run_playwright_task():
-                return create_alias_with_playwright(
-                    alias_email=alias_email,
-                    target_email=target_email,
-                    description=description,
-                    username=USERNAME,
-                    password=PASSWORD
-                )
-            
-            success = await loop.run_in_executor(None, run_playwright_task)
-            execution_time = (datetime.now() - start_time).total_seconds()
-            
-            # Update session stats
-            global_browser_session['last_used'] = datetime.now()
-            global_browser_session['session_count'] += 1
-            
-            if success:
-                logger.info(f"[{batch_id}] [parallel-{index}] ✅ Success in {execution_time:.2f}s")
-                return {
-                    'success': True,
-                    'alias_email': alias_email,
-                    'target_email': target_email,
-                    'description': description,
-                    'execution_time': execution_time,
-                    'session_reused': global_browser_session['session_count'] > 1,
-                    'message': f'Alias {alias_email} created successfully'
-                }
+        successful_count = failed_count = 0
+        async for result in job_queue.stream_batch(batch_id):
+            if result['success']:
+                successful_count += 1
             else:
-                logger.error(f"[{batch_id}] [parallel-{index}] ❌ Failed in {execution_time:.2f}s")
-                return {
-                    'success': False,
-                    'alias_email': alias_email,
-                    'target_email': target_email,
-                    'description': description,
-                    'execution_time': execution_time,
-                    'session_reused': False,
-                    'message': 'Alias creation failed'
-                }
-                
-        except Exception as e:
-            execution_time = (datetime.now() - start_time).total_seconds()
-            logger.error(f"[{batch_id}] [parallel-{index}] ❌ Error: {e}")
-            return {
-                'success': False,
-                'alias_email': alias_email,
-                'target_email': target_email,
-                'description': description,
-                'execution_time': execution_time,
-                'session_reused': False,
-                'message': f'Error: {str(e)}'
-            }
+                failed_count += 1
+            yield encode("result", result)
+        yield encode("done", {
+            "batch_id": batch_id,
+            "total_requested": batch['total'],
+            "successful_count": successful_count,
+            "failed_count": failed_count,
+            "stream_seconds": (datetime.now() - start_time).total_seconds(),
+            "timestamp": datetime.now().isoformat()
+        })
     
-    # Create all aliases in parallel
-    tasks = [
-        create_single_alias(alias_data, i+1) 
-        for i, alias_data in enumerate(aliases_list)
-    ]
-    
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    
-    # Handle any exceptions that weren't caught
-    processed_results = []
-    for i, result in enumerate(results):
-        if isinstance(result, Exception):
-            processed_results.append({
-                'success': False,
-                'alias_email': aliases_list[i].get('alias_email', ''),
-                'target_email': aliases_list[i].get('target_email', ''),
-                'description': aliases_list[i].get('description', ''),
-                'execution_time': 0,
-                'session_reused': False,
-                'message': f'Exception: {str(result)}'
-            })
-        else:
-            processed_results.append(result)
-    
-    return processed_results
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/tasks")
 async def get_active_tasks():
-    """Get information about currently running tasks"""
-    current_time = datetime.now()
+    """Get information about unfinished batches in the job queue"""
+    now = datetime.now().timestamp()
     tasks_info = {}
     
-    for task_id, start_time in active_tasks.items():
-        duration = (current_time - start_time).total_seconds()
-        tasks_info[task_id] = {
-            "start_time": start_time.isoformat(),
-            "duration_seconds": duration
+    for batch in await job_queue.active_batches():
+        tasks_info[batch['id']] = {
+            "start_time": datetime.fromtimestamp(batch['created_at']).isoformat(),
+            "duration_seconds": now - batch['created_at'],
+            "processing_mode": batch['processing_mode'],
+            "total": batch['total'],
+            "finished": batch['finished'],
+            "running": batch['running']
         }
     
     return {
-        "active_tasks": len(active_tasks),
-        "tasks": tasks_info
+        "active_tasks": len(tasks_info),
+        "tasks": tasks_info,
+        "queue": await job_queue.get_stats()
     }
 
 @app.post("/test-automation")
@@ -501,7 +548,7 @@ async def test_automation():
             "dependencies": {
                 "playwright": "available",
                 "sync_function": "imported",
-                "credentials": "configured",
+                "credentials": f"configured ({len(ACCOUNTS)} accounts)",
                 "session_reuse": "enabled"
             }
         }
@@ -509,10 +556,14 @@ async def test_automation():
         raise HTTPException(status_code=500, detail=f"Automation test failed: {str(e)}")
 
 @app.post("/reset-session")
-async def reset_session():
-    """Manually reset browser session"""
-    logger.info("🔄 Manual session reset requested")
-    await cleanup_browser_session()
+async def reset_session(account: str = None):
+    """Manually reset pooled browser contexts and brokered credentials of one account or all (forces fresh logins)"""
+    logger.info(f"🔄 Manual session reset requested ({account or 'all accounts'})")
+    if account_broker:
+        try:
+            await account_broker.reset(account)
+        except UnknownAccountError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "message": "Browser session reset",
@@ -13,7 +13,7 @@ from pathlib import Path
 from typing import Dict, Any, Optional
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel, Field
 import uvicorn
 
@@ -27,6 +27,10 @@ except ImportError as e:
     print("Make sure you're running from the correct directory and dependencies are installed")
     sys.exit(1)
 
+# Shared metrics registry (Prometheus text format)
+sys.path.append(str(Path(__file__).parent.parent.parent.parent / "shared" / "utils"))
+from metrics import get_registry, request_timing_middleware, record_executor_usage, CONTENT_TYPE
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -38,6 +42,22 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Prometheus-style metrics, served at /metrics
+metrics = get_registry()
+app.middleware("http")(request_timing_middleware(metrics, "youtube"))
+STAGE_SECONDS = metrics.histogram("youtube_stage_seconds", "Duration of YouTube automation stages", ("stage",))
+OPERATIONS_TOTAL = metrics.counter("youtube_operations_total", "Automation operations by endpoint and outcome",
+                                   ("endpoint", "outcome"))
+
+async def _timed(stage: str, operation):
+    """Await `operation`, recording its duration under `stage`"""
+    with STAGE_SECONDS.time(stage=stage):
+        return await operation
+
+def _record_operation(endpoint: str, success: bool, execution_time: float):
+    STAGE_SECONDS.observe(execution_time, stage=f"{endpoint}_total")
+    OPERATIONS_TOTAL.inc(endpoint=endpoint, outcome="success" if success else "failure")
+
 # Pydantic models for API requests
 class YouTubeSignInRequest(BaseModel):
     signin_url: Optional[str] = Field(None, description="Custom Google sign-in URL (optional)")
@@ -98,7 +118,8 @@ async def root():
             "health": "/health",
             "signin": "/signin",
             "subscribe": "/subscribe",
-            "workflow": "/workflow"
+            "workflow": "/workflow",
+            "metrics": "/metrics"
         },
         "credentials": {
             "infisical_vars": ["G_LSD_M_0", "G_LSD_P_0"],
@@ -121,6 +142,13 @@ async def health_check():
         "credential_source": "infisical" if os.getenv('G_LSD_M_0') else "environment" if yt_email else "none"
     }
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text exposition of stage latency histograms and operation counters"""
+    metrics.gauge("youtube_active_sessions", "Active automation sessions").set(len(active_sessions))
+    record_executor_usage(metrics, "youtube")
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
+
 @app.post("/signin", response_model=YouTubeOperationResponse)
 async def youtube_signin(request: YouTubeSignInRequest, background_tasks: BackgroundTasks):
     """Perform YouTube/Google sign-in"""
@@ -146,9 +174,9 @@ async def youtube_signin(request: YouTubeSignInRequest, background_tasks: Backgr
         error = None
         
         try:
-            if await automator.start_browser():
-                if await automator.navigate_to_youtube_signin(request.signin_url):
-                    if await automator.perform_google_signin():
+            if await _timed("browser_launch", automator.start_browser()):
+                if await _timed("signin_navigation", automator.navigate_to_youtube_signin(request.signin_url)):
+                    if await _timed("login", automator.perform_google_signin()):
                         success = True
                         logger.info("✅ YouTube sign-in successful")
                     else:
@@ -175,6 +203,7 @@ async def youtube_signin(request: YouTubeSignInRequest, background_tasks: Backgr
                 del os.environ['G_LSD_P_0']
         
         execution_time = asyncio.get_event_loop().time() - start_time
+        _record_operation("signin", success, execution_time)
         
         return YouTubeOperationResponse(
             success=success,
@@ -187,6 +216,7 @@ async def youtube_signin(request: YouTubeSignInRequest, background_tasks: Backgr
     except Exception as e:
         execution_time = asyncio.get_event_loop().time() - start_time
         logger.error(f"❌ Sign-in endpoint error: {e}")
+        _record_operation("signin", False, execution_time)
         
         return YouTubeOperationResponse(
             success=False,
@@ -213,10 +243,10 @@ async def youtube_subscribe(request: YouTubeSubscribeRequest, background_tasks:
         error = None
         
         try:
-            if await automator.start_browser():
-                if await automator.navigate_to_channel(request.channel_url):
+            if await _timed("browser_launch", automator.start_browser()):
+                if await _timed("channel_navigation", automator.navigate_to_channel(request.channel_url)):
                     channel_info = await automator.get_channel_info()
-                    if await automator.subscribe_to_channel():
+                    if await _timed("subscribe", automator.subscribe_to_channel()):
                         subscribed = True
                         success = True
                         logger.info("✅ Channel subscription successful")
@@ -234,6 +264,7 @@ async def youtube_subscribe(request: YouTubeSubscribeRequest, background_tasks:
             await automator.close_browser()
         
         execution_time = asyncio.get_event_loop().time() - start_time
+        _record_operation("subscribe", success, execution_time)
         
         return YouTubeOperationResponse(
             success=success,
@@ -247,6 +278,7 @@ async def youtube_subscribe(request: YouTubeSubscribeRequest, background_tasks:
     except Exception as e:
         execution_time = asyncio.get_event_loop().time() - start_time
         logger.error(f"❌ Subscribe endpoint error: {e}")
+        _record_operation("subscribe", False, execution_time)
         
         return YouTubeOperationResponse(
             success=False,
@@ -286,6 +318,7 @@ async def youtube_workflow(request: YouTubeWorkflowRequest, background_tasks: Ba
             execution_time = asyncio.get_event_loop().time() - start_time
             
             logger.info(f"✅ Complete workflow finished in {execution_time:.2f}s")
+            _record_operation("workflow", result['success'], execution_time)
             
             return YouTubeOperationResponse(
                 success=result['success'],
@@ -311,6 +344,7 @@ async def youtube_workflow(request: YouTubeWorkflowRequest, background_tasks: Ba
     except Exception as e:
         execution_time = asyncio.get_event_loop().time() - start_time
         logger.error(f"❌ Complete workflow error: {e}")
+        _record_operation("workflow", False, execution_time)
         
         return YouTubeOperationResponse(
             success=False,
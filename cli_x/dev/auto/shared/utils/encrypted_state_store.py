@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Encrypted Browser State Store
+Keeps Playwright storage_state (cookies + localStorage) per account on disk, encrypted
+with Fernet. The key is FM_STATE_KEY when set (headless servers), otherwise derived from
+YubiKey challenge-response + passcode exactly like SecureTokenManager does for tokens.
+"""
+
+import os
+import sys
+import json
+import base64
+import hashlib
+import getpass
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+sys.path.append(str(Path(__file__).parent))
+
+logger = logging.getLogger(__name__)
+
+# Constants
+YUBIKEY_CHALLENGE = "fastmail-state"
+DEFAULT_STATE_DIR = Path.home() / ".fastmail_automation" / "browser_state"
+
+class EncryptedStateStore:
+    """
+    Fernet-encrypted storage_state files, one per account
+
+    The key is resolved once per process: FM_STATE_KEY (a Fernet key), or a YubiKey
+    touch + passcode (FM_STATE_PASSCODE, or a prompt on a terminal) stretched with the
+    store's salt. Without either, the store is disabled and callers just log in.
+    """
+
+    def __init__(self, state_dir: Optional[Path] = None):
+        self.state_dir = Path(state_dir or os.getenv("FM_STATE_DIR") or DEFAULT_STATE_DIR)
+        self._fernet = None
+        self._key_resolved = False
+        self._key_lock = threading.Lock()  # One YubiKey prompt even with concurrent loaders
+
+    def _path(self, username: str) -> Path:
+        # Account names stay out of file names
+        return self.state_dir / f"{hashlib.sha256(username.lower().encode()).hexdigest()[:16]}.json"
+
+    def _salt(self) -> bytes:
+        salt_file = self.state_dir / "salt"
+        if not salt_file.exists():
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            salt_file.write_bytes(os.urandom(16))
+            salt_file.chmod(0o600)
+        return salt_file.read_bytes()
+
+    def _get_fernet(self):
+        with self._key_lock:
+            if not self._key_resolved:
+                self._fernet = self._resolve_key()
+                self._key_resolved = True
+            return self._fernet
+
+    def _resolve_key(self):
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError:
+            logger.warning("⚠️  cryptography not installed; browser state will not be persisted")
+            return None
+
+        env_key = os.getenv("FM_STATE_KEY")
+        if env_key:
+            try:
+                return Fernet(env_key.encode())
+            except ValueError as e:
+                logger.warning(f"⚠️  FM_STATE_KEY is not a valid Fernet key ({e}); browser state will not be persisted")
+                return None
+
+        passcode = os.getenv("FM_STATE_PASSCODE")
+        if not passcode and not sys.stdin.isatty():
+            logger.info("🔒 No FM_STATE_KEY / FM_STATE_PASSCODE; browser state will not be persisted")
+            return None
+
+        from secure_token_manager import SecureTokenManager
+        token_manager = SecureTokenManager()
+        print("👆 Touch your YubiKey to unlock the saved browser session...")
+        yubikey_response = token_manager.get_yubikey_challenge(YUBIKEY_CHALLENGE)
+        if not yubikey_response:
+            return None
+        passcode = passcode or getpass.getpass("🔒 Enter your passcode: ")
+        key = token_manager.derive_key(yubikey_response, passcode, self._salt())
+        return Fernet(base64.urlsafe_b64encode(key))
+
+    def load(self, username: str) -> Optional[Dict[str, Any]]:
+        """Decrypted storage_state for `username`, or None if missing/unreadable"""
+        path = self._path(username)
+        if not path.exists():
+            return None
+        fernet = self._get_fernet()
+        if not fernet:
+            return None
+        try:
+            with open(path, 'r') as f:
+                record = json.load(f)
+            return json.loads(fernet.decrypt(record["encrypted_data"].encode()))
+        except Exception as e:
+            logger.warning(f"⚠️  Saved browser state unreadable ({type(e).__name__}), discarding")
+            self.discard(username)
+            return None
+
+    def save(self, username: str, state: Dict[str, Any]) -> bool:
+        fernet = self._get_fernet()
+        if not fernet:
+            return False
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(username)
+        record = {
+            "encrypted_data": fernet.encrypt(json.dumps(state).encode()).decode(),
+            "saved_at": datetime.now().isoformat(),
+            "encryption_method": "Fernet"
+        }
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f)
+        tmp_path.chmod(0o600)
+        tmp_path.replace(path)
+        logger.info(f"💾 Browser state saved ({len(state.get('cookies', []))} cookies)")
+        return True
+
+    def discard(self, username: str):
+        try:
+            self._path(username).unlink()
+        except FileNotFoundError:
+            pass
+
+# Process-wide store so every browser in the process shares one key unlock
+_shared_store: Optional[EncryptedStateStore] = None
+
+def get_state_store() -> EncryptedStateStore:
+    """Return the shared EncryptedStateStore, creating it on first use"""
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = EncryptedStateStore()
+    return _shared_store
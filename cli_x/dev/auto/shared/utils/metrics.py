@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Prometheus-style Metrics
+Counters, gauges and histograms rendered in the Prometheus text exposition format for a
+`/metrics` endpoint, plus helpers shared by the automation servers (HTTP request timing
+middleware, thread-pool executor usage). No client library needed.
+"""
+
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a JMAP call (~0.1 s) up to a cold browser login (~1 min)
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()  # Observed from executor threads too
+        self._values: Dict[Tuple, float] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in self._values.items()]
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}", *self.samples()])
+
+class Counter(_Metric):
+    """Monotonic count, optionally per label set"""
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set_total(self, value: float, **labels):
+        """Mirror a monotonic count that is kept elsewhere (e.g. a component's stats dict)"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = max(self._values.get(key, 0.0), value)
+
+class Gauge(_Metric):
+    """Point-in-time value, usually refreshed right before rendering"""
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    """Cumulative-bucket latency histogram with _sum and _count"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[Tuple, List[float]] = {}  # bucket counts..., sum, count
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, series in self._series.items():
+                for bound, count in zip(self.buckets, series):
+                    bucket_labels = key + (("le", _format_value(bound)),)
+                    lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {_format_value(count)}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series[-2])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {_format_value(series[-1])}")
+        return lines
+
+class Registry:
+    """Named metrics of one process; render() produces the /metrics body"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+# Process-wide registry so every module of a server reports into one /metrics
+_shared_registry: Optional[Registry] = None
+_shared_lock = threading.Lock()
+
+def get_registry() -> Registry:
+    """Return the shared Registry, creating it on first use"""
+    global _shared_registry
+    with _shared_lock:
+        if _shared_registry is None:
+            _shared_registry = Registry()
+        return _shared_registry
+
+# ─── Server helpers ───
+
+def request_timing_middleware(registry: Registry, prefix: str) -> Callable:
+    """
+    FastAPI/Starlette HTTP middleware recording request duration per route template,
+    method and status:  app.middleware("http")(request_timing_middleware(registry, "fastmail"))
+    """
+    duration = registry.histogram(f"{prefix}_http_request_duration_seconds", "HTTP request duration",
+                                  ("method", "route", "status"))
+    in_flight = registry.gauge(f"{prefix}_http_requests_in_flight", "HTTP requests being served")
+
+    async def middleware(request, call_next):
+        start = time.perf_counter()
+        in_flight.inc()
+        status = "500"
+        try:
+            response = await call_next(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            in_flight.dec()
+            route = request.scope.get("route")
+            duration.observe(time.perf_counter() - start, method=request.method,
+                             route=getattr(route, "path", "unmatched"), status=status)
+
+    return middleware
+
+def record_executor_usage(registry: Registry, prefix: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+    """Set gauges for the event loop's default thread-pool executor (threads, limit, backlog)"""
+    loop = loop or asyncio.get_event_loop()
+    executor = getattr(loop, "_default_executor", None)  # Created lazily by run_in_executor(None, ...)
+    threads = len(getattr(executor, "_threads", ())) if executor else 0
+    max_workers = getattr(executor, "_max_workers", 0) if executor else 0
+    work_queue = getattr(executor, "_work_queue", None)
+    registry.gauge(f"{prefix}_executor_threads", "Threads started by the default executor").set(threads)
+    registry.gauge(f"{prefix}_executor_max_threads", "Thread limit of the default executor").set(max_workers)
+    registry.gauge(f"{prefix}_executor_queued_tasks", "Tasks waiting for a default executor thread").set(
+        work_queue.qsize() if work_queue is not None else 0
+    )
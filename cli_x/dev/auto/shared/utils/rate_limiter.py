@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Adaptive Request Scheduler
+Per-host token buckets that speed up while requests succeed and back off on 429/503,
+honouring Retry-After. Shared by the JMAP alias tooling and the RevenueCat automation.
+"""
+
+import time
+import random
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Status codes that mean "slow down" rather than "this request is wrong"
+THROTTLE_STATUS_CODES = {429, 503}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds; accepts both delta-seconds and HTTP-date forms"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostBucket:
+    """Token bucket for a single host (state only; locking is done by the scheduler)"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class RequestScheduler:
+    """
+    Adaptive per-host rate limiter (additive increase, multiplicative decrease).
+
+    Callers reserve a slot with wait()/wait_async() and report the outcome with
+    observe(); request()/request_async() wrap both plus retry-on-throttle for
+    requests-style callables. Safe to use from threads and the event loop at once.
+    """
+
+    def __init__(self, initial_rate: float = 2.0, min_rate: float = 0.1, max_rate: float = 20.0,
+                 burst: float = 2.0, increase: float = 0.2, decrease: float = 0.5,
+                 default_backoff: float = 2.0, max_retries: int = 3):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.default_backoff = default_backoff
+        self.max_retries = max_retries
+        self._buckets: Dict[str, HostBucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host: str) -> HostBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = HostBucket(self.initial_rate, self.burst)
+        return bucket
+
+    def reserve(self, host: str) -> float:
+        """Take a token for `host` and return how long the caller must wait before sending"""
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._bucket(host)
+            bucket.refill(now)
+            bucket.tokens -= 1
+            bucket.requests += 1
+            delay = -bucket.tokens / bucket.rate if bucket.tokens < 0 else 0.0
+            return max(delay, bucket.blocked_until - now)
+
+    def wait(self, host: str):
+        """Blocking wait for a request slot (threads / sync code)"""
+        delay = self.reserve(host)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self, host: str):
+        """Non-blocking wait for a request slot (event loop)"""
+        delay = self.reserve(host)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def observe(self, host: str, status_code: int, headers: Optional[Dict[str, str]] = None) -> bool:
+        """
+        Feed a response back into the host's rate.
+        Returns True when the response was a throttle signal the caller may retry.
+        """
+        with self._lock:
+            bucket = self._bucket(host)
+            if status_code in THROTTLE_STATUS_CODES:
+                retry_after = parse_retry_after((headers or {}).get('Retry-After'))
+                if retry_after is None:
+                    # No hint from the server: back off with jitter so workers do not retry in lockstep
+                    retry_after = self.default_backoff * (1 + random.random())
+                bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+                bucket.tokens = min(bucket.tokens, 0.0)
+                bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + retry_after)
+                bucket.throttled += 1
+                logger.warning(f"⏳ {host} throttled ({status_code}), retry in {retry_after:.1f}s, "
+                               f"rate now {bucket.rate:.2f}/s")
+                return True
+            if status_code < 400:
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase)
+            return False
+
+    def request(self, host: str, send: Callable[[], Any], max_retries: Optional[int] = None):
+        """Send a requests-style call through the limiter, retrying throttled responses"""
+        retries = self.max_retries if max_retries is None else max_retries
+        for attempt in range(retries + 1):
+            self.wait(host)
+            response = send()
+            if not self.observe(host, response.status_code, response.headers) or attempt == retries:
+                return response
+        return response
+
+    async def request_async(self, host: str, send: Callable[[], Any], max_retries: Optional[int] = None):
+        """Async variant of request(); the blocking `send` runs in the default executor"""
+        retries = self.max_retries if max_retries is None else max_retries
+        loop = asyncio.get_event_loop()
+        for attempt in range(retries + 1):
+            await self.wait_async(host)
+            response = await loop.run_in_executor(None, send)
+            if not self.observe(host, response.status_code, response.headers) or attempt == retries:
+                return response
+        return response
+
+    async def gather(self, calls: List[Callable[[], Awaitable[Any]]], concurrency: int = 8,
+                     host: Optional[str] = None) -> List[Any]:
+        """
+        Run coroutine factories concurrently with at most `concurrency` in flight.
+        If `host` is given each call also takes a token first; leave it unset when the
+        calls already go through request_async(). Results keep input order.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(call):
+            async with semaphore:
+                if host:
+                    await self.wait_async(host)
+                return await call()
+
+        return await asyncio.gather(*(run(call) for call in calls))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Current rate and counters per host"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                host: {
+                    'rate_per_second': round(bucket.rate, 3),
+                    'requests': bucket.requests,
+                    'throttled': bucket.throttled,
+                    'blocked_for_seconds': round(max(0.0, bucket.blocked_until - now), 3)
+                }
+                for host, bucket in self._buckets.items()
+            }
+
+
+# Process-wide scheduler so every caller talking to the same host shares one budget
+_shared_scheduler: Optional[RequestScheduler] = None
+_shared_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """Return the shared RequestScheduler, creating it on first use"""
+    global _shared_scheduler
+    with _shared_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = RequestScheduler()
+        return _shared_scheduler
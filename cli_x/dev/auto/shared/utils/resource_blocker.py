@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Resource Blocker
+Route-level blocking profile for automation browsers: only the resource types the
+login and token capture need (documents, scripts, XHR/fetch) are loaded, everything
+else (images, fonts, media, stylesheets, beacons) is aborted before it hits the network.
+"""
+
+import os
+import logging
+import threading
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_ALLOWED_TYPES = ("document", "script", "xhr", "fetch")
+
+# Analytics/telemetry hosts aborted even when their resource type is allowed
+DEFAULT_BLOCKED_HOSTS = ("google-analytics.com", "googletagmanager.com", "sentry.io", "doubleclick.net")
+
+# Typical transfer size per blocked resource type; aborted requests never report a size
+ESTIMATED_BYTES = {
+    "image": 25_000,
+    "font": 45_000,
+    "media": 250_000,
+    "stylesheet": 30_000,
+    "script": 60_000,
+    "manifest": 1_000,
+    "texttrack": 2_000,
+}
+DEFAULT_ESTIMATED_BYTES = 2_000
+
+def _env_list(name: str, default: Iterable[str]) -> tuple:
+    value = os.getenv(name)
+    if value is None:
+        return tuple(default)
+    return tuple(item.strip().lower() for item in value.split(",") if item.strip())
+
+class ResourceBlocker:
+    """
+    Allowlist of resource types plus a host denylist, with counters of what was saved
+
+    Install it per page/context with `context.route("**/*", blocker.handle)` (sync API)
+    or `handle_async` (async API), or call should_block() from an existing route handler.
+    Configurable via FM_BLOCK_RESOURCES=0 (off), FM_ALLOWED_RESOURCE_TYPES and
+    FM_BLOCKED_HOSTS (comma-separated).
+    """
+
+    def __init__(self, allowed_types: Optional[Iterable[str]] = None,
+                 blocked_hosts: Optional[Iterable[str]] = None, enabled: Optional[bool] = None):
+        self.enabled = enabled if enabled is not None else os.getenv("FM_BLOCK_RESOURCES", "1") != "0"
+        self.allowed_types = frozenset(allowed_types or _env_list("FM_ALLOWED_RESOURCE_TYPES", DEFAULT_ALLOWED_TYPES))
+        self.blocked_hosts = tuple(blocked_hosts or _env_list("FM_BLOCKED_HOSTS", DEFAULT_BLOCKED_HOSTS))
+        self._lock = threading.Lock()  # Sync-API callers may route from several threads
+        self.stats = {'allowed': 0, 'blocked': 0, 'estimated_bytes_saved': 0}
+        self.blocked_by_type: Dict[str, int] = {}
+
+    def should_block(self, request) -> bool:
+        """Decide for one request and count the outcome"""
+        if not self.enabled:
+            return False
+        resource_type = request.resource_type
+        blocked = (resource_type not in self.allowed_types
+                   or any(host in request.url for host in self.blocked_hosts))
+        with self._lock:
+            if blocked:
+                self.stats['blocked'] += 1
+                self.stats['estimated_bytes_saved'] += ESTIMATED_BYTES.get(resource_type, DEFAULT_ESTIMATED_BYTES)
+                self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+            else:
+                self.stats['allowed'] += 1
+        return blocked
+
+    def handle(self, route):
+        """Route handler for the sync Playwright API"""
+        if self.should_block(route.request):
+            route.abort("blockedbyclient")
+        else:
+            route.continue_()
+
+    async def handle_async(self, route):
+        """Route handler for the async Playwright API"""
+        if self.should_block(route.request):
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                **self.stats,
+                'estimated_mb_saved': round(self.stats['estimated_bytes_saved'] / 1_000_000, 2),
+                'blocked_by_type': dict(self.blocked_by_type)
+            }
+
+    def format(self) -> str:
+        stats = self.get_stats()
+        return (f"{stats['blocked']} requests blocked, {stats['allowed']} allowed, "
+                f"~{stats['estimated_mb_saved']} MB saved")
+
+# Process-wide blocker so the counters cover every browser in the process
+_shared_blocker: Optional[ResourceBlocker] = None
+_shared_lock = threading.Lock()
+
+def get_resource_blocker() -> ResourceBlocker:
+    """Return the shared ResourceBlocker, creating it on first use"""
+    global _shared_blocker
+    with _shared_lock:
+        if _shared_blocker is None:
+            _shared_blocker = ResourceBlocker()
+        return _shared_blocker
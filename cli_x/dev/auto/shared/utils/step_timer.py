@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Step Timer
+Wall-clock durations of the named steps of one automation flow (launch, login,
+token capture, API call, ...), so slow runs show where the time went.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+class StepTimer:
+    """
+    Records how long each named step took; works around sync and async code alike
+
+        timer = StepTimer()
+        with timer.step("login"):
+            await page.click(...)
+        timer.lap("token_capture")  # time since the previous lap
+        timer.summary()  # {'login': 1.234, 'token_capture': 0.4, 'total': 1.701}
+    """
+
+    def __init__(self, steps: Optional[Dict[str, float]] = None):
+        # Pass a dict to have the timings written into a caller-owned mapping
+        self.steps = steps if steps is not None else {}
+        self._start = time.perf_counter()
+        self._last_lap = self._start
+
+    @contextmanager
+    def step(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._last_lap = time.perf_counter()
+            self.steps[name] = round(self.steps.get(name, 0.0) + self._last_lap - start, 3)
+
+    def lap(self, name: str):
+        """Record the time since the previous lap (or construction) as step `name`"""
+        now = time.perf_counter()
+        self.steps[name] = round(self.steps.get(name, 0.0) + now - self._last_lap, 3)
+        self._last_lap = now
+
+    def total(self) -> float:
+        return round(time.perf_counter() - self._start, 3)
+
+    def summary(self) -> Dict[str, float]:
+        self.steps['total'] = self.total()
+        return self.steps
+
+    def format(self) -> str:
+        return " | ".join(f"{name} {seconds:.2f}s" for name, seconds in self.summary().items())
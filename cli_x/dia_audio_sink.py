@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Dia Audio Sink - output formats and playback for the Dia TTS engine
+WAV and raw PCM are written inline (no encoder), compressed formats are encoded on a
+worker thread and playback runs from a queue, so generation never waits on an encoder
+or on player startup.
+"""
+
+import sys
+import wave
+import queue
+import shutil
+import threading
+import subprocess
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Constants
+PASSTHROUGH_FORMATS = ("wav", "pcm", "raw")
+# soundfile (libsndfile) format/subtype per extension; MP3 needs libsndfile >= 1.1
+ENCODED_FORMATS = {
+    "mp3": ("MP3", None),
+    "opus": ("OGG", "OPUS"),
+    "ogg": ("OGG", "VORBIS"),
+    "flac": ("FLAC", None),
+}
+ALL_FORMATS = set(ENCODED_FORMATS) | {"wav"}
+# Unreported write failures kept for wait_for(); the oldest are dropped beyond this
+MAX_REMEMBERED_FAILURES = 256
+
+# (binary, extra args, formats it can play), in order of preference
+PLAYERS: Dict[str, List[Tuple[str, List[str], set]]] = {
+    "darwin": [("afplay", [], ALL_FORMATS - {"opus", "ogg"}),
+               ("ffplay", ["-nodisp", "-autoexit", "-loglevel", "quiet"], ALL_FORMATS)],
+    "linux": [("paplay", [], {"wav", "ogg", "opus", "flac"}),
+              ("aplay", ["-q"], {"wav"}),
+              ("mpg123", ["-q"], {"mp3"}),
+              ("ffplay", ["-nodisp", "-autoexit", "-loglevel", "quiet"], ALL_FORMATS),
+              ("cvlc", ["--play-and-exit", "--quiet"], ALL_FORMATS)],
+}
+
+def to_pcm16(audio) -> bytes:
+    """Float waveform in [-1, 1] to little-endian 16-bit PCM bytes"""
+    import numpy as np
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+class AudioSink:
+    """
+    Writes waveforms in the format implied by the file extension and plays files in order
+
+    write() returns a Future that is already done for WAV/raw PCM and resolves on the
+    encoder thread for mp3/opus/ogg/flac. play() queues a file for the player thread,
+    which first waits for that file's pending encode. Failed writes are remembered until
+    wait_for() or wait() has reported them, so they surface even after the encode finished.
+    """
+
+    def __init__(self, encoder_workers: int = 1):
+        self._encoder = ThreadPoolExecutor(max_workers=encoder_workers, thread_name_prefix="dia-audio-encode")
+        self._pending: Dict[str, Future] = {}
+        self._pending_lock = threading.Lock()
+        self._failed: Dict[str, BaseException] = {}  # path -> error of its last write, until reported
+        self._playback: "queue.Queue" = queue.Queue()
+        self._player_thread: Optional[threading.Thread] = None
+        self._players: Dict[str, Optional[List[str]]] = {}
+        self.stats = {"written": 0, "encoded": 0, "played": 0, "encode_seconds": 0.0}
+
+    # ─── Output ──────────────────────────────────────────────────────────────
+    def write(self, audio, path, sample_rate: int) -> Future:
+        """Write `audio` to `path`; compressed formats are encoded in the background"""
+        path = Path(path)
+        fmt = path.suffix.lstrip(".").lower() or "wav"
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        if fmt in PASSTHROUGH_FORMATS:
+            future: Future = Future()
+            try:
+                self._recorded(str(path), self._write_passthrough, audio, path, fmt, sample_rate)
+                self.stats["written"] += 1
+                future.set_result(str(path))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        if fmt not in ENCODED_FORMATS:
+            raise ValueError(f"Unsupported audio format: {fmt}")
+
+        future = self._encoder.submit(self._recorded, str(path), self._encode, audio, path, fmt, sample_rate)
+        with self._pending_lock:
+            self._pending[str(path)] = future
+        future.add_done_callback(lambda _: self._forget(str(path), future))
+        return future
+
+    def _forget(self, key: str, future: Future):
+        with self._pending_lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def _recorded(self, key: str, write, *args):
+        """Run `write`, recording its outcome before its future resolves (so wait_for sees it)"""
+        try:
+            result = write(*args)
+        except Exception as e:
+            with self._pending_lock:
+                self._failed.pop(key, None)  # Re-insert as the newest entry
+                self._failed[key] = e
+                while len(self._failed) > MAX_REMEMBERED_FAILURES:
+                    del self._failed[next(iter(self._failed))]
+            raise
+        with self._pending_lock:
+            self._failed.pop(key, None)
+        return result
+
+    def _write_passthrough(self, audio, path: Path, fmt: str, sample_rate: int):
+        if fmt == "wav":
+            with wave.open(str(path), "wb") as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(sample_rate)
+                f.writeframes(to_pcm16(audio))
+        else:
+            with open(path, "wb") as f:
+                f.write(to_pcm16(audio))
+
+    def _encode(self, audio, path: Path, fmt: str, sample_rate: int) -> str:
+        start_time = time.time()
+        container, subtype = ENCODED_FORMATS[fmt]
+        try:
+            import soundfile
+            soundfile.write(str(path), audio, sample_rate, format=container, subtype=subtype)
+        except (ImportError, RuntimeError, TypeError, ValueError) as e:
+            # Older libsndfile builds lack MP3/Opus; ffmpeg covers them when installed
+            if not shutil.which("ffmpeg"):
+                logger.error(f"Cannot encode {path.name}: {e}")
+                raise
+            self._encode_with_ffmpeg(audio, path, sample_rate)
+        self.stats["encoded"] += 1
+        self.stats["encode_seconds"] += time.time() - start_time
+        return str(path)
+
+    def _encode_with_ffmpeg(self, audio, path: Path, sample_rate: int):
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-f", "s16le", "-ar", str(sample_rate), "-ac", "1",
+             "-i", "pipe:0", str(path)],
+            input=to_pcm16(audio), check=True, capture_output=True
+        )
+
+    def wait_for(self, path, forget: bool = True) -> bool:
+        """
+        Block until a pending encode of `path` (if any) has finished; False if it failed
+        The failure counts as reported and is forgotten, unless forget=False.
+        """
+        with self._pending_lock:
+            future = self._pending.get(str(path))
+        if future is not None:
+            future.exception()  # Waits without raising; the outcome is in _failed
+        with self._pending_lock:
+            failed = self._failed.pop(str(path), None) if forget else self._failed.get(str(path))
+        return failed is None
+
+    # ─── Playback ─────────────────────────────────────────────────────────────
+    def play(self, path, block: bool = False) -> bool:
+        """Queue a file for playback; with block=True wait until it has played"""
+        if self._player_thread is None or not self._player_thread.is_alive():
+            self._player_thread = threading.Thread(target=self._play_loop, name="dia-audio-player", daemon=True)
+            self._player_thread.start()
+        done: Future = Future()
+        self._playback.put((str(path), done))
+        return done.result() if block else True
+
+    def _player_for(self, fmt: str) -> Optional[List[str]]:
+        """Resolve (once per format) the first installed player that handles `fmt`"""
+        if fmt not in self._players:
+            command = None
+            if sys.platform == "win32" and fmt == "wav":
+                command = ["powershell", "-c"]
+            for binary, args, formats in PLAYERS.get(sys.platform, []):
+                if fmt in formats and shutil.which(binary):
+                    command = [binary, *args]
+                    break
+            self._players[fmt] = command
+        return self._players[fmt]
+
+    def _play_loop(self):
+        while True:
+            item = self._playback.get()
+            if item is None:
+                self._playback.task_done()
+                return
+            path, done = item
+            try:
+                done.set_result(self._play_file(path))
+            except Exception as e:
+                logger.error(f"Error playing audio: {e}")
+                done.set_result(False)
+            finally:
+                self._playback.task_done()
+
+    def _play_file(self, path: str) -> bool:
+        if not self.wait_for(path, forget=False):  # Left for the caller to report
+            logger.error(f"Not playing {path}: encoding failed")
+            return False
+        fmt = Path(path).suffix.lstrip(".").lower()
+        command = self._player_for(fmt)
+        if not command:
+            logger.warning(f"No audio player found for .{fmt}")
+            return False
+        if command[0] == "powershell":
+            command = [*command, f"(New-Object Media.SoundPlayer '{path}').PlaySync()"]
+        else:
+            command = [*command, path]
+        result = subprocess.run(command, capture_output=True)
+        if result.returncode != 0:
+            logger.warning(f"{command[0]} exited with {result.returncode}")
+            return False
+        self.stats["played"] += 1
+        logger.info(f"🔊 Played audio with {command[0]}")
+        return True
+
+    # ─── Lifecycle ────────────────────────────────────────────────────────────
+    def wait(self) -> Dict[str, BaseException]:
+        """Wait for every pending encode and everything queued for playback; returns (and forgets) failed writes"""
+        with self._pending_lock:
+            pending = list(self._pending.items())
+        for path, future in pending:
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Encoding {path} failed: {e}")
+        if self._player_thread and self._player_thread.is_alive():
+            self._playback.join()
+        with self._pending_lock:
+            failed, self._failed = self._failed, {}
+        return failed
+
+    def close(self):
+        self.wait()
+        if self._player_thread and self._player_thread.is_alive():
+            self._playback.put(None)
+            self._player_thread.join(timeout=1)
+        self._encoder.shutdown(wait=True)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Dia TTS Benchmark - real-time factor, latency and memory per engine configuration
+Runs a fixed short/medium/long corpus through DiaTTSEngine for every combination of
+generation params, batch size and CPU thread count, and writes a JSON report.
+--mock swaps model.generate for a timed synthetic generator so the harness runs in CI
+without torch or downloaded weights.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import itertools
+import tempfile
+import logging
+import multiprocessing
+from pathlib import Path
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+
+sys.path.append(str(Path(__file__).parent))
+import dia_tts_engine
+from dia_tts_engine import DiaTTSEngine, AUDIO_FRAMES_PER_SECOND, SPOKEN_WORDS_PER_SECOND, CPU_PERF_MODES
+
+# Set up logging (the engine's per-chunk progress lines would drown the summary)
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+logging.getLogger(dia_tts_engine.__name__).setLevel(logging.WARNING)
+
+# Constants
+PARAM_PRESETS = {
+    "default": {},
+    "fast": {"max_new_tokens": 1536, "guidance_scale": 2.0},
+    "precise": {"temperature": 1.2, "top_k": 30},
+}
+# Mock generate cost: seconds per audio frame for one sequence, and the share of that
+# cost each extra sequence in a batch adds (padding makes batching sub-linear)
+MOCK_SECONDS_PER_FRAME = 0.0004
+MOCK_BATCH_OVERHEAD = 0.3
+
+_PARAGRAPH = ("Thanks for the update on the quarterly report. I had a look at the numbers this "
+              "morning and most of it lines up with what we discussed last week. The only open "
+              "question is the travel budget, which still looks higher than expected.")
+
+CORPUS = [
+    {
+        "name": "short",
+        "kind": "text",
+        "text": "[S1] Your package has shipped and should arrive on Thursday. [S1]"
+    },
+    {
+        "name": "medium",
+        "kind": "email",
+        "subject": "Quarterly report",
+        "sender": "Dana Smith <dana@example.com>",
+        "content": _PARAGRAPH
+    },
+    {
+        "name": "long",
+        "kind": "email",
+        "subject": "Project retrospective notes",
+        "sender": "Team Updates <updates@example.com>",
+        "content": "\n\n".join([_PARAGRAPH] * 6)
+    },
+]
+
+class MockDiaTTSEngine(DiaTTSEngine):
+    """DiaTTSEngine with model loading and generate replaced by timed synthetic audio"""
+
+    def _check_availability(self) -> bool:
+        return True
+
+    def _load_model(self):
+        import numpy
+        dia_tts_engine.np = numpy  # The engine's audio helpers use the lazily imported module
+        self.device = "cpu"
+        self.model = "mock"
+
+    def _generate_batch(self, formatted_texts: List[str], voice: Optional[str] = None):
+        np = dia_tts_engine.np
+        frames = [
+            min(self.generation_params["max_new_tokens"],
+                int(len(text.split()) / SPOKEN_WORDS_PER_SECOND * AUDIO_FRAMES_PER_SECOND))
+            for text in formatted_texts
+        ]
+        batch_cost = 1 + MOCK_BATCH_OVERHEAD * (len(formatted_texts) - 1)
+        time.sleep(max(frames) * MOCK_SECONDS_PER_FRAME * batch_cost)
+        samples_per_frame = self.sample_rate / AUDIO_FRAMES_PER_SECOND
+        return [
+            (0.1 * np.sin(np.arange(int(f * samples_per_frame)) * 2 * np.pi * 220 / self.sample_rate))
+            .astype(np.float32)
+            for f in frames
+        ]
+
+def _instrument(engine: DiaTTSEngine) -> Dict[str, Any]:
+    """Wrap _generate_batch to record when each batch finishes and how much audio it made"""
+    record = {"batches": [], "started": None}
+    generate_batch = engine._generate_batch
+
+    def timed(formatted_texts, voice=None):
+        start_time = time.time()
+        segments = generate_batch(formatted_texts, voice)
+        record["batches"].append({
+            "finished": time.time(),
+            "seconds": time.time() - start_time,
+            "samples": sum(len(segment) for segment in segments)
+        })
+        return segments
+
+    engine._generate_batch = timed
+    return record
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+def run_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Load an engine with one configuration and run every corpus item through it"""
+    start_time = time.time()
+    engine_cls = MockDiaTTSEngine if config["mock"] else DiaTTSEngine
+    engine = engine_cls(config["checkpoint"], use_cache=False, cpu_perf_mode=config.get("cpu_perf"))
+    if config["threads"] and not config["mock"]:
+        import torch
+        torch.set_num_threads(config["threads"])
+    engine.set_generation_params(**PARAM_PRESETS[config["params"]])
+    engine.long_form_batch_size = config["batch_size"]
+
+    result = {"config": config, "items": []}
+    if not engine.ensure_loaded():
+        result["error"] = "engine not available"
+        return result
+    result["load_seconds"] = round(time.time() - start_time, 3)
+
+    record = _instrument(engine)
+    output_dir = Path(tempfile.mkdtemp(prefix="dia_bench_"))
+    for item in CORPUS:
+        if config["items"] and item["name"] not in config["items"]:
+            continue
+        record["batches"].clear()
+        output_file = output_dir / f"{item['name']}.wav"
+        item_start = time.time()
+        if item["kind"] == "text":
+            audio_file = engine.speak_text(item["text"], str(output_file))
+        else:
+            audio_file = engine.speak_email_content(item["subject"], item["sender"], item["content"],
+                                                    str(output_file), long_form=True)
+        engine.audio_sink.wait()
+        total_seconds = time.time() - item_start
+
+        generate_seconds = sum(batch["seconds"] for batch in record["batches"])
+        audio_seconds = sum(batch["samples"] for batch in record["batches"]) / engine.sample_rate
+        frames = audio_seconds * AUDIO_FRAMES_PER_SECOND
+        result["items"].append({
+            "name": item["name"],
+            "success": bool(audio_file),
+            "batches": len(record["batches"]),
+            # When the first generate batch finished; the non-streaming call returns audio only at the end
+            "first_batch_seconds": round(record["batches"][0]["finished"] - item_start, 3)
+            if record["batches"] else None,
+            "total_seconds": round(total_seconds, 3),
+            "generate_seconds": round(generate_seconds, 3),
+            "audio_seconds": round(audio_seconds, 3),
+            "real_time_factor": round(total_seconds / audio_seconds, 3) if audio_seconds else None,
+            "tokens_per_second": round(frames / generate_seconds, 1) if generate_seconds else None
+        })
+
+    result["peak_rss_mb"] = _peak_rss_mb()
+    engine.audio_sink.close()
+    return result
+
+def build_configs(params: List[str], batch_sizes: List[int], threads: List[int],
+                  items: List[str], mock: bool, checkpoint: str,
+                  cpu_perf: Optional[str]) -> List[Dict[str, Any]]:
+    return [
+        {"params": p, "batch_size": b, "threads": t, "items": items,
+         "mock": mock, "checkpoint": checkpoint, "cpu_perf": cpu_perf}
+        for p, b, t in itertools.product(params, batch_sizes, threads)
+    ]
+
+def run_benchmark(configs: List[Dict[str, Any]], isolate: bool = True) -> Dict[str, Any]:
+    """
+    Run every configuration; with isolate, each one gets a fresh spawned process so load
+    time and peak RSS are measured per configuration rather than accumulated
+    """
+    results = []
+    for i, config in enumerate(configs, 1):
+        print(f"⏱️  [{i}/{len(configs)}] params={config['params']} batch={config['batch_size']} "
+              f"threads={config['threads'] or 'default'}")
+        if isolate:
+            with multiprocessing.get_context("spawn").Pool(1) as pool:
+                results.append(pool.apply(run_config, (config,)))
+        else:
+            results.append(run_config(config))
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "host": platform.node(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "mock": configs[0]["mock"] if configs else False,
+            "isolated": isolate
+        },
+        "results": results
+    }
+
+def print_summary(report: Dict[str, Any]):
+    print(f"\n{'params':<9} {'batch':>5} {'threads':>7} {'item':<7} {'1st bat s':>9} {'RTF':>6} {'tok/s':>7} {'RSS MB':>7}")
+    for result in report["results"]:
+        config = result["config"]
+        for item in result["items"]:
+            print(f"{config['params']:<9} {config['batch_size']:>5} {config['threads'] or '-':>7} "
+                  f"{item['name']:<7} {item['first_batch_seconds'] or 0:>9.2f} {item['real_time_factor'] or 0:>6.2f} "
+                  f"{item['tokens_per_second'] or 0:>7.1f} {result.get('peak_rss_mb', 0):>7.1f}")
+
+def main():
+    import argparse
+
+    def int_list(value: str) -> List[int]:
+        return [int(v) for v in value.split(",") if v.strip()]
+
+    parser = argparse.ArgumentParser(description='Benchmark DiaTTSEngine configurations')
+    parser.add_argument('--params', default='default',
+                        help=f'Comma-separated generation presets: {",".join(PARAM_PRESETS)} (default: default)')
+    parser.add_argument('--batch-sizes', type=int_list, default=[1, 4], help='Comma-separated (default: 1,4)')
+    parser.add_argument('--threads', type=int_list, default=[0],
+                        help='Comma-separated torch thread counts, 0 = torch default (default: 0)')
+    parser.add_argument('--items', default='', help='Corpus items to run: short,medium,long (default: all)')
+    parser.add_argument('--checkpoint', default='nari-labs/Dia-1.6B-0626', help='Model checkpoint')
+    parser.add_argument('--cpu-perf', choices=CPU_PERF_MODES, help='CPU performance mode for every config')
+    parser.add_argument('--mock', action='store_true', help='Synthetic generate; no torch or weights needed')
+    parser.add_argument('--no-isolate', action='store_true', help='Run all configs in this process')
+    parser.add_argument('--output', '-o', default='dia_tts_benchmark.json', help='JSON report path')
+    args = parser.parse_args()
+
+    params = [p for p in args.params.split(",") if p]
+    unknown = [p for p in params if p not in PARAM_PRESETS]
+    if unknown:
+        parser.error(f"Unknown params preset(s): {', '.join(unknown)}")
+
+    items = [i for i in args.items.split(",") if i]
+    configs = build_configs(params, args.batch_sizes, args.threads, items,
+                            args.mock, args.checkpoint, args.cpu_perf)
+    report = run_benchmark(configs, isolate=not args.no_isolate)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_summary(report)
+    print(f"\n📊 Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -5,41 +5,276 @@ Based on: https://github.com/nari-labs/dia
 """
 
 import os
+import re
 import sys
-import subprocess
+import queue
+import shutil
+import hashlib
 import tempfile
+import threading
 import time
 import logging
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Callable
+from importlib.util import find_spec
 import json
 
-try:
+sys.path.append(str(Path(__file__).parent))
+from dia_audio_sink import AudioSink
+
+# torch/transformers take seconds to import, so only check they are installed here;
+# _import_backend() pulls them in on first generate
+HF_TRANSFORMERS_AVAILABLE = all(find_spec(name) is not None for name in ("numpy", "torch", "transformers"))
+if not HF_TRANSFORMERS_AVAILABLE:
+    print("Warning: transformers not available. Install with: pip install transformers torch")
+
+np = None
+torch = None
+AutoProcessor = None
+DiaForConditionalGeneration = None
+
+def _import_backend():
+    """Import numpy, torch and the Dia classes into module globals (once)"""
+    global np, torch, AutoProcessor, DiaForConditionalGeneration
+    if DiaForConditionalGeneration is not None:
+        return
+    import numpy as np
     import torch
     from transformers import AutoProcessor, DiaForConditionalGeneration
-    HF_TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    HF_TRANSFORMERS_AVAILABLE = False
-    print("Warning: transformers not available. Install with: pip install transformers torch")
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Dia's DAC codec produces ~86 audio frames per second of 44.1 kHz audio
+AUDIO_FRAMES_PER_SECOND = 86
+DEFAULT_SAMPLE_RATE = 44100
+# Narration pace used to size long-form chunks against max_new_tokens
+SPOKEN_WORDS_PER_SECOND = 2.5
+# Sentence ends, keeping any "(pause)" marker added by _clean_text_for_dia with its sentence
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?] \(pause\))\s+|(?<=[.!?])\s+(?!\(pause\))')
+SPEAKER_TAG = re.compile(r'(\[S[12]\])')
+# Persistent audio cache (override the location with DIA_TTS_CACHE_DIR)
+DEFAULT_CACHE_DIR = Path(os.environ.get("DIA_TTS_CACHE_DIR", Path.home() / ".cache" / "dia_tts"))
+DEFAULT_CACHE_MAX_MB = 512
+# Short fixed sentence used to measure the real-time factor of the CPU performance mode
+RTF_PROBE_TEXT = "[S1] This is a short sentence used to measure how fast speech is generated. [S1]"
+CPU_PERF_MODES = ("auto", "int8", "bf16")
+
+def _cpu_flags() -> set:
+    """CPU feature flags from /proc/cpuinfo (empty where unavailable)"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+def physical_core_count() -> int:
+    """Physical cores available to this process (hyperthread siblings counted once)"""
+    logical = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        cores = set()
+        physical_id = core_id = None
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                if key == "physical id":
+                    physical_id = value.strip()
+                elif key == "core id":
+                    core_id = value.strip()
+                elif not line.strip() and core_id is not None:
+                    cores.add((physical_id, core_id))
+                    physical_id = core_id = None
+        if core_id is not None:
+            cores.add((physical_id, core_id))
+        if cores:
+            return max(1, min(len(cores), logical))
+    except OSError:
+        pass
+    return logical
+
+class AudioCache:
+    """
+    Content-addressed store of generated waveforms
+    Each entry is a float32 .npy file named by the SHA-256 of everything that decides
+    the audio (text, checkpoint, voice prompt, generation params). File mtime is the
+    LRU clock: hits touch the file and the directory is trimmed to max_bytes.
+    """
+    
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR, max_mb: int = DEFAULT_CACHE_MAX_MB):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = sum(f.stat().st_size for f in self.cache_dir.glob("*.npy"))
+
+    @staticmethod
+    def make_key(text: str, checkpoint: str, voice_key: str, params: Dict[str, Any]) -> str:
+        payload = json.dumps({
+            "text": text,
+            "checkpoint": checkpoint,
+            "voice": voice_key,
+            "params": params
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npy"
+
+    def get(self, key: str) -> Optional["np.ndarray"]:
+        import numpy as np
+        path = self._path(key)
+        try:
+            audio = np.load(path)
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return audio
+
+    def put(self, key: str, audio: "np.ndarray"):
+        import numpy as np
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, audio.astype(np.float32))
+        with self._lock:
+            previous = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+            self._size += path.stat().st_size - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is 90% of its budget"""
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self.cache_dir.glob("*.npy"), key=lambda f: f.stat().st_mtime)
+        removed = 0
+        for entry in entries:
+            if self._size <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                entry.unlink()
+            except OSError:
+                continue
+            self._size -= size
+            removed += 1
+        if removed:
+            logger.info(f"🧹 Evicted {removed} cached audio segments")
+
+    def clear(self):
+        with self._lock:
+            for entry in self.cache_dir.glob("*.npy"):
+                entry.unlink()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cache_dir": str(self.cache_dir),
+            "entries": len(list(self.cache_dir.glob("*.npy"))),
+            "size_mb": round(self._size / (1024 * 1024), 1),
+            "max_mb": self.max_bytes // (1024 * 1024),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+class VoiceProfileRegistry:
+    """
+    Named voice-clone prompts stored on disk
+    A profile keeps a copy of the reference audio and its transcript plus, per model
+    checkpoint, the processor's decoder prompt tensors (DAC codes with the delay pattern
+    applied), so the reference audio is encoded once instead of on every request.
+    """
+    
+    NAME_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+$')
+    
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, name: str) -> Path:
+        if not self.NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid voice profile name: {name!r}")
+        return self.root / name
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._dir(name) / "profile.json") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        return [profile for profile in (self.get(d.name) for d in sorted(self.root.iterdir()) if d.is_dir())
+                if profile]
+
+    def create(self, name: str, audio_path: str, transcript: str) -> Dict[str, Any]:
+        """Store the reference audio and transcript; prompt tensors are added on first use"""
+        profile_dir = self._dir(name)
+        if profile_dir.exists():
+            shutil.rmtree(profile_dir)  # Re-registering replaces the voice and its prompts
+        profile_dir.mkdir(parents=True)
+        
+        reference = f"reference{Path(audio_path).suffix or '.wav'}"
+        shutil.copy2(audio_path, profile_dir / reference)
+        with open(profile_dir / reference, "rb") as f:
+            audio_sha256 = hashlib.sha256(f.read()).hexdigest()
+        
+        profile = {
+            "name": name,
+            "transcript": transcript,
+            "reference": reference,
+            "audio_sha256": audio_sha256,
+            # Same role as DiaTTSEngine._voice_key: part of every audio cache key
+            "voice_key": hashlib.sha256((transcript + audio_sha256).encode("utf-8")).hexdigest(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        with open(profile_dir / "profile.json", "w") as f:
+            json.dump(profile, f, indent=2)
+        return profile
+
+    def reference_path(self, profile: Dict[str, Any]) -> Path:
+        return self._dir(profile["name"]) / profile["reference"]
+
+    def prompt_path(self, name: str, checkpoint: str) -> Path:
+        return self._dir(name) / f"prompt-{hashlib.sha256(checkpoint.encode('utf-8')).hexdigest()[:12]}.pt"
+
+    def delete(self, name: str) -> bool:
+        profile_dir = self._dir(name)
+        if not profile_dir.exists():
+            return False
+        shutil.rmtree(profile_dir)
+        return True
+
 class DiaTTSEngine:
     """
     High-quality TTS engine using Nari Labs Dia model
     Supports both Hugging Face Transformers and CLI interfaces
     """
     
-    def __init__(self, model_checkpoint: str = "nari-labs/Dia-1.6B-0626"):
+    def __init__(self, model_checkpoint: str = "nari-labs/Dia-1.6B-0626",
+                 use_cache: bool = True, cache_dir: Optional[str] = None,
+                 cache_max_mb: int = DEFAULT_CACHE_MAX_MB,
+                 cpu_perf_mode: Optional[str] = None, report_rtf: bool = False):
         self.model_checkpoint = model_checkpoint
-        self.device = self._get_device()
+        self.device = None  # Resolved when the model is loaded
         self.processor = None
         self.model = None
+        self._load_lock = threading.Lock()
         self.temp_dir = Path(tempfile.gettempdir()) / "dia_tts"
         self.temp_dir.mkdir(exist_ok=True)
         
+        # Output formats and playback (encoding and players run off the generation thread)
+        self.audio_sink = AudioSink()
+        
         # Generation parameters
         self.generation_params = {
             "max_new_tokens": 3072,
@@ -49,11 +284,28 @@ class DiaTTSEngine:
             "top_k": 45
         }
         
-        # Check availability
-        self.available = self._check_availability()
+        # Long-form narration: chunks per padded generate call, and overlap when stitching
+        self.long_form_batch_size = 4
+        self.crossfade_ms = 60
         
-        if self.available and HF_TRANSFORMERS_AVAILABLE:
-            self._load_model()
+        # Generated segments are reused across calls (same text, voice and params)
+        self.audio_cache = AudioCache(cache_dir or DEFAULT_CACHE_DIR, cache_max_mb) if use_cache else None
+        self._voice_keys: Dict[Tuple[str, float, int], str] = {}
+        
+        # Voice-clone profiles: reference audio is encoded once and the prompt reused
+        self.voice_profiles = VoiceProfileRegistry(Path(cache_dir or DEFAULT_CACHE_DIR) / "voices")
+        self.voice_profile: Optional[str] = None
+        self._voice_prompts: Dict[str, Dict[str, Any]] = {}
+        
+        # Opt-in CPU acceleration (auto/int8/bf16), applied when the model loads on CPU
+        if cpu_perf_mode and cpu_perf_mode not in CPU_PERF_MODES:
+            raise ValueError(f"cpu_perf_mode must be one of {CPU_PERF_MODES}")
+        self.cpu_perf_mode = cpu_perf_mode
+        self.report_rtf = report_rtf
+        self.perf_report: Dict[str, Any] = {}
+        
+        # Check availability (the model itself is loaded on first generation, see ensure_loaded)
+        self.available = self._check_availability()
 
     def _get_device(self) -> str:
         """Determine the best device to use"""
@@ -65,35 +317,115 @@ class DiaTTSEngine:
             return "cpu"
 
     def _check_availability(self) -> bool:
-        """Check if Dia TTS is available"""
+        """Check if Dia TTS can be used (libraries installed; no weights are touched)"""
         if not HF_TRANSFORMERS_AVAILABLE:
             logger.warning("Transformers library not available")
             return False
-        
-        try:
-            # Try to access the model info
-            from transformers import AutoProcessor
-            AutoProcessor.from_pretrained(self.model_checkpoint)
-            return True
-        except Exception as e:
-            logger.warning(f"Dia model not accessible: {e}")
-            return False
+        return True
 
     def _load_model(self):
-        """Load the Dia model and processor"""
+        """Import the backend and load the Dia processor and model (once)"""
+        with self._load_lock:
+            if self.model is not None or not self.available:
+                return
+            try:
+                start_time = time.time()
+                _import_backend()
+                self.device = self._get_device()
+                if self.cpu_perf_mode and self.device == "cpu":
+                    # Thread counts must be set before torch starts its inter-op pool
+                    self._configure_cpu_threads()
+                logger.info(f"Loading Dia model on {self.device}...")
+                self.processor = AutoProcessor.from_pretrained(self.model_checkpoint)
+                # safetensors are memory-mapped and placed straight on the target device
+                # instead of being materialised on CPU first and copied with .to()
+                self.model = DiaForConditionalGeneration.from_pretrained(
+                    self.model_checkpoint,
+                    use_safetensors=True,
+                    device_map=self.device
+                )
+                logger.info(f"✅ Dia model loaded successfully in {time.time() - start_time:.1f}s")
+                if self.cpu_perf_mode and self.device == "cpu":
+                    self._apply_cpu_performance_mode()
+                elif self.report_rtf:
+                    self.perf_report["rtf"] = self.measure_rtf()
+                    logger.info(f"📏 RTF on {self.device} (eager): {self.perf_report['rtf']:.2f}")
+            except Exception as e:
+                logger.error(f"Failed to load Dia model: {e}")
+                self.available = False
+                self.model = None
+
+    # ─── CPU Performance Mode ─────────────────────────────────────────────────
+    def _configure_cpu_threads(self):
+        """Pin intra-op threads to physical cores; hyperthreads only add contention for GEMMs"""
+        cores = physical_core_count()
+        torch.set_num_threads(cores)
         try:
-            logger.info(f"Loading Dia model on {self.device}...")
-            self.processor = AutoProcessor.from_pretrained(self.model_checkpoint)
-            self.model = DiaForConditionalGeneration.from_pretrained(
-                self.model_checkpoint
-            ).to(self.device)
-            logger.info("✅ Dia model loaded successfully")
-        except Exception as e:
-            logger.error(f"Failed to load Dia model: {e}")
-            self.available = False
+            torch.set_num_interop_threads(min(2, cores))
+        except RuntimeError:
+            # Already fixed once parallel work has run in this process
+            pass
+        self.perf_report["threads"] = {"intra_op": torch.get_num_threads(),
+                                       "inter_op": torch.get_num_interop_threads()}
+        logger.info(f"🧵 Using {cores} intra-op threads (physical cores)")
+
+    def _resolve_cpu_precision(self) -> str:
+        """bf16 when the CPU has native bf16 math (AVX512-BF16/AMX), int8 otherwise"""
+        if self.cpu_perf_mode != "auto":
+            return self.cpu_perf_mode
+        flags = _cpu_flags()
+        return "bf16" if {"avx512_bf16", "amx_bf16"} & flags else "int8"
+
+    def _apply_cpu_performance_mode(self):
+        """Quantize or downcast the model, compile it where that helps, and report RTF"""
+        if self.report_rtf:
+            self.perf_report["rtf_before"] = self.measure_rtf()
+            logger.info(f"📏 RTF before CPU performance mode: {self.perf_report['rtf_before']:.2f}")
+        
+        precision = self._resolve_cpu_precision()
+        if precision == "int8":
+            # Dynamic int8 for Linear layers: weights quantized once, activations per call
+            self.model = torch.ao.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        else:
+            self.model = self.model.to(torch.bfloat16)
+        self.perf_report["precision"] = precision
+        
+        # Inductor does not handle dynamically quantized Linear modules, so compile bf16 only
+        compiled = False
+        if precision == "bf16" and hasattr(torch, "compile"):
+            try:
+                self.model.forward = torch.compile(self.model.forward, dynamic=True)
+                compiled = True
+            except Exception as e:
+                logger.warning(f"torch.compile unavailable, staying in eager mode: {e}")
+        self.perf_report["compiled"] = compiled
+        logger.info(f"⚡ CPU performance mode: {precision}{' + torch.compile' if compiled else ''}")
+        
+        if self.report_rtf:
+            if compiled:
+                self.measure_rtf()  # Warm-up run pays the compilation cost
+            self.perf_report["rtf_after"] = self.measure_rtf()
+            logger.info(f"📏 RTF after CPU performance mode: {self.perf_report['rtf_after']:.2f} "
+                        f"(was {self.perf_report['rtf_before']:.2f})")
+
+    def measure_rtf(self, text: str = RTF_PROBE_TEXT) -> float:
+        """Real-time factor of one uncached generation: seconds spent per second of audio"""
+        start_time = time.time()
+        audio = self._generate_batch([text])[0]
+        elapsed = time.time() - start_time
+        duration = len(audio) / self.sample_rate
+        return elapsed / duration if duration else float("inf")
 
     def is_available(self) -> bool:
-        """Check if the TTS engine is ready to use"""
+        """Check the backend is installed and the model has not failed to load (never loads it)"""
+        return self.available
+
+    def ensure_loaded(self) -> bool:
+        """Load the model now unless it already is; False if it cannot be loaded"""
+        if self.available and self.model is None:
+            self._load_model()
         return self.available and self.model is not None
 
     def speak_text(self, text: str, output_file: Optional[str] = None, 
@@ -116,13 +448,19 @@ class DiaTTSEngine:
             return None
 
         try:
-            # Prepare text with proper speaker tags
-            formatted_text = self._format_text_for_dia(text, voice_clone_transcript)
+            # Prepare text with proper speaker tags. Reference audio becomes an (auto-named)
+            # voice profile whose encoded prompt carries the transcript.
+            voice = self.voice_profile
+            if voice_clone_audio:
+                voice = self._ensure_clone_profile(voice_clone_audio, voice_clone_transcript or "")
+                formatted_text = self._format_text_for_dia(text)
+            else:
+                formatted_text = self._format_text_for_dia(text, voice_clone_transcript)
             
             # Generate audio
-            audio_path = self._generate_audio(formatted_text, output_file)
+            audio_path = self._generate_audio(formatted_text, output_file, voice)
             
-            if audio_path and os.path.exists(audio_path):
+            if audio_path:
                 logger.info(f"✅ Generated audio: {audio_path}")
                 return audio_path
             else:
@@ -134,7 +472,8 @@ class DiaTTSEngine:
             return None
 
     def speak_email_content(self, subject: str, sender: str, content: str, 
-                           output_file: Optional[str] = None) -> Optional[str]:
+                           output_file: Optional[str] = None,
+                           long_form: bool = False) -> Optional[str]:
         """
         Convert email content to speech with proper formatting
         
@@ -143,13 +482,65 @@ class DiaTTSEngine:
             sender: Email sender  
             content: Email content
             output_file: Optional output file path
+            long_form: Narrate the whole content in chunks instead of truncating it
+            
+        Returns:
+            Path to generated audio file or None if failed
+        """
+        if not self.is_available():
+            logger.error("Dia TTS engine not available")
+            return None
+
+        # Create a natural email announcement. Each part is generated as its own segment
+        # so fixed phrases ("End of email.") and repeated senders come from the cache.
+        max_words = None if long_form else 200
+        parts = self._email_script_parts(subject, sender, content, max_words)
+        chunks = [chunk for part in parts for chunk in self._chunk_script(part)]
+        try:
+            audio_path = self._synthesize_chunks(chunks, output_file)
+            logger.info(f"✅ Generated email audio: {audio_path}")
+            return audio_path
+        except Exception as e:
+            logger.error(f"Error in email text-to-speech: {e}")
+            return None
+
+    def speak_long_text(self, text: str, output_file: Optional[str] = None,
+                        batch_size: Optional[int] = None, clean: bool = True) -> Optional[str]:
+        """
+        Convert arbitrarily long text to speech without truncation
+        
+        The text is split at paragraph and sentence boundaries into chunks that fit
+        max_new_tokens, the chunks are generated `batch_size` at a time in padded
+        generate calls, and the pieces are joined with short crossfades.
+        
+        Args:
+            text: Text (optionally with [S1]/[S2] tags) to convert to speech
+            output_file: Optional output file path
+            batch_size: Chunks per generate call (default: self.long_form_batch_size)
+            clean: Normalise the text first (skip for scripts that are already cleaned)
             
         Returns:
             Path to generated audio file or None if failed
         """
-        # Create a natural email announcement
-        email_script = self._create_email_script(subject, sender, content)
-        return self.speak_text(email_script, output_file)
+        if not self.is_available():
+            logger.error("Dia TTS engine not available")
+            return None
+
+        try:
+            if clean:
+                text = self._clean_text_for_dia(text, max_words=None, keep_paragraphs=True)
+            chunks = self._chunk_script(text)
+            if not chunks:
+                logger.error("Nothing to speak after cleaning text")
+                return None
+            
+            audio_path = self._synthesize_chunks(chunks, output_file, batch_size)
+            logger.info(f"✅ Generated long-form audio: {audio_path}")
+            return audio_path
+            
+        except Exception as e:
+            logger.error(f"Error in long-form text-to-speech: {e}")
+            return None
 
     def _format_text_for_dia(self, text: str, voice_clone_transcript: Optional[str] = None) -> List[str]:
         """
@@ -177,15 +568,20 @@ class DiaTTSEngine:
         
         return formatted_texts
 
-    def _clean_text_for_dia(self, text: str) -> str:
-        """Clean text for optimal Dia processing"""
-        # Remove excessive whitespace
-        text = " ".join(text.split())
+    def _clean_text_for_dia(self, text: str, max_words: Optional[int] = 200,
+                            keep_paragraphs: bool = False) -> str:
+        """Clean text for optimal Dia processing (max_words=None disables truncation)"""
+        # Remove excessive whitespace (optionally keeping blank-line paragraph breaks)
+        if keep_paragraphs:
+            paragraphs = re.split(r'\n\s*\n', text)
+            text = "\n\n".join(" ".join(p.split()) for p in paragraphs if p.strip())
+        else:
+            text = " ".join(text.split())
         
         # Limit length to reasonable speech duration (about 20 seconds max)
         words = text.split()
-        if len(words) > 200:  # About 20 seconds of speech
-            text = " ".join(words[:200]) + "..."
+        if max_words is not None and len(words) > max_words:  # About 20 seconds of speech
+            text = " ".join(words[:max_words]) + "..."
         
         # Handle common email artifacts
         text = text.replace("=\n", "")  # Remove line breaks
@@ -229,8 +625,14 @@ class DiaTTSEngine:
             
         return result
 
-    def _create_email_script(self, subject: str, sender: str, content: str) -> str:
-        """Create a natural email reading script"""
+    def _create_email_script(self, subject: str, sender: str, content: str,
+                             max_words: Optional[int] = 200) -> str:
+        """Create a natural email reading script (max_words=None keeps the full body)"""
+        return " ".join(self._email_script_parts(subject, sender, content, max_words))
+
+    def _email_script_parts(self, subject: str, sender: str, content: str,
+                            max_words: Optional[int] = 200) -> List[str]:
+        """Email script as separately cacheable parts: announcement, body, sign-off"""
         
         # Extract sender name (remove email address if present)
         sender_name = sender.split('<')[0].strip().strip('"')
@@ -238,77 +640,394 @@ class DiaTTSEngine:
             sender_name = sender.split('@')[0] if '@' in sender else sender
         
         # Create natural announcement
-        script_parts = [
-            f"[S1] You have a new email from {sender_name}.",
-            f"[S2] The subject is: {subject}.",
+        return [
+            f"[S1] You have a new email from {sender_name}. "
+            f"[S2] The subject is: {subject}. "
             f"[S1] Here's the message content:",
-            f"[S2] {self._clean_text_for_dia(content)}",
+            f"[S2] {self._clean_text_for_dia(content, max_words, keep_paragraphs=max_words is None)}",
             "[S1] End of email."
         ]
-        
-        return " ".join(script_parts)
 
-    def _generate_audio(self, formatted_texts: List[str], output_file: Optional[str] = None) -> Optional[str]:
-        """Generate audio using the Dia model"""
-        try:
-            # Prepare output file
-            if not output_file:
-                timestamp = int(time.time() * 1000)
-                output_file = self.temp_dir / f"dia_tts_{timestamp}.mp3"
-            
-            # Process text
-            inputs = self.processor(
-                text=formatted_texts,
-                padding=True,
-                return_tensors="pt"
-            ).to(self.device)
-            
-            # Generate audio
-            logger.info("🎤 Generating speech with Dia model...")
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs,
-                    **self.generation_params
-                )
-            
-            # Decode and save
-            audio_outputs = self.processor.batch_decode(outputs)
-            self.processor.save_audio(audio_outputs, str(output_file))
-            
-            return str(output_file)
+    def speak_streaming(self, text: str, output_file: Optional[str] = None, play: bool = True,
+                        queue_size: int = 2, clean: bool = True,
+                        on_chunk: Optional[Callable[[int, str], None]] = None) -> Optional[str]:
+        """
+        Convert text to speech chunk by chunk, playing each chunk while the next generates
+        
+        A producer thread runs generate() one chunk at a time into a bounded queue; this
+        thread writes every finished chunk to a WAV file and plays it (or hands it to
+        `on_chunk(index, path)`), so time-to-first-audio is a single chunk's latency.
+        The bounded queue stops the producer from running far ahead of playback.
+        
+        Args:
+            text: Text (optionally with [S1]/[S2] tags) to convert to speech
+            output_file: Optional path for the full stitched audio
+            play: Play chunks as they arrive
+            queue_size: Finished chunks allowed to wait for the consumer
+            clean: Normalise the text first (skip for scripts that are already cleaned)
+            on_chunk: Optional callback receiving each chunk's index and WAV path
             
-        except Exception as e:
-            logger.error(f"Audio generation failed: {e}")
+        Returns:
+            Path to the full audio file (if output_file was given) or the last chunk, None if failed
+        """
+        if not self.is_available():
+            logger.error("Dia TTS engine not available")
             return None
 
-    def play_audio(self, audio_file: str) -> bool:
-        """Play the generated audio file"""
-        try:
-            # Try different audio players based on platform
-            players = []
-            
-            if sys.platform == "darwin":  # macOS
-                players = ["afplay"]
-            elif sys.platform == "linux":
-                players = ["aplay", "paplay", "mpg123", "vlc"]
-            elif sys.platform == "win32":
-                players = ["powershell", "-c", "(New-Object Media.SoundPlayer '{}').PlaySync()"]
-            
-            for player in players:
+        if clean:
+            text = self._clean_text_for_dia(text, max_words=None, keep_paragraphs=True)
+        chunks = self._chunk_script(text)
+        if not chunks:
+            logger.error("Nothing to speak after cleaning text")
+            return None
+
+        audio_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        stop = threading.Event()
+        done = object()
+
+        def offer(item) -> bool:
+            # Block while the consumer is behind, but give up once it has stopped
+            while not stop.is_set():
                 try:
-                    if player == "powershell":
-                        subprocess.run([player, "-c", f"(New-Object Media.SoundPlayer '{audio_file}').PlaySync()"], 
-                                     check=True, capture_output=True)
-                    else:
-                        subprocess.run([player, audio_file], check=True, capture_output=True)
-                    logger.info(f"🔊 Playing audio with {player}")
+                    audio_queue.put(item, timeout=0.5)
                     return True
-                except (subprocess.CalledProcessError, FileNotFoundError):
+                except queue.Full:
                     continue
-            
-            logger.warning("No audio player found")
             return False
+
+        def produce():
+            try:
+                for index, chunk in enumerate(chunks):
+                    if stop.is_set() or not offer((index, self._generate_cached([chunk])[0])):
+                        return
+            except Exception as e:
+                offer(e)
+            finally:
+                offer(done)
+
+        producer = threading.Thread(target=produce, name="dia-tts-producer", daemon=True)
+        start_time = time.time()
+        producer.start()
+        logger.info(f"🌊 Streaming {len(chunks)} chunks...")
+
+        segments = []
+        last_chunk_file = None
+        stream_id = int(time.time() * 1000)
+        try:
+            while True:
+                item = audio_queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                index, segment = item
+                if index == 0:
+                    logger.info(f"⏱️  First audio after {time.time() - start_time:.2f}s")
+                segments.append(segment)
+                last_chunk_file = self._save_waveform(
+                    segment, self.temp_dir / f"dia_stream_{stream_id}_{index:03d}.wav")
+                if on_chunk:
+                    on_chunk(index, last_chunk_file)
+                if play:
+                    # Queue and move on: the next chunk is usually ready before this one ends
+                    self.play_audio(last_chunk_file, block=False)
+        except Exception as e:
+            logger.error(f"Error in streaming text-to-speech: {e}")
+            return None
+        finally:
+            stop.set()
+            producer.join(timeout=1)
+
+        logger.info(f"✅ Streamed {len(segments)} chunks in {time.time() - start_time:.2f}s")
+        if output_file:
+            audio = self._crossfade_concat(segments, self.sample_rate, self.crossfade_ms)
+            return self._save_waveform(audio, output_file, wait=False)
+        return last_chunk_file
+
+    def _max_words_per_chunk(self) -> int:
+        """Words that fit in one generation, with headroom so chunks are not cut off"""
+        seconds = self.generation_params["max_new_tokens"] / AUDIO_FRAMES_PER_SECOND
+        return max(10, int(seconds * SPOKEN_WORDS_PER_SECOND * 0.8))
+
+    def _chunk_script(self, script: str, max_words: Optional[int] = None) -> List[str]:
+        """
+        Split a (possibly tagged) script into Dia-ready chunks
+        
+        Chunks break at paragraph ends first, then sentence ends, and only split a
+        sentence by words when it alone exceeds the budget. Speaker tags are kept as
+        written, so a chunk that continues an [S2] turn opens on [S2] and every line keeps
+        its voice; each chunk ends with a speaker tag.
+        """
+        max_words = max_words or self._max_words_per_chunk()
+        
+        # (speaker, sentence, ends_paragraph) units in reading order
+        units: List[Tuple[str, str, bool]] = []
+        speaker = "[S1]"
+        for part in SPEAKER_TAG.split(script):
+            if SPEAKER_TAG.fullmatch(part):
+                speaker = part
+                continue
+            paragraphs = [p for p in re.split(r'\n\s*\n', part) if p.strip()]
+            for paragraph in paragraphs:
+                sentences = [s for s in SENTENCE_BOUNDARY.split(" ".join(paragraph.split())) if s.strip()]
+                for i, sentence in enumerate(sentences):
+                    words = sentence.split()
+                    for start in range(0, len(words), max_words):
+                        piece = " ".join(words[start:start + max_words])
+                        last = i == len(sentences) - 1 and start + max_words >= len(words)
+                        units.append((speaker, piece, last))
+        
+        chunks = []
+        current: List[Tuple[str, str]] = []
+        current_words = 0
+        for speaker, sentence, ends_paragraph in units:
+            words = len(sentence.split())
+            if current and current_words + words > max_words:
+                chunks.append(self._finish_chunk(current))
+                current, current_words = [], 0
+            current.append((speaker, sentence))
+            current_words += words
+            # Prefer paragraph boundaries once a chunk is reasonably full
+            if ends_paragraph and current_words >= max_words // 2:
+                chunks.append(self._finish_chunk(current))
+                current, current_words = [], 0
+        if current:
+            chunks.append(self._finish_chunk(current))
+        
+        return chunks
+
+    def _finish_chunk(self, parts: List[Tuple[str, str]]) -> str:
+        """Render (speaker, sentence) parts as one tagged chunk, opening on its first speaker"""
+        text = []
+        previous = None
+        for speaker, sentence in parts:
+            if speaker != previous:
+                text.append(speaker)
+                previous = speaker
+            text.append(sentence)
+        # Ending on a speaker tag improves the audio quality of the last words
+        text.append(previous)
+        return " ".join(text)
+
+    def _generate_audio(self, formatted_texts: List[str], output_file: Optional[str] = None,
+                        voice: Optional[str] = None) -> Optional[str]:
+        """Generate audio using the Dia model (served from the audio cache when possible)"""
+        try:
+            segments = self._generate_cached(formatted_texts, voice)
+            audio = self._crossfade_concat(segments, self.sample_rate, self.crossfade_ms)
+            return self._save_waveform(audio, output_file, wait=False)
             
+        except Exception as e:
+            logger.error(f"Audio generation failed: {e}")
+            return None
+
+    def _synthesize_chunks(self, chunks: List[str], output_file: Optional[str] = None,
+                           batch_size: Optional[int] = None) -> str:
+        """Generate chunks `batch_size` at a time, stitch them and write the result"""
+        batch_size = batch_size or self.long_form_batch_size
+        logger.info(f"📚 {len(chunks)} chunks, batch size {batch_size}")
+        
+        segments = []
+        for start in range(0, len(chunks), batch_size):
+            batch = chunks[start:start + batch_size]
+            logger.info(f"🎤 Generating chunks {start + 1}-{start + len(batch)} of {len(chunks)}...")
+            segments.extend(self._generate_cached(batch))
+        
+        audio = self._crossfade_concat(segments, self.sample_rate, self.crossfade_ms)
+        return self._save_waveform(audio, output_file, wait=False)
+
+    def _generate_cached(self, formatted_texts: List[str], voice: Optional[str] = None) -> List["np.ndarray"]:
+        """
+        Look every text up in the audio cache and generate only the misses, in one batch
+        `voice` names a voice profile (default: self.voice_profile).
+        """
+        voice = voice or self.voice_profile
+        if self.audio_cache is None:
+            return self._generate_batch(formatted_texts, voice)
+        
+        voice_key = ""
+        if voice:
+            profile = self.voice_profiles.get(voice)
+            if not profile:
+                raise ValueError(f"Unknown voice profile: {voice}")
+            voice_key = profile["voice_key"]
+        keys = [
+            AudioCache.make_key(text, self.model_checkpoint, voice_key, self.generation_params)
+            for text in formatted_texts
+        ]
+        segments = [self.audio_cache.get(key) for key in keys]
+        misses = [i for i, segment in enumerate(segments) if segment is None]
+        if len(misses) < len(segments):
+            logger.info(f"💾 Reused {len(segments) - len(misses)}/{len(segments)} cached segments")
+        
+        if misses:
+            generated = self._generate_batch([formatted_texts[i] for i in misses], voice)
+            for i, segment in zip(misses, generated):
+                segments[i] = segment
+                self.audio_cache.put(keys[i], segment)
+        return segments
+
+    def _voice_key(self, voice_clone_audio: Optional[str], voice_clone_transcript: Optional[str]) -> str:
+        """Content hash of the voice-clone prompt (memoised per file path, mtime and size)"""
+        if not voice_clone_audio and not voice_clone_transcript:
+            return ""
+        digest = hashlib.sha256((voice_clone_transcript or "").encode("utf-8"))
+        if voice_clone_audio:
+            stat = os.stat(voice_clone_audio)
+            memo_key = (os.path.abspath(voice_clone_audio), stat.st_mtime, stat.st_size)
+            if memo_key not in self._voice_keys:
+                with open(voice_clone_audio, "rb") as f:
+                    self._voice_keys[memo_key] = hashlib.sha256(f.read()).hexdigest()
+            digest.update(self._voice_keys[memo_key].encode("ascii"))
+        return digest.hexdigest()
+
+    # ─── Voice Profiles ───────────────────────────────────────────────────────
+    def register_voice_profile(self, name: str, audio_path: str, transcript: str) -> Dict[str, Any]:
+        """
+        Save a reference recording and its transcript (with [S1]/[S2] tags) as a named voice
+        The prompt is encoded right away when the model is already loaded, otherwise on first use.
+        """
+        profile = self.voice_profiles.create(name, audio_path, transcript)
+        self._voice_prompts.pop(name, None)
+        if self.model is not None:
+            self._voice_prompt(name)
+        logger.info(f"🎙️  Registered voice profile '{name}'")
+        return profile
+
+    def use_voice_profile(self, name: Optional[str]):
+        """Make `name` the default voice for every generation (None for the model's own voices)"""
+        if name and not self.voice_profiles.get(name):
+            raise ValueError(f"Unknown voice profile: {name}")
+        self.voice_profile = name
+
+    def _ensure_clone_profile(self, audio_path: str, transcript: str) -> str:
+        """Auto-named profile for an ad-hoc --voice-clone file, created once per audio+transcript"""
+        name = f"clone-{self._voice_key(audio_path, transcript)[:16]}"
+        if not self.voice_profiles.get(name):
+            self.voice_profiles.create(name, audio_path, transcript)
+        return name
+
+    def _voice_prompt(self, name: str) -> Dict[str, Any]:
+        """Decoder prompt tensors for a profile: memory, then disk, then a one-off DAC encode"""
+        if name in self._voice_prompts:
+            return self._voice_prompts[name]
+        
+        profile = self.voice_profiles.get(name)
+        if not profile:
+            raise ValueError(f"Unknown voice profile: {name}")
+        
+        prompt_path = self.voice_profiles.prompt_path(name, self.model_checkpoint)
+        if prompt_path.exists():
+            tensors = torch.load(prompt_path, weights_only=True)
+        else:
+            logger.info(f"🎙️  Encoding reference audio for voice '{name}'...")
+            tensors = self._encode_voice_prompt(profile)
+            torch.save(tensors, prompt_path)
+        
+        prompt = {"transcript": profile["transcript"], **tensors}
+        self._voice_prompts[name] = prompt
+        return prompt
+
+    def _encode_voice_prompt(self, profile: Dict[str, Any]) -> Dict[str, "torch.Tensor"]:
+        """Run the reference audio through the processor once (DAC encode + delay pattern)"""
+        import torchaudio
+        
+        waveform, sample_rate = torchaudio.load(str(self.voice_profiles.reference_path(profile)))
+        waveform = waveform.mean(dim=0)
+        if sample_rate != self.sample_rate:
+            waveform = torchaudio.functional.resample(waveform, sample_rate, self.sample_rate)
+        
+        inputs = self.processor(
+            text=[profile["transcript"]],
+            audio=[waveform.numpy()],
+            padding=True,
+            return_tensors="pt"
+        )
+        # Only the decoder side depends on the audio; the text side is rebuilt per request
+        return {
+            "decoder_input_ids": inputs["decoder_input_ids"].cpu(),
+            "decoder_attention_mask": inputs["decoder_attention_mask"].cpu()
+        }
+
+    @property
+    def sample_rate(self) -> int:
+        """Output sample rate of the processor's audio codec"""
+        feature_extractor = getattr(self.processor, "feature_extractor", None)
+        return getattr(feature_extractor, "sampling_rate", DEFAULT_SAMPLE_RATE)
+
+    def _generate_batch(self, formatted_texts: List[str], voice: Optional[str] = None) -> List["np.ndarray"]:
+        """Generate one padded batch and return a mono float32 waveform per text"""
+        # Only generations that miss the audio cache pay for loading the model
+        if not self.ensure_loaded():
+            raise RuntimeError("Dia model could not be loaded")
+        prompt = self._voice_prompt(voice) if voice else None
+        if prompt:
+            # Dia continues the reference: its transcript precedes the text to speak
+            formatted_texts = [f"{prompt['transcript']} {text}" for text in formatted_texts]
+        
+        inputs = self.processor(
+            text=formatted_texts,
+            padding=True,
+            return_tensors="pt"
+        )
+        audio_prompt_len = None
+        if prompt:
+            # Every item shares the same precomputed audio prompt instead of re-encoding it
+            batch_size = len(formatted_texts)
+            inputs["decoder_input_ids"] = prompt["decoder_input_ids"].expand(batch_size, -1, -1).clone()
+            inputs["decoder_attention_mask"] = prompt["decoder_attention_mask"].expand(batch_size, -1).clone()
+            audio_prompt_len = self.processor.get_audio_prompt_len(inputs["decoder_attention_mask"])
+        inputs = inputs.to(self.device)
+        
+        with torch.no_grad():
+            outputs = self.model.generate(
+                **inputs,
+                **self.generation_params
+            )
+        
+        # batch_decode trims each item at its own EOS, so padding does not leak into the audio;
+        # with a voice prompt it also drops the reference audio from the output
+        audio_outputs = self.processor.batch_decode(outputs, audio_prompt_len=audio_prompt_len)
+        return [audio.detach().float().cpu().numpy().reshape(-1) for audio in audio_outputs]
+
+    def _crossfade_concat(self, segments: List["np.ndarray"], sample_rate: int,
+                          crossfade_ms: int = 60) -> "np.ndarray":
+        """Join waveforms with an equal-power crossfade to hide seams between chunks"""
+        import numpy as np  # Cache hits get here without the backend having been imported
+        segments = [segment for segment in segments if segment.size]
+        if not segments:
+            return np.zeros(0, dtype=np.float32)
+        
+        result = segments[0]
+        for segment in segments[1:]:
+            overlap = min(int(sample_rate * crossfade_ms / 1000), len(result), len(segment))
+            if overlap == 0:
+                result = np.concatenate([result, segment])
+                continue
+            ramp = np.linspace(0.0, np.pi / 2, overlap, dtype=np.float32)
+            mixed = result[-overlap:] * np.cos(ramp) + segment[:overlap] * np.sin(ramp)
+            result = np.concatenate([result[:-overlap], mixed, segment[overlap:]])
+        return result.astype(np.float32)
+
+    def _save_waveform(self, audio: "np.ndarray", output_file: Optional[str] = None,
+                       wait: bool = True) -> str:
+        """
+        Write a single waveform through the audio sink (format from the file extension)
+        With wait=False compressed formats finish encoding in the background; play_audio
+        and audio_sink.wait() wait for them.
+        """
+        if not output_file:
+            timestamp = int(time.time() * 1000)
+            output_file = self.temp_dir / f"dia_tts_{timestamp}.wav"
+        future = self.audio_sink.write(audio, output_file, self.sample_rate)
+        if wait:
+            future.result()
+        return str(output_file)
+
+    def play_audio(self, audio_file: str, block: bool = True) -> bool:
+        """Play an audio file through the sink's playback queue (block=False returns at once)"""
+        try:
+            return self.audio_sink.play(audio_file, block=block)
         except Exception as e:
             logger.error(f"Error playing audio: {e}")
             return False
@@ -332,10 +1051,15 @@ class DiaTTSEngine:
         """Get information about the current model"""
         return {
             "model_checkpoint": self.model_checkpoint,
-            "device": self.device,
+            "device": self.device or "auto (model not loaded)",
             "available": self.available,
+            "loaded": self.model is not None,
+            "cpu_perf_mode": self.cpu_perf_mode or "off",
+            "voice_profile": self.voice_profile or "default",
+            "perf_report": self.perf_report.copy(),
             "generation_params": self.generation_params.copy(),
-            "temp_dir": str(self.temp_dir)
+            "temp_dir": str(self.temp_dir),
+            "audio_cache": self.audio_cache.stats() if self.audio_cache else "disabled"
         }
 
     def cleanup_temp_files(self, older_than_hours: int = 24):
@@ -344,7 +1068,8 @@ class DiaTTSEngine:
             cutoff_time = time.time() - (older_than_hours * 3600)
             cleaned_count = 0
             
-            for file_path in self.temp_dir.glob("dia_tts_*.mp3"):
+            temp_files = list(self.temp_dir.glob("dia_tts_*")) + list(self.temp_dir.glob("dia_stream_*.wav"))
+            for file_path in temp_files:
                 if file_path.stat().st_mtime < cutoff_time:
                     file_path.unlink()
                     cleaned_count += 1
@@ -355,6 +1080,36 @@ class DiaTTSEngine:
         except Exception as e:
             logger.warning(f"Failed to cleanup temp files: {e}")
 
+def speak_via_server(server_url: str, text: str, output_file: Optional[str] = None,
+                     subject: Optional[str] = None, sender: Optional[str] = None,
+                     long_form: bool = False, voice: Optional[str] = None) -> Optional[str]:
+    """Generate speech on a running dia_tts_server.py; returns the written file or None"""
+    import requests
+    
+    if not output_file:
+        output_file = Path(tempfile.gettempdir()) / "dia_tts" / f"dia_tts_{int(time.time() * 1000)}.mp3"
+    payload = {
+        "text": text,
+        "subject": subject,
+        "sender": sender,
+        "long_form": long_form,
+        "voice": voice,
+        "format": Path(output_file).suffix.lstrip(".") or "wav"
+    }
+    try:
+        response = requests.post(f"{server_url.rstrip('/')}/speak", json=payload, timeout=600)
+    except requests.RequestException as e:
+        logger.warning(f"TTS server unreachable ({e}), loading the model locally")
+        return None
+    if response.status_code != 200:
+        logger.warning(f"TTS server error {response.status_code}: {response.text[:200]}")
+        return None
+    
+    Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, "wb") as f:
+        f.write(response.content)
+    return str(output_file)
+
 def main():
     """CLI interface for Dia TTS engine"""
     import argparse
@@ -371,11 +1126,36 @@ def main():
     parser.add_argument('--test', action='store_true', help='Run test with sample text')
     parser.add_argument('--info', action='store_true', help='Show model information')
     parser.add_argument('--cleanup', action='store_true', help='Clean up temporary files')
+    parser.add_argument('--long-form', action='store_true',
+                        help='Narrate the full text in batched chunks instead of truncating it')
+    parser.add_argument('--batch-size', type=int, default=4,
+                        help='Chunks per generate call in long-form mode (default: 4)')
+    parser.add_argument('--no-cache', action='store_true', help='Always regenerate audio (skip the audio cache)')
+    parser.add_argument('--clear-cache', action='store_true', help='Delete all cached audio segments')
+    parser.add_argument('--cpu-perf', choices=CPU_PERF_MODES,
+                        help='CPU performance mode: int8 quantization or bf16 (+torch.compile), '
+                             'threads pinned to physical cores; auto picks bf16 when the CPU supports it')
+    parser.add_argument('--report-rtf', action='store_true',
+                        help='Measure the real-time factor when the model loads '
+                             '(before and after --cpu-perf when that is set)')
+    parser.add_argument('--server', default=os.environ.get("DIA_TTS_SERVER"),
+                        help='URL of a running dia_tts_server.py to use instead of loading the model '
+                             '(default: $DIA_TTS_SERVER)')
+    parser.add_argument('--voice', help='Speak with a registered voice profile')
+    parser.add_argument('--register-voice', metavar='NAME',
+                        help='Register --voice-clone/--voice-transcript as a named voice profile')
+    parser.add_argument('--list-voices', action='store_true', help='List registered voice profiles')
+    parser.add_argument('--stream', action='store_true',
+                        help='Generate chunk by chunk and play/write each chunk as soon as it is ready')
     
     args = parser.parse_args()
     
     # Initialize engine
-    engine = DiaTTSEngine()
+    engine = DiaTTSEngine(use_cache=not args.no_cache, cpu_perf_mode=args.cpu_perf,
+                          report_rtf=args.report_rtf)
+    engine.long_form_batch_size = args.batch_size
+    if args.report_rtf:
+        engine.ensure_loaded()  # Measure even when every segment would come from the cache
     
     if args.info:
         print("🎤 Dia TTS Engine Information")
@@ -383,13 +1163,53 @@ def main():
         info = engine.get_model_info()
         for key, value in info.items():
             print(f"{key}: {value}")
-        print(f"Available: {'✅ Yes' if engine.is_available() else '❌ No'}")
+        print(f"Available: {'✅ Yes' if engine.available else '❌ No'} (model loads on first use)")
+        return
+    
+    if args.list_voices:
+        profiles = engine.voice_profiles.list_profiles()
+        if not profiles:
+            print("No voice profiles registered")
+        for profile in profiles:
+            print(f"🎙️  {profile['name']}: {profile['transcript'][:60]} ({profile['created_at']})")
         return
     
-    if args.cleanup:
-        engine.cleanup_temp_files()
+    if args.register_voice:
+        if not args.voice_clone or not args.voice_transcript:
+            print("❌ --register-voice needs --voice-clone and --voice-transcript")
+            return
+        engine.register_voice_profile(args.register_voice, args.voice_clone, args.voice_transcript)
+        print(f"✅ Registered voice profile: {args.register_voice}")
+        return
+    
+    if args.voice:
+        try:
+            engine.use_voice_profile(args.voice)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+    
+    if args.cleanup or args.clear_cache:
+        if args.cleanup:
+            engine.cleanup_temp_files()
+        if args.clear_cache and engine.audio_cache:
+            engine.audio_cache.clear()
+            print("🧹 Audio cache cleared")
         return
     
+    # A resident server already has the model loaded; fall back to local generation if it is down
+    if args.server and args.text and not args.stream and not args.voice_clone:
+        email_mode = args.email_mode and args.subject and args.sender
+        audio_file = speak_via_server(args.server, args.text, args.output,
+                                      args.subject if email_mode else None,
+                                      args.sender if email_mode else None,
+                                      args.long_form, args.voice)
+        if audio_file:
+            print(f"✅ Generated: {audio_file}")
+            if args.play:
+                engine.play_audio(audio_file)
+            return
+    
     if not engine.is_available():
         print("❌ Dia TTS engine not available. Please check installation:")
         print("pip install transformers torch")
@@ -408,8 +1228,26 @@ def main():
         return
     
     # Generate speech
+    if args.stream:
+        text = args.text
+        clean = True
+        if args.email_mode and args.subject and args.sender:
+            text = engine._create_email_script(args.subject, args.sender, args.text, max_words=None)
+            clean = False
+        audio_file = engine.speak_streaming(text, args.output, play=args.play, clean=clean)
+        generated = bool(audio_file) and engine.audio_sink.wait_for(audio_file)
+        engine.audio_sink.wait()  # Let queued chunks finish playing
+        if generated:
+            print(f"✅ Generated: {audio_file}")
+        else:
+            print("❌ Speech generation failed")
+        return
+    
     if args.email_mode and args.subject and args.sender:
-        audio_file = engine.speak_email_content(args.subject, args.sender, args.text, args.output)
+        audio_file = engine.speak_email_content(args.subject, args.sender, args.text, args.output,
+                                                long_form=args.long_form)
+    elif args.long_form:
+        audio_file = engine.speak_long_text(args.text, args.output)
     else:
         audio_file = engine.speak_text(
             args.text, 
@@ -418,10 +1256,12 @@ def main():
             args.voice_transcript
         )
     
-    if audio_file:
+    generated = bool(audio_file) and engine.audio_sink.wait_for(audio_file)
+    if generated and args.play:
+        engine.play_audio(audio_file)
+    engine.audio_sink.wait()
+    if generated:
         print(f"✅ Generated: {audio_file}")
-        if args.play:
-            engine.play_audio(audio_file)
     else:
         print("❌ Speech generation failed")
 
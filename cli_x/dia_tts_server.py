@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Dia TTS Server - resident TTS worker with dynamic micro-batching
+Keeps the Dia model loaded and coalesces concurrent requests into padded generate batches
+"""
+
+import sys
+import time
+import queue
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
+import uvicorn
+
+sys.path.append(str(Path(__file__).parent))
+from dia_tts_engine import DiaTTSEngine, CPU_PERF_MODES
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_PORT = 8010
+DEFAULT_MAX_BATCH = 4
+DEFAULT_MAX_WAIT_MS = 50
+
+class MicroBatcher:
+    """
+    Coalesces chunk requests from many callers into padded model.generate batches
+
+    A single worker thread owns the model. It blocks for the first pending chunk, then
+    keeps collecting until either max_batch chunks are waiting or max_wait_ms has passed
+    since that first chunk, and generates the whole batch at once. A batch shares one
+    voice profile; chunks for other voices wait for the next round. Every chunk carries
+    its own Future, so callers only ever receive their own audio.
+    """
+
+    def __init__(self, engine: DiaTTSEngine, max_batch: int = DEFAULT_MAX_BATCH,
+                 max_wait_ms: int = DEFAULT_MAX_WAIT_MS):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._deferred: deque = deque()  # Collected chunks whose voice differed from the batch
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"batches": 0, "chunks": 0, "largest_batch": 0, "generate_seconds": 0.0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="dia-tts-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def submit(self, formatted_text: str, voice: Optional[str] = None) -> Future:
+        """Queue one Dia-ready chunk; the future resolves to its waveform"""
+        future: Future = Future()
+        self._queue.put((formatted_text, voice, future))
+        return future
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() + len(self._deferred)
+
+    def _collect(self) -> List[tuple]:
+        if self._deferred:
+            first = self._deferred.popleft()
+        else:
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                return []
+        batch = [first]
+        voice = first[1]
+
+        # Earlier chunks for the same voice go first, in arrival order
+        waiting = deque()
+        while self._deferred:
+            item = self._deferred.popleft()
+            (batch if item[1] == voice and len(batch) < self.max_batch else waiting).append(item)
+        self._deferred = waiting
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            (batch if item[1] == voice else self._deferred).append(item)
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            # Callers that gave up (cancelled futures) do not take a batch slot
+            batch = [(text, voice, future) for text, voice, future in batch
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            start_time = time.time()
+            try:
+                segments = self.engine._generate_cached([text for text, _, _ in batch], batch[0][1])
+            except Exception as e:
+                logger.error(f"Batch of {len(batch)} failed: {e}")
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            elapsed = time.time() - start_time
+            self.stats["batches"] += 1
+            self.stats["chunks"] += len(batch)
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            self.stats["generate_seconds"] += elapsed
+            logger.info(f"🎤 Generated batch of {len(batch)} in {elapsed:.2f}s")
+            for (_, _, future), segment in zip(batch, segments):
+                future.set_result(segment)
+
+# Server state
+server_config: Dict[str, Any] = {
+    "max_batch": DEFAULT_MAX_BATCH,
+    "max_wait_ms": DEFAULT_MAX_WAIT_MS,
+    "cpu_perf_mode": None
+}
+server_start_time = datetime.now()
+engine: Optional[DiaTTSEngine] = None
+batcher: Optional[MicroBatcher] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the model once and run the batching worker for the server's lifetime"""
+    global engine, batcher
+
+    # Startup
+    logger.info("🚀 Starting Dia TTS Server...")
+    engine = DiaTTSEngine(cpu_perf_mode=server_config["cpu_perf_mode"])
+    loop = asyncio.get_event_loop()
+    if not await loop.run_in_executor(None, engine.ensure_loaded):
+        logger.error("❌ Dia TTS engine not available; requests will fail")
+    batcher = MicroBatcher(engine, server_config["max_batch"], server_config["max_wait_ms"])
+    batcher.start()
+    logger.info(f"📦 Micro-batching: max batch {batcher.max_batch}, max wait {server_config['max_wait_ms']}ms")
+
+    yield
+
+    # Shutdown
+    logger.info("🛑 Shutting down Dia TTS Server...")
+    batcher.stop()
+    logger.info("✅ Shutdown complete")
+
+app = FastAPI(
+    title="Dia TTS Server",
+    description="Resident Dia TTS worker with dynamic micro-batching",
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# Request/Response Models
+class SpeakRequest(BaseModel):
+    text: str = ""
+    subject: Optional[str] = None  # subject + sender switch to email formatting
+    sender: Optional[str] = None
+    long_form: bool = False
+    voice: Optional[str] = None  # Registered voice profile (see dia_tts_engine.py --register-voice)
+    format: str = "wav"  # wav, mp3, ogg, flac
+
+@app.get("/health")
+async def health():
+    """Health check endpoint"""
+    return {"status": "healthy", "model_loaded": bool(engine and engine.model is not None)}
+
+@app.get("/status")
+async def status():
+    """Batching statistics"""
+    stats = dict(batcher.stats) if batcher else {}
+    if stats.get("batches"):
+        stats["average_batch"] = round(stats["chunks"] / stats["batches"], 2)
+    return {
+        "status": "running",
+        "timestamp": datetime.now().isoformat(),
+        "uptime_seconds": (datetime.now() - server_start_time).total_seconds(),
+        "queue_depth": batcher.queue_depth() if batcher else 0,
+        "batching": stats,
+        "model": engine.get_model_info() if engine else {}
+    }
+
+@app.post("/speak")
+async def speak(request: SpeakRequest):
+    """Generate speech; the response body is the audio file"""
+    if not engine or not engine.is_available():
+        raise HTTPException(status_code=503, detail="Dia TTS engine not available")
+    if request.format not in ("wav", "mp3", "ogg", "flac"):
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {request.format}")
+    if request.voice and not engine.voice_profiles.get(request.voice):
+        raise HTTPException(status_code=404, detail=f"Unknown voice profile: {request.voice}")
+
+    max_words = None if request.long_form else 200
+    if request.subject and request.sender:
+        parts = engine._email_script_parts(request.subject, request.sender, request.text, max_words)
+        chunks = [chunk for part in parts for chunk in engine._chunk_script(part)]
+    else:
+        cleaned = engine._clean_text_for_dia(request.text, max_words, keep_paragraphs=request.long_form)
+        chunks = engine._chunk_script(cleaned)
+    if not chunks:
+        raise HTTPException(status_code=400, detail="Nothing to speak")
+
+    start_time = time.time()
+    futures = [batcher.submit(chunk, request.voice) for chunk in chunks]
+    try:
+        segments = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+    except Exception as e:
+        for future in futures:
+            future.cancel()
+        raise HTTPException(status_code=500, detail=f"Speech generation failed: {e}")
+
+    audio = engine._crossfade_concat(list(segments), engine.sample_rate, engine.crossfade_ms)
+    output_file = engine.temp_dir / f"dia_tts_{int(time.time() * 1000)}_{id(request)}.{request.format}"
+    # Encoding runs on the sink's worker thread; the event loop keeps serving meanwhile
+    try:
+        await asyncio.wrap_future(engine.audio_sink.write(audio, output_file, engine.sample_rate))
+    except Exception as e:
+        output_file.unlink(missing_ok=True)
+        raise HTTPException(status_code=500, detail=f"Audio encoding failed: {e}")
+    logger.info(f"✅ {len(chunks)} chunks spoken in {time.time() - start_time:.2f}s")
+    # The file only exists to be sent; delete it once the response has gone out
+    return FileResponse(str(output_file), media_type=f"audio/{request.format}", filename=output_file.name,
+                        background=BackgroundTask(output_file.unlink, missing_ok=True))
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Dia TTS Server - resident model with dynamic micro-batching')
+    parser.add_argument('--host', default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port (default: {DEFAULT_PORT})')
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH,
+                        help=f'Most chunks per generate call (default: {DEFAULT_MAX_BATCH})')
+    parser.add_argument('--max-wait-ms', type=int, default=DEFAULT_MAX_WAIT_MS,
+                        help=f'How long the first chunk waits for company (default: {DEFAULT_MAX_WAIT_MS})')
+    parser.add_argument('--cpu-perf', choices=CPU_PERF_MODES, help='CPU performance mode (see dia_tts_engine.py)')
+    args = parser.parse_args()
+
+    server_config.update(max_batch=args.max_batch, max_wait_ms=args.max_wait_ms, cpu_perf_mode=args.cpu_perf)
+
+    print("🚀 Starting Dia TTS Server")
+    print(f"🌐 Server will be available at: http://{args.host}:{args.port}")
+    print(f"📚 API docs at: http://{args.host}:{args.port}/docs")
+
+    uvicorn.run(app, host=args.host, port=args.port, reload=False)
+
+if __name__ == "__main__":
+    main()
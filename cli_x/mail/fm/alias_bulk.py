@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Bulk alias import/export
+
+Streams CSV or JSONL alias files (columns: email, name, description) in constant memory,
+diffs each row against the local AliasDatabase and pushes only the delta to FastMail as
+batched Identity/set calls. Imports write a checkpoint after every pushed batch, so a
+crashed run resumes from the last completed batch instead of starting over.
+"""
+
+import os
+import sys
+import csv
+import json
+import sqlite3
+import logging
+from pathlib import Path
+from typing import Optional, Iterator, Dict, Any
+
+sys.path.append(str(Path(__file__).parent))
+from fastmail_alias import AliasDatabase, FastMailAliasManager, load_credentials
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+FIELDS = ['email', 'name', 'description']
+DEFAULT_BATCH_SIZE = 50
+
+
+def detect_format(path: Path, fmt: Optional[str] = None) -> str:
+    """Pick csv/jsonl from an explicit format or the file extension"""
+    if fmt:
+        return fmt
+    if path.suffix.lower() == '.csv':
+        return 'csv'
+    if path.suffix.lower() in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise ValueError(f"Cannot infer format from {path.name}; pass --format csv|jsonl")
+
+
+def read_rows(path: Path, fmt: str) -> Iterator[Dict[str, str]]:
+    """Yield normalized {email, name, description} rows one at a time"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+
+        for record in records:
+            email_address = (record.get('email') or '').strip()
+            name = (record.get('name') or '').strip()
+            if not email_address and name:
+                email_address = f"{name}@fastmail.com"
+            if not email_address:
+                logger.warning(f"Skipping row without email or name: {record}")
+                continue
+            yield {
+                'email': email_address,
+                'name': name or email_address.split('@')[0],
+                'description': (record.get('description') or '').strip()
+            }
+
+
+class AliasBulkTool:
+    """Streaming import/export between alias files, the local database and FastMail"""
+
+    def __init__(self, db: AliasDatabase, manager: Optional[FastMailAliasManager] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db = db
+        self.manager = manager
+        self.batch_size = batch_size
+
+    # ─── Export ──────────────────────────────────────────────────────────────
+    def export(self, path: Path, fmt: Optional[str] = None, include_inactive: bool = False) -> int:
+        """Write aliases from the local database to CSV/JSONL; returns the row count"""
+        path = Path(path)
+        fmt = detect_format(path, fmt)
+        count = 0
+
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction='ignore') if fmt == 'csv' else None
+            if writer:
+                writer.writeheader()
+            for alias in self.db.iter_aliases(active_only=not include_inactive):
+                if writer:
+                    writer.writerow(alias)
+                else:
+                    f.write(json.dumps({k: alias[k] for k in FIELDS}, ensure_ascii=False) + "\n")
+                count += 1
+
+        logger.info(f"Exported {count} aliases to {path}")
+        return count
+
+    # ─── Import ──────────────────────────────────────────────────────────────
+    def import_file(self, path: Path, fmt: Optional[str] = None,
+                    checkpoint_path: Optional[Path] = None,
+                    prune: bool = False, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Sync the server and local database to the contents of an alias file.
+        New emails are created, changed names are updated, description-only changes stay
+        local (JMAP identities have no description). With prune, active aliases missing
+        from the file are destroyed. With dry_run, nothing is pushed or checkpointed.
+        """
+        path = Path(path)
+        fmt = detect_format(path, fmt)
+        checkpoint_path = Path(checkpoint_path or f"{path}.checkpoint.json")
+        if not dry_run and self.manager is None:
+            raise ValueError("A logged-in FastMailAliasManager is required unless dry_run is set")
+
+        signature = self._file_signature(path)
+        checkpoint = self._load_checkpoint(checkpoint_path, signature)
+        skip_rows = checkpoint['rows_done']
+        summary = checkpoint['summary']
+        if skip_rows:
+            logger.info(f"Resuming {path.name} after row {skip_rows}")
+
+        # Emails seen in the file, kept on disk so pruning stays constant-memory
+        seen = sqlite3.connect('') if prune else None
+        if seen:
+            seen.execute('CREATE TABLE seen (email TEXT PRIMARY KEY COLLATE NOCASE)')
+
+        pending_create = []
+        pending_update = {}
+        rows_done = 0
+
+        for row_no, row in enumerate(read_rows(path, fmt)):
+            if seen:
+                seen.execute('INSERT OR IGNORE INTO seen (email) VALUES (?)', (row['email'],))
+            if row_no < skip_rows:
+                continue
+
+            existing = self.db.find_alias_by_email(row['email'])
+            if existing is None or not existing['is_active']:
+                pending_create.append(row)
+            else:
+                if row['description'] != (existing['description'] or '') and not dry_run:
+                    self.db.update_alias(existing['id'], description=row['description'])
+                if row['name'] != existing['name']:
+                    pending_update[existing['id']] = {'name': row['name']}
+                else:
+                    summary['unchanged'] += 1
+
+            rows_done = row_no + 1
+            if len(pending_create) + len(pending_update) >= self.batch_size:
+                self._flush(pending_create, pending_update, [], summary, dry_run)
+                pending_create, pending_update = [], {}
+                if not dry_run:
+                    self._save_checkpoint(checkpoint_path, signature, rows_done, summary)
+
+        self._flush(pending_create, pending_update, [], summary, dry_run)
+        if not dry_run:
+            self._save_checkpoint(checkpoint_path, signature, max(rows_done, skip_rows), summary)
+
+        if seen:
+            self._prune(seen, summary, dry_run)
+            seen.close()
+
+        if not dry_run and checkpoint_path.exists():
+            checkpoint_path.unlink()
+
+        logger.info(f"Import finished: {summary}")
+        return summary
+
+    def _flush(self, create: list, update: dict, destroy: list, summary: dict, dry_run: bool):
+        if not (create or update or destroy):
+            return
+        if dry_run:
+            summary['created'] += len(create)
+            summary['updated'] += len(update)
+            summary['destroyed'] += len(destroy)
+            return
+
+        result = self.manager.batch_set_aliases(create=create, update=update, destroy=destroy)
+        summary['created'] += len(result['created'])
+        summary['updated'] += len(result['updated'])
+        summary['destroyed'] += len(result['destroyed'])
+        summary['failed'] += len(result['failed'])
+        for key, error in result['failed'].items():
+            logger.warning(f"Alias change rejected for {key}: {error}")
+
+    def _prune(self, seen: sqlite3.Connection, summary: dict, dry_run: bool):
+        """Destroy active aliases that were not present in the imported file"""
+        last_id = ''
+        while True:
+            # Collect one page, then close the read cursor before the batch writes to the DB
+            page = []
+            aliases = self.db.iter_aliases(active_only=True, batch_size=self.batch_size, after_id=last_id)
+            for alias in aliases:
+                last_id = alias['id']
+                if not seen.execute('SELECT 1 FROM seen WHERE email = ?', (alias['email'],)).fetchone():
+                    page.append(alias['id'])
+                    if len(page) >= self.batch_size:
+                        break
+            aliases.close()
+            if not page:
+                break
+            self._flush([], {}, page, summary, dry_run)
+
+    # ─── Checkpoints ─────────────────────────────────────────────────────────
+    def _file_signature(self, path: Path) -> Dict[str, Any]:
+        stat = path.stat()
+        return {'path': str(path.resolve()), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def _load_checkpoint(self, checkpoint_path: Path, signature: Dict[str, Any]) -> Dict[str, Any]:
+        fresh = {
+            'rows_done': 0,
+            'summary': {'created': 0, 'updated': 0, 'destroyed': 0, 'unchanged': 0, 'failed': 0}
+        }
+        if not checkpoint_path.exists():
+            return fresh
+        try:
+            with open(checkpoint_path, 'r') as f:
+                checkpoint = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {checkpoint_path}: {e}")
+            return fresh
+        if checkpoint.get('signature') != signature:
+            logger.warning("Checkpoint belongs to a different version of the file, starting over")
+            return fresh
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint_path: Path, signature: Dict[str, Any],
+                         rows_done: int, summary: Dict[str, int]):
+        """Atomically record progress (write to a temp file, then rename over)"""
+        tmp_path = checkpoint_path.with_suffix(checkpoint_path.suffix + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'signature': signature, 'rows_done': rows_done, 'summary': summary}, f)
+        os.replace(tmp_path, checkpoint_path)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Bulk FastMail alias import/export')
+    parser.add_argument('--db', default='aliases.db', help='Alias database path (default: aliases.db)')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='File format (default: from extension)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Write local aliases to a file')
+    export_parser.add_argument('file')
+    export_parser.add_argument('--all', action='store_true', help='Include soft-deleted aliases')
+
+    import_parser = subparsers.add_parser('import', help='Push the difference between a file and the server')
+    import_parser.add_argument('file')
+    import_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                               help=f'Changes per Identity/set call (default: {DEFAULT_BATCH_SIZE})')
+    import_parser.add_argument('--checkpoint', help='Checkpoint file (default: <file>.checkpoint.json)')
+    import_parser.add_argument('--prune', action='store_true', help='Destroy active aliases missing from the file')
+    import_parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+
+    args = parser.parse_args()
+    db = AliasDatabase(args.db)
+
+    if args.command == 'export':
+        AliasBulkTool(db).export(Path(args.file), args.format, include_inactive=args.all)
+        return
+
+    manager = None
+    if not args.dry_run:
+        email, api_token = load_credentials()
+        manager = FastMailAliasManager(email, api_token, db_path=args.db)
+        if not manager.login():
+            print("Login failed!")
+            sys.exit(1)
+
+    tool = AliasBulkTool(db, manager, batch_size=args.batch_size)
+    summary = tool.import_file(Path(args.file), args.format, args.checkpoint,
+                               prune=args.prune, dry_run=args.dry_run)
+
+    print(f"\nImport {'preview' if args.dry_run else 'summary'}:")
+    for key, value in summary.items():
+        print(f"  {key.capitalize()}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Alias traffic aggregation - incremental per-alias mail statistics
+
+Feeds the alias_stats / alias_senders tables in aliases.db from two sources:
+- IMAP envelopes (received mail): message_count, spam_count, top senders
+- Go analytics log (cli_x/analytics/email_analytics.jsonl): read / marked-spam / deleted counts
+
+Both sources are tailed from a stored position (byte offset, last UID), so each run
+only processes what arrived since the previous one.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import logging
+import imaplib
+import email
+from email.utils import parseaddr, getaddresses, parsedate_to_datetime
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+from dotenv import load_dotenv
+
+sys.path.append(str(Path(__file__).parent))
+from fastmail_alias import AliasDatabase
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_ANALYTICS_LOG = Path(__file__).parent.parent.parent / "analytics" / "email_analytics.jsonl"
+DEFAULT_MAILBOXES = ["INBOX", "Spam"]
+COMMIT_EVERY = 1000
+
+# Analytics action -> alias_stats counter it feeds
+ACTION_COUNTERS = {
+    'read': 'read_count',
+    'mark_spam': 'marked_spam_count',
+    'delete': 'deleted_count',
+}
+
+# Headers FastMail uses to record the address a message was actually delivered to
+DELIVERY_HEADERS = ['X-Delivered-To', 'Delivered-To']
+
+
+def _to_utc_iso(value: Optional[datetime]) -> str:
+    """Normalize a datetime to the UTC string format stored in alias_stats"""
+    if value is None:
+        value = datetime.now(timezone.utc)
+    elif value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class AliasStatsAggregator:
+    """Incrementally folds analytics events and IMAP envelopes into per-alias counters"""
+
+    def __init__(self, db: AliasDatabase):
+        self.db = db
+
+        # FastMail IMAP settings (same credentials as EnhancedEmailReader)
+        self.imap_server = "imap.fastmail.com"
+        self.imap_port = 993
+        load_dotenv()
+        self.email = os.getenv('FM_M_0')
+        self.password = os.getenv('FM_AP_0')
+
+    # ─── Offsets ─────────────────────────────────────────────────────────────
+    def _get_offset(self, cursor, source: str) -> tuple:
+        cursor.execute('SELECT position, signature FROM ingest_offsets WHERE source = ?', (source,))
+        row = cursor.fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    def _save_offset(self, cursor, source: str, position: int, signature: str):
+        cursor.execute('''
+            INSERT INTO ingest_offsets (source, position, signature, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(source) DO UPDATE SET
+                position = excluded.position,
+                signature = excluded.signature,
+                updated_at = excluded.updated_at
+        ''', (source, position, signature, datetime.now().isoformat()))
+
+    # ─── Counters ────────────────────────────────────────────────────────────
+    def _bump(self, cursor, alias_email: str, seen_at: str, **increments):
+        """Add to an alias's counters and widen its first/last seen window"""
+        columns = ['message_count', 'spam_count', 'read_count', 'marked_spam_count', 'deleted_count']
+        values = [increments.get(col, 0) for col in columns]
+        cursor.execute('''
+            INSERT INTO alias_stats
+            (email, message_count, spam_count, read_count, marked_spam_count, deleted_count,
+             first_seen, last_seen, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(email) DO UPDATE SET
+                message_count = message_count + excluded.message_count,
+                spam_count = spam_count + excluded.spam_count,
+                read_count = read_count + excluded.read_count,
+                marked_spam_count = marked_spam_count + excluded.marked_spam_count,
+                deleted_count = deleted_count + excluded.deleted_count,
+                first_seen = MIN(COALESCE(first_seen, excluded.first_seen), excluded.first_seen),
+                last_seen = MAX(COALESCE(last_seen, excluded.last_seen), excluded.last_seen),
+                updated_at = excluded.updated_at
+        ''', (alias_email, *values, seen_at, seen_at, datetime.now().isoformat()))
+
+    def _bump_sender(self, cursor, alias_email: str, sender: str, seen_at: str):
+        cursor.execute('''
+            INSERT INTO alias_senders (email, sender, message_count, last_seen)
+            VALUES (?, ?, 1, ?)
+            ON CONFLICT(email, sender) DO UPDATE SET
+                message_count = message_count + 1,
+                last_seen = MAX(COALESCE(last_seen, excluded.last_seen), excluded.last_seen)
+        ''', (alias_email, sender, seen_at))
+
+    # ─── Analytics log ───────────────────────────────────────────────────────
+    def ingest_analytics_log(self, log_path: Path = DEFAULT_ANALYTICS_LOG) -> int:
+        """
+        Consume new lines of the analytics JSONL since the stored byte offset.
+        A rotated or truncated file (new inode or smaller than the offset) restarts at 0;
+        a trailing line without a newline is left for the next run.
+        Returns the number of events applied.
+        """
+        log_path = Path(log_path)
+        if not log_path.exists():
+            logger.warning(f"Analytics log not found: {log_path}")
+            return 0
+
+        source = f"analytics:{log_path.resolve()}"
+        stat = log_path.stat()
+        signature = f"{stat.st_dev}:{stat.st_ino}"
+
+        conn = self.db._connect()
+        cursor = conn.cursor()
+        position, saved_signature = self._get_offset(cursor, source)
+        if saved_signature != signature or stat.st_size < position:
+            logger.info(f"Analytics log is new or was rotated, reading from start: {log_path}")
+            position = 0
+
+        applied = 0
+        pending = 0
+        with open(log_path, 'rb') as f:
+            f.seek(position)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # Partially written line; pick it up next run
+                position += len(line)
+                pending += 1
+
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError as e:
+                    logger.warning(f"Skipping malformed analytics line at offset {position}: {e}")
+                    continue
+
+                if self._apply_analytics_event(cursor, event):
+                    applied += 1
+
+                if pending >= COMMIT_EVERY:
+                    self._save_offset(cursor, source, position, signature)
+                    conn.commit()
+                    pending = 0
+
+        self._save_offset(cursor, source, position, signature)
+        conn.commit()
+        conn.close()
+
+        logger.info(f"Applied {applied} analytics events (offset {position})")
+        return applied
+
+    def _apply_analytics_event(self, cursor, event: Dict[str, Any]) -> bool:
+        alias_email = (event.get('to_alias') or '').strip().lower()
+        if not alias_email:
+            return False
+
+        try:
+            seen_at = _to_utc_iso(datetime.fromisoformat(event.get('timestamp', '')))
+        except ValueError:
+            seen_at = _to_utc_iso(None)
+
+        increments = {}
+        counter = ACTION_COUNTERS.get(event.get('action'))
+        message_id = event.get('message_id')
+        if counter and message_id:
+            # Count each message once per action, however many times it was viewed
+            if self._first_time(cursor, alias_email, event['action'], message_id):
+                increments[counter] = 1
+
+        self._bump(cursor, alias_email, seen_at, **increments)
+        return True
+
+    # ─── IMAP envelopes ──────────────────────────────────────────────────────
+    def ingest_imap(self, mailboxes: Optional[List[str]] = None, batch_size: int = 500) -> int:
+        """
+        Fetch headers of messages that arrived since the last stored UID in each mailbox.
+        A changed UIDVALIDITY re-reads that mailbox from the start; messages are counted once
+        per alias by Message-ID, so re-read (or moved) mail does not inflate the counters.
+        Returns the number of messages applied.
+        """
+        if not self.email or not self.password:
+            raise ValueError("Please set FM_M_0 and FM_AP_0 environment variables")
+
+        mailboxes = mailboxes or DEFAULT_MAILBOXES
+
+        logger.info(f"Connecting to IMAP server: {self.imap_server}")
+        mail = imaplib.IMAP4_SSL(self.imap_server, self.imap_port)
+        mail.login(self.email, self.password)
+
+        conn = self.db._connect()
+        cursor = conn.cursor()
+        applied = 0
+
+        try:
+            for mailbox in mailboxes:
+                typ, _ = mail.select(f'"{mailbox}"', readonly=True)
+                if typ != 'OK':
+                    logger.warning(f"Cannot select mailbox {mailbox}, skipping")
+                    continue
+
+                _, validity = mail.response('UIDVALIDITY')
+                uidvalidity = validity[0].decode() if validity and validity[0] else ''
+                source = f"imap:{self.email}:{mailbox}"
+                last_uid, saved_validity = self._get_offset(cursor, source)
+                if saved_validity != uidvalidity:
+                    last_uid = 0
+
+                _, data = mail.uid('SEARCH', None, f'UID {last_uid + 1}:*')
+                # "N:*" always matches the highest UID, even when it is <= last_uid
+                uids = [uid for uid in (int(u) for u in data[0].split()) if uid > last_uid]
+                if not uids:
+                    continue
+
+                is_spam = mailbox.lower() in ('spam', 'junk', 'junk mail')
+                logger.info(f"Ingesting {len(uids)} new messages from {mailbox}")
+
+                for i in range(0, len(uids), batch_size):
+                    chunk = uids[i:i + batch_size]
+                    applied += self._ingest_imap_chunk(mail, cursor, chunk, is_spam)
+                    self._save_offset(cursor, source, chunk[-1], uidvalidity)
+                    conn.commit()
+        finally:
+            conn.close()
+            mail.logout()
+
+        logger.info(f"Applied {applied} IMAP envelopes")
+        return applied
+
+    def _ingest_imap_chunk(self, mail, cursor, uids: List[int], is_spam: bool) -> int:
+        fields = ' '.join(['FROM', 'TO', 'CC', 'DATE', 'MESSAGE-ID'] + [h.upper() for h in DELIVERY_HEADERS])
+        _, msg_data = mail.uid('FETCH', ','.join(str(uid) for uid in uids),
+                               f'(BODY.PEEK[HEADER.FIELDS ({fields})])')
+
+        applied = 0
+        for item in msg_data:
+            if not isinstance(item, tuple):
+                continue
+            headers = email.message_from_bytes(item[1])
+
+            try:
+                seen_at = _to_utc_iso(parsedate_to_datetime(headers['Date']))
+            except (TypeError, ValueError):
+                seen_at = _to_utc_iso(None)
+
+            sender = parseaddr(headers.get('From', ''))[1].lower()
+            message_key = self._message_key(headers)
+            for alias_email in self._resolve_recipients(headers):
+                received = self._first_time(cursor, alias_email, 'imap_received', message_key)
+                spam = is_spam and self._first_time(cursor, alias_email, 'imap_spam', message_key)
+                if not received and not spam:
+                    continue  # Already counted (mailbox re-read after a UIDVALIDITY change)
+                self._bump(cursor, alias_email, seen_at,
+                           message_count=1 if received else 0, spam_count=1 if spam else 0)
+                if sender and received:
+                    self._bump_sender(cursor, alias_email, sender, seen_at)
+            applied += 1
+
+        return applied
+
+    @staticmethod
+    def _message_key(headers) -> str:
+        """Message-ID, or a digest of the envelope headers for messages without one"""
+        message_id = (headers.get('Message-ID') or '').strip()
+        if message_id:
+            return message_id
+        envelope = '|'.join(str(headers.get(name, '')) for name in ('From', 'To', 'Cc', 'Date'))
+        return 'sha256:' + hashlib.sha256(envelope.encode('utf-8', 'replace')).hexdigest()
+
+    def _first_time(self, cursor, alias_email: str, action: str, message_key: str) -> bool:
+        """Record (alias, action, message) in alias_event_keys; False if it was already there"""
+        cursor.execute('''
+            INSERT OR IGNORE INTO alias_event_keys (email, action, message_id)
+            VALUES (?, ?, ?)
+        ''', (alias_email, action, message_key))
+        return cursor.rowcount == 1
+
+    def _resolve_recipients(self, headers) -> set:
+        """Aliases a message was delivered to: delivery headers first, else known aliases in To/Cc"""
+        delivered = set()
+        for header in DELIVERY_HEADERS:
+            for _, address in getaddresses(headers.get_all(header, [])):
+                if address:
+                    delivered.add(address.lower())
+        if delivered:
+            return delivered
+
+        candidates = getaddresses(headers.get_all('To', []) + headers.get_all('Cc', []))
+        return {
+            address.lower() for _, address in candidates
+            if address and self.db.find_alias_by_email(address)
+        }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Per-alias mail statistics')
+    parser.add_argument('--db', default='aliases.db', help='Alias database path (default: aliases.db)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest = subparsers.add_parser('ingest', help='Fold new analytics events / IMAP mail into the counters')
+    ingest.add_argument('--log', default=str(DEFAULT_ANALYTICS_LOG), help='Analytics JSONL path')
+    ingest.add_argument('--imap', action='store_true', help='Also ingest IMAP envelopes')
+    ingest.add_argument('--mailbox', action='append', help='Mailbox to ingest (repeatable, default: INBOX, Spam)')
+
+    dead = subparsers.add_parser('dead', help='List aliases with no mail for N days')
+    dead.add_argument('--days', type=int, default=90)
+    dead.add_argument('--limit', type=int, default=100)
+
+    spammy = subparsers.add_parser('spammy', help='List aliases that mostly receive spam')
+    spammy.add_argument('--min-messages', type=int, default=10)
+    spammy.add_argument('--ratio', type=float, default=0.5)
+    spammy.add_argument('--limit', type=int, default=100)
+
+    show = subparsers.add_parser('show', help='Show counters for one alias')
+    show.add_argument('alias')
+
+    args = parser.parse_args()
+    db = AliasDatabase(args.db)
+
+    if args.command == 'ingest':
+        aggregator = AliasStatsAggregator(db)
+        aggregator.ingest_analytics_log(Path(args.log))
+        if args.imap:
+            aggregator.ingest_imap(args.mailbox)
+
+    elif args.command == 'dead':
+        for row in db.find_dead_aliases(args.days, args.limit):
+            print(f"  - {row['email']} (messages: {row['message_count']}, last seen: {row['last_seen'] or 'never'})")
+
+    elif args.command == 'spammy':
+        for row in db.find_spammy_aliases(args.min_messages, args.ratio, args.limit):
+            print(f"  - {row['email']} ({row['spam_ratio']:.0%} spam of {row['message_count']} messages)")
+
+    elif args.command == 'show':
+        stats = db.get_alias_stats(args.alias)
+        if not stats:
+            print(f"No statistics recorded for {args.alias}")
+            return
+        print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    main()
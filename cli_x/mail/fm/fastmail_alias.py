@@ -4,7 +4,7 @@ import json
 import logging
 import requests
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 # ─── Setup logging ───────────────────────────────────────────────────────────
@@ -30,32 +30,79 @@ def load_env_file():
                 env_vars[key] = value.strip('\'"')
     return env_vars
 
-# Load environment variables
-try:
-    env_vars = load_env_file()
-    FASTMAIL_EMAIL = env_vars.get('FM_M_0')
-    FASTMAIL_PASSWORD = env_vars.get('FM_P_0')
-    FASTMAIL_API_TOKEN = env_vars.get('FM_API_0')
-    
-    if not all([FASTMAIL_EMAIL, FASTMAIL_API_TOKEN]):
-        raise Exception("Missing required environment variables: FM_M_0, FM_API_0")
+def load_credentials() -> tuple:
+    """
+    Load FastMail credentials from .env, exiting if they are missing.
+    Called from the CLI entry points so AliasDatabase can be imported without credentials.
+    """
+    try:
+        env_vars = load_env_file()
+        email = env_vars.get('FM_M_0')
+        api_token = env_vars.get('FM_API_0')
         
-    print(f"Email: {FASTMAIL_EMAIL}")
-    print(f"API Token: {'*'*len(FASTMAIL_API_TOKEN) if FASTMAIL_API_TOKEN else None}")
-except Exception as e:
-    print(f"Error loading environment variables: {e}")
-    print("Please make sure the .env file exists with FM_M_0 and FM_API_0 variables")
-    exit(1)
+        if not all([email, api_token]):
+            raise Exception("Missing required environment variables: FM_M_0, FM_API_0")
+            
+        print(f"Email: {email}")
+        print(f"API Token: {'*'*len(api_token) if api_token else None}")
+        return email, api_token
+    except Exception as e:
+        print(f"Error loading environment variables: {e}")
+        print("Please make sure the .env file exists with FM_M_0 and FM_API_0 variables")
+        exit(1)
+
+# ─── Schema migrations ──────────────────────────────────────────────────────
+# Each entry upgrades aliases.db by one PRAGMA user_version step.
+# Append new versions at the end; never edit a migration that has shipped.
+SCHEMA_MIGRATIONS = [
+    (1, "Store full JMAP alias/identity properties and a covering list index", [
+        "ALTER TABLE aliases ADD COLUMN destination TEXT",
+        "ALTER TABLE aliases ADD COLUMN for_domain TEXT",
+        "ALTER TABLE aliases ADD COLUMN is_disabled BOOLEAN DEFAULT 0",
+        "ALTER TABLE aliases ADD COLUMN last_message_at TIMESTAMP",
+        "ALTER TABLE aliases ADD COLUMN reply_to TEXT",   # JSON EmailAddress[]
+        "ALTER TABLE aliases ADD COLUMN bcc TEXT",        # JSON EmailAddress[]
+        "ALTER TABLE aliases ADD COLUMN extra TEXT",      # JSON of any other server properties
+        # Superseded by idx_aliases_list, which has the same key prefix
+        "DROP INDEX IF EXISTS idx_aliases_active_created",
+        """CREATE INDEX IF NOT EXISTS idx_aliases_list ON aliases(
+               is_active, created_at DESC, id DESC,
+               email, name, destination, is_disabled, last_message_at
+           )""",
+    ]),
+]
+
+# JMAP property -> aliases column for the scalar fields we keep as real columns
+JMAP_COLUMNS = {
+    'destination': 'destination',
+    'forDomain': 'for_domain',
+    'isDisabled': 'is_disabled',
+    'lastMessageAt': 'last_message_at',
+}
+JMAP_JSON_COLUMNS = {
+    'replyTo': 'reply_to',
+    'bcc': 'bcc',
+}
+# Columns served entirely from idx_aliases_list
+LIST_VIEW_COLUMNS = ['id', 'email', 'name', 'destination', 'is_disabled', 'last_message_at', 'created_at']
 
 # ─── Database setup ─────────────────────────────────────────────────────────
 class AliasDatabase:
     def __init__(self, db_path: str = "aliases.db"):
         self.db_path = db_path
+        self.fts_enabled = False
         self.init_database()
     
-    def init_database(self):
-        """Initialize the SQLite database with aliases table"""
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with the pragmas the alias store relies on"""
         conn = sqlite3.connect(self.db_path)
+        # INSERT OR REPLACE must fire the delete trigger so the FTS index stays in sync
+        conn.execute('PRAGMA recursive_triggers = ON')
+        return conn
+    
+    def init_database(self):
+        """Initialize the SQLite database with aliases table, indexes and search index"""
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -69,33 +116,234 @@ class AliasDatabase:
                 is_active BOOLEAN DEFAULT 1
             )
         ''')
+        conn.commit()
+        self._migrate(conn)
+        
+        # Case-insensitive exact/prefix lookups on email and name
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_aliases_email_nocase ON aliases(email COLLATE NOCASE)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_aliases_name_nocase ON aliases(name COLLATE NOCASE)')
+        
+        self.fts_enabled = self._init_search_index(cursor)
+        self._init_stats_tables(cursor)
         
         conn.commit()
         conn.close()
     
+    def _migrate(self, conn: sqlite3.Connection):
+        """Apply pending SCHEMA_MIGRATIONS, each in its own transaction"""
+        current = conn.execute('PRAGMA user_version').fetchone()[0]
+        
+        for version, description, statements in SCHEMA_MIGRATIONS:
+            if version <= current:
+                continue
+            logger.info(f"Migrating {self.db_path} to schema v{version}: {description}")
+            try:
+                conn.execute('BEGIN')
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {version}')
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                logger.error(f"Schema migration v{version} failed; database left at v{current}")
+                raise
+            current = version
+    
+    def get_schema_version(self) -> int:
+        """Current PRAGMA user_version of the database"""
+        conn = self._connect()
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        conn.close()
+        return version
+    
+    def _init_search_index(self, cursor) -> bool:
+        """Create the trigram FTS5 index over email/name/description, if SQLite supports it"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'aliases_fts'")
+        is_new = cursor.fetchone() is None
+        
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS aliases_fts USING fts5(
+                    email, name, description,
+                    content='aliases', content_rowid='rowid',
+                    tokenize='trigram'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 trigram search unavailable, falling back to LIKE: {e}")
+            return False
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS aliases_fts_insert AFTER INSERT ON aliases BEGIN
+                INSERT INTO aliases_fts(rowid, email, name, description)
+                VALUES (new.rowid, new.email, new.name, new.description);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS aliases_fts_delete AFTER DELETE ON aliases BEGIN
+                INSERT INTO aliases_fts(aliases_fts, rowid, email, name, description)
+                VALUES ('delete', old.rowid, old.email, old.name, old.description);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS aliases_fts_update AFTER UPDATE OF email, name, description ON aliases BEGIN
+                INSERT INTO aliases_fts(aliases_fts, rowid, email, name, description)
+                VALUES ('delete', old.rowid, old.email, old.name, old.description);
+                INSERT INTO aliases_fts(rowid, email, name, description)
+                VALUES (new.rowid, new.email, new.name, new.description);
+            END
+        ''')
+        
+        # Backfill databases created before the search index existed
+        if is_new:
+            cursor.execute("INSERT INTO aliases_fts(aliases_fts) VALUES ('rebuild')")
+        
+        return True
+    
+    def _init_stats_tables(self, cursor):
+        """Create the per-alias traffic aggregates maintained by alias_stats.py"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alias_stats (
+                email TEXT PRIMARY KEY COLLATE NOCASE,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                spam_count INTEGER NOT NULL DEFAULT 0,
+                read_count INTEGER NOT NULL DEFAULT 0,
+                marked_spam_count INTEGER NOT NULL DEFAULT 0,
+                deleted_count INTEGER NOT NULL DEFAULT 0,
+                first_seen TIMESTAMP,
+                last_seen TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alias_senders (
+                email TEXT NOT NULL COLLATE NOCASE,
+                sender TEXT NOT NULL COLLATE NOCASE,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                last_seen TIMESTAMP,
+                PRIMARY KEY (email, sender)
+            ) WITHOUT ROWID
+        ''')
+        # Analytics events repeat (one "read" per view) and IMAP mailboxes get re-read after a
+        # UIDVALIDITY change; this dedupes both per message
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alias_event_keys (
+                email TEXT NOT NULL COLLATE NOCASE,
+                action TEXT NOT NULL,
+                message_id TEXT NOT NULL,
+                PRIMARY KEY (email, action, message_id)
+            ) WITHOUT ROWID
+        ''')
+        # Tail position per ingested source (byte offset for logs, last UID for IMAP)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ingest_offsets (
+                source TEXT PRIMARY KEY,
+                position INTEGER NOT NULL DEFAULT 0,
+                signature TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alias_stats_last_seen ON alias_stats(last_seen)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alias_senders_count ON alias_senders(email, message_count DESC)')
+    
     def save_alias(self, alias_data: dict):
-        """Save or update an alias in the database"""
-        conn = sqlite3.connect(self.db_path)
+        """Save or update an alias in the database, keeping every JMAP property it carries"""
+        conn = self._connect()
         cursor = conn.cursor()
         
+        known = {'id', 'email', 'name', 'description', *JMAP_COLUMNS, *JMAP_JSON_COLUMNS}
+        extra = {k: v for k, v in alias_data.items() if k not in known}
+        
         cursor.execute('''
             INSERT OR REPLACE INTO aliases 
-            (id, email, name, description, updated_at)
-            VALUES (?, ?, ?, ?, ?)
+            (id, email, name, description, updated_at,
+             destination, for_domain, is_disabled, last_message_at, reply_to, bcc, extra)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             alias_data.get('id'),
             alias_data.get('email'),
             alias_data.get('name', ''),
             alias_data.get('description', ''),
-            datetime.now().isoformat()
+            datetime.now().isoformat(),
+            alias_data.get('destination'),
+            alias_data.get('forDomain'),
+            bool(alias_data.get('isDisabled', False)),
+            alias_data.get('lastMessageAt'),
+            self._to_json(alias_data.get('replyTo')),
+            self._to_json(alias_data.get('bcc')),
+            self._to_json(extra or None)
         ))
         
         conn.commit()
         conn.close()
     
+    @staticmethod
+    def _to_json(value) -> str | None:
+        """Compact JSON for list/object properties (NULL when absent)"""
+        if value is None:
+            return None
+        return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+    
+    def get_alias_object(self, alias_id: str) -> dict | None:
+        """Rebuild the JMAP-shaped alias/identity object from the stored columns"""
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT * FROM aliases WHERE id = ?', (alias_id,))
+        row = cursor.fetchone()
+        conn.close()
+        if not row:
+            return None
+        
+        alias = json.loads(row['extra']) if row['extra'] else {}
+        alias.update({'id': row['id'], 'email': row['email'], 'name': row['name'],
+                      'description': row['description']})
+        for prop, column in JMAP_COLUMNS.items():
+            if row[column] is not None:
+                alias[prop] = bool(row[column]) if prop == 'isDisabled' else row[column]
+        for prop, column in JMAP_JSON_COLUMNS.items():
+            if row[column] is not None:
+                alias[prop] = json.loads(row[column])
+        return alias
+    
+    def list_view(self, limit: int = 50, cursor_token: str | None = None) -> dict:
+        """
+        Active aliases for list screens, newest first, read only from idx_aliases_list
+        (no table lookups). Same {'aliases', 'next_cursor'} shape as query_aliases.
+        """
+        conditions = ['is_active = 1']
+        params = []
+        if cursor_token:
+            after_created, after_id = self._parse_cursor(cursor_token)
+            conditions.append('(created_at < ? OR (created_at = ? AND id < ?))')
+            params.extend([after_created, after_created, after_id])
+        
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            SELECT {', '.join(LIST_VIEW_COLUMNS)}
+            FROM aliases
+            WHERE {' AND '.join(conditions)}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        ''', (*params, limit + 1))
+        
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = f"{rows[-1]['created_at']}|{rows[-1]['id']}"
+        
+        return {'aliases': rows, 'next_cursor': next_cursor}
+    
     def get_aliases(self) -> list:
         """Get all aliases from the database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -120,9 +368,156 @@ class AliasDatabase:
             for row in results
         ]
     
+    def iter_aliases(self, active_only: bool = True, batch_size: int = 1000, after_id: str = ''):
+        """Yield aliases one at a time in id order (starting after `after_id`) without materializing the table"""
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        where = 'AND is_active = 1' if active_only else ''
+        cursor.execute(f'''
+            SELECT id, email, name, description, created_at, is_active
+            FROM aliases
+            WHERE id > ? {where}
+            ORDER BY id
+        ''', (after_id,))
+        
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+        finally:
+            conn.close()
+    
+    def find_alias_by_email(self, email_address: str) -> dict | None:
+        """Look up a single alias by address (case-insensitive, index-backed)"""
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, email, name, description, created_at, is_active
+            FROM aliases
+            WHERE email = ? COLLATE NOCASE
+        ''', (email_address.strip(),))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        return dict(row) if row else None
+    
+    def query_aliases(self, search: str | None = None, prefix: str | None = None,
+                      active_only: bool = True, limit: int = 50,
+                      cursor_token: str | None = None) -> dict:
+        """
+        Query aliases without loading the whole table.
+        
+        - prefix: case-insensitive prefix match on email or name (index range scan)
+        - search: substring match on email/name/description via the trigram index
+        - cursor_token: opaque "next_cursor" from a previous page (keyset pagination);
+          a malformed token raises ValueError
+        
+        Returns {'aliases': [...], 'next_cursor': str | None}, newest first.
+        """
+        conditions = []
+        params = []
+        
+        if active_only:
+            # With a text filter, the unary "+" keeps the planner on the email/name/FTS
+            # indexes instead of walking idx_aliases_list row by row
+            conditions.append('+is_active = 1' if (prefix or search) else 'is_active = 1')
+        
+        if prefix:
+            pattern = self._escape_like(prefix) + '%'
+            conditions.append("(email LIKE ? ESCAPE '\\' OR name LIKE ? ESCAPE '\\')")
+            params.extend([pattern, pattern])
+        
+        if search:
+            terms = search.split()
+            if self.fts_enabled and all(len(term) >= 3 for term in terms):
+                # Trigram FTS: each quoted term is a substring match, terms are ANDed
+                match = ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+                conditions.append('rowid IN (SELECT rowid FROM aliases_fts WHERE aliases_fts MATCH ?)')
+                params.append(match)
+            else:
+                # Trigrams need 3+ characters; short terms fall back to LIKE
+                for term in terms:
+                    pattern = '%' + self._escape_like(term) + '%'
+                    conditions.append(
+                        "(email LIKE ? ESCAPE '\\' OR name LIKE ? ESCAPE '\\' "
+                        "OR description LIKE ? ESCAPE '\\')"
+                    )
+                    params.extend([pattern, pattern, pattern])
+        
+        if cursor_token:
+            after_created, after_id = self._parse_cursor(cursor_token)
+            conditions.append('(created_at < ? OR (created_at = ? AND id < ?))')
+            params.extend([after_created, after_created, after_id])
+        
+        where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+        
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        # Fetch one extra row to know whether another page exists
+        cursor.execute(f'''
+            SELECT id, email, name, description, created_at, is_active
+            FROM aliases
+            {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        ''', (*params, limit + 1))
+        
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = f"{last['created_at']}|{last['id']}"
+        
+        return {'aliases': rows, 'next_cursor': next_cursor}
+    
+    @staticmethod
+    def _escape_like(value: str) -> str:
+        """Escape LIKE wildcards so user input is matched literally"""
+        return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    
+    @staticmethod
+    def _parse_cursor(cursor_token: str) -> tuple:
+        """Split a "created_at|id" page cursor; ValueError if it was not issued by us"""
+        after_created, sep, after_id = cursor_token.partition('|')
+        if not sep or not after_created or not after_id:
+            raise ValueError(f"Invalid page cursor: {cursor_token!r}")
+        return after_created, after_id
+    
+    def update_alias(self, alias_id: str, name: str | None = None, description: str | None = None):
+        """Update the name and/or description of an existing alias"""
+        fields = {k: v for k, v in (('name', name), ('description', description)) if v is not None}
+        if not fields:
+            return
+        
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        assignments = ', '.join(f'{column} = ?' for column in fields)
+        cursor.execute(f'''
+            UPDATE aliases
+            SET {assignments}, updated_at = ?
+            WHERE id = ?
+        ''', (*fields.values(), datetime.now().isoformat(), alias_id))
+        
+        conn.commit()
+        conn.close()
+    
     def delete_alias(self, alias_id: str):
         """Mark an alias as inactive (soft delete)"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -136,7 +531,7 @@ class AliasDatabase:
     
     def get_stats(self) -> dict:
         """Get alias statistics"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT COUNT(*) FROM aliases WHERE is_active = 1')
@@ -153,14 +548,85 @@ class AliasDatabase:
             'total': active_count + deleted_count
         }
 
+    def get_alias_stats(self, email_address: str, top_senders: int = 5) -> dict | None:
+        """Get precomputed traffic counters and top senders for one alias"""
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT * FROM alias_stats WHERE email = ?', (email_address.strip(),))
+        row = cursor.fetchone()
+        if not row:
+            conn.close()
+            return None
+        
+        stats = dict(row)
+        cursor.execute('''
+            SELECT sender, message_count, last_seen
+            FROM alias_senders
+            WHERE email = ?
+            ORDER BY message_count DESC
+            LIMIT ?
+        ''', (email_address.strip(), top_senders))
+        stats['top_senders'] = [dict(r) for r in cursor.fetchall()]
+        
+        conn.close()
+        return stats
+    
+    def find_dead_aliases(self, inactive_days: int = 90, limit: int = 100) -> list:
+        """Active aliases with no recorded mail in the last `inactive_days` (never-seen first)"""
+        # alias_stats timestamps are stored as UTC "YYYY-MM-DDTHH:MM:SSZ"
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=inactive_days)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT a.id, a.email, a.name, a.created_at,
+                   COALESCE(s.message_count, 0) AS message_count, s.last_seen
+            FROM aliases a
+            LEFT JOIN alias_stats s ON s.email = a.email
+            WHERE a.is_active = 1 AND (s.last_seen IS NULL OR s.last_seen < ?)
+            ORDER BY s.last_seen IS NOT NULL, s.last_seen
+            LIMIT ?
+        ''', (cutoff, limit))
+        
+        results = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return results
+    
+    def find_spammy_aliases(self, min_messages: int = 10, min_spam_ratio: float = 0.5,
+                            limit: int = 100) -> list:
+        """Active aliases whose received mail is mostly spam (by spam folder or user marking)"""
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT a.id, a.email, a.name, s.message_count, s.spam_count, s.marked_spam_count,
+                   MIN(1.0, CAST(s.spam_count + s.marked_spam_count AS REAL) / MAX(s.message_count, 1)) AS spam_ratio,
+                   s.last_seen
+            FROM alias_stats s
+            JOIN aliases a ON s.email = a.email
+            WHERE a.is_active = 1 AND s.message_count >= ?
+              AND MIN(1.0, CAST(s.spam_count + s.marked_spam_count AS REAL) / MAX(s.message_count, 1)) >= ?
+            ORDER BY spam_ratio DESC, s.message_count DESC
+            LIMIT ?
+        ''', (min_messages, min_spam_ratio, limit))
+        
+        results = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return results
+
 class FastMailAliasManager:
-    def __init__(self, email: str, api_token: str):
+    def __init__(self, email: str, api_token: str, db_path: str = "aliases.db"):
         self.session = requests.Session()
         self.email = email
         self.base_url = None          # will be set from /.well-known/jmap
         self.account_id = None        # JMAP mail account ID
         self.session_state = None
-        self.db = AliasDatabase()
+        self.db = AliasDatabase(db_path)
 
         # Standard headers; we'll fill in Authorization below
         self.headers = {
@@ -394,14 +860,98 @@ class FastMailAliasManager:
             print(f"Error deleting alias: {e}")
             return []
 
+    def batch_set_aliases(self, create: list | None = None, update: dict | None = None,
+                          destroy: list | None = None) -> dict:
+        """
+        Apply many alias changes in a single Identity/set call and sync the database.
+        
+        create:  list of {"email", "name", "description"} dicts
+        update:  {alias_id: {"name": ...}} patches
+        destroy: list of alias ids
+        
+        Returns {"created": [...], "updated": [...], "destroyed": [...], "failed": {...}},
+        where "failed" maps the email (create) or id (update/destroy) to the server error.
+        """
+        result = {"created": [], "updated": [], "destroyed": [], "failed": {}}
+        create = create or []
+        update = update or {}
+        destroy = destroy or []
+        if not (create or update or destroy):
+            return result
+        
+        set_args = {"accountId": self.account_id}
+        creation_ids = {}
+        if create:
+            set_args["create"] = {}
+            for i, entry in enumerate(create):
+                creation_id = f"c{i}"
+                creation_ids[creation_id] = entry
+                set_args["create"][creation_id] = {
+                    "name": entry.get("name", ""),
+                    "email": entry.get("email") or f"{entry.get('name')}@fastmail.com"
+                }
+        if update:
+            set_args["update"] = update
+        if destroy:
+            set_args["destroy"] = destroy
+        
+        payload = {
+            "using": [
+                "urn:ietf:params:jmap:core",
+                "urn:ietf:params:jmap:mail"
+            ],
+            "methodCalls": [
+                ["Identity/set", set_args, "0"]
+            ],
+            "sessionState": self.session_state
+        }
+        resp = self.session.post(
+            self.base_url,
+            headers=self.headers,
+            json=payload
+        )
+        if resp.status_code != 200:
+            raise Exception(f"Failed to apply alias batch: {resp.status_code} – {resp.text}")
+        
+        data = resp.json()
+        for method_resp in data.get("methodResponses", []):
+            if method_resp[0] != "Identity/set":
+                continue
+            args = method_resp[1]
+            new_state = args.get("newState")
+            if new_state:
+                self.session_state = new_state
+            
+            for creation_id, new_obj in (args.get("created") or {}).items():
+                entry = creation_ids[creation_id]
+                new_obj = {**set_args["create"][creation_id], **new_obj}
+                new_obj['description'] = entry.get("description", "")
+                self.db.save_alias(new_obj)
+                result["created"].append(new_obj)
+            for creation_id, error in (args.get("notCreated") or {}).items():
+                result["failed"][set_args["create"][creation_id]["email"]] = error
+            
+            for alias_id in (args.get("updated") or {}):
+                self.db.update_alias(alias_id, name=update[alias_id].get("name"))
+                result["updated"].append(alias_id)
+            for alias_id, error in (args.get("notUpdated") or {}).items():
+                result["failed"][alias_id] = error
+            
+            for alias_id in args.get("destroyed") or []:
+                self.db.delete_alias(alias_id)
+                result["destroyed"].append(alias_id)
+            for alias_id, error in (args.get("notDestroyed") or {}).items():
+                result["failed"][alias_id] = error
+        
+        return result
+
     def get_stats(self) -> dict:
         """Get alias statistics from database"""
         return self.db.get_stats()
 
 def main():
     # Use environment variables
-    email = FASTMAIL_EMAIL
-    api_token = FASTMAIL_API_TOKEN
+    email, api_token = load_credentials()
 
     if not all([email, api_token]):
         print("Please set both FM_M_0 and FM_API_0 in .env file, then rerun.")
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Inbox Digest
+Reads unread mail aloud as a pipeline: an IMAP fetch stage (EnhancedEmailReader extraction),
+a text preparation stage (the TTS engine's email script) and a speech generation stage run
+concurrently with bounded queues between them, and finished messages go to a playback
+queue. Message 1 is playing while later messages are still being fetched and generated.
+"""
+
+import sys
+import time
+import queue
+import email
+import imaplib
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent.parent))  # cli_x, for the Dia TTS engine
+from enhanced_email_reader import EnhancedEmailReader
+from dia_tts_engine import DiaTTSEngine
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_LIMIT = 10
+DEFAULT_QUEUE_SIZE = 2
+DONE = object()  # End-of-stream marker passed between stages
+
+class InboxDigest:
+    """Fetch → prepare → speak pipeline over an IMAP folder"""
+
+    def __init__(self, reader: EnhancedEmailReader, engine: DiaTTSEngine, folder: str = 'INBOX',
+                 limit: int = DEFAULT_LIMIT, unread_only: bool = True, long_form: bool = False,
+                 play: bool = True, output_dir: Optional[Path] = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.reader = reader
+        self.engine = engine
+        self.folder = folder
+        self.limit = limit
+        self.unread_only = unread_only
+        self.long_form = long_form
+        self.play = play
+        self.output_dir = Path(output_dir or engine.temp_dir / "digest")
+        self.queue_size = queue_size
+        self._stop = threading.Event()
+        self._errors: List[str] = []
+        self._start_time = 0.0
+        self.messages: List[Dict[str, Any]] = []
+
+    def run(self) -> Dict[str, Any]:
+        """Run all stages to completion and return a summary"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        fetched: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        prepared: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        self._start_time = time.time()
+
+        stages = [
+            threading.Thread(target=self._guard, args=(self._fetch_stage, fetched), name="digest-fetch"),
+            threading.Thread(target=self._guard, args=(self._prep_stage, fetched, prepared), name="digest-prep"),
+            threading.Thread(target=self._guard, args=(self._tts_stage, prepared), name="digest-tts"),
+        ]
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+
+        if self.play:
+            self.engine.audio_sink.wait()
+
+        elapsed = time.time() - self._start_time
+        first_audio = min((m['audio_ready_at'] for m in self.messages), default=None)
+        return {
+            'messages': self.messages,
+            'count': len(self.messages),
+            'elapsed_seconds': round(elapsed, 2),
+            'first_audio_seconds': round(first_audio, 2) if first_audio is not None else None,
+            'errors': self._errors
+        }
+
+    # ─── Plumbing ─────────────────────────────────────────────────────────────
+    def _guard(self, stage, *queues):
+        """Run a stage; on failure stop the others and still pass DONE downstream"""
+        try:
+            stage(*queues)
+        except Exception as e:
+            logger.error(f"{threading.current_thread().name} failed: {e}")
+            self._errors.append(f"{threading.current_thread().name}: {e}")
+            self._stop.set()
+            if stage == self._prep_stage:
+                self._put(queues[-1], DONE, force=True)
+
+    def _put(self, q: "queue.Queue", item, force: bool = False) -> bool:
+        """Blocking put that gives up when the pipeline is stopping (unless forced)"""
+        while force or not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if force and self._stop.is_set():
+                    # Downstream is gone; make room for the marker
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+        return False
+
+    def _get(self, q: "queue.Queue"):
+        while True:
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return DONE
+
+    # ─── Stages ───────────────────────────────────────────────────────────────
+    def _fetch_stage(self, out_q: "queue.Queue"):
+        """One IMAP session; BODY.PEEK keeps messages unread"""
+        mail = imaplib.IMAP4_SSL(self.reader.imap_server, self.reader.imap_port)
+        try:
+            mail.login(self.reader.email, self.reader.password)
+            mail.select(self.folder, readonly=True)
+            _, data = mail.uid('search', None, 'UNSEEN' if self.unread_only else 'ALL')
+            uids = list(reversed(data[0].split()))[:self.limit]  # Newest first
+            logger.info(f"📬 {len(uids)} {'unread ' if self.unread_only else ''}messages in {self.folder}")
+
+            for uid in uids:
+                if self._stop.is_set():
+                    break
+                fetch_start = time.time()
+                _, msg_data = mail.uid('fetch', uid, '(BODY.PEEK[])')
+                raw = next((part[1] for part in msg_data if isinstance(part, tuple)), None)
+                if raw is None:
+                    logger.warning(f"Could not fetch UID {uid.decode()}")
+                    continue
+                email_data = self.reader._extract_full_email_content(
+                    email.message_from_bytes(raw), uid.decode()
+                )
+                email_data['fetch_seconds'] = time.time() - fetch_start
+                if not self._put(out_q, email_data):
+                    break
+        finally:
+            try:
+                mail.logout()
+            except Exception:
+                pass
+            self._put(out_q, DONE, force=True)
+
+    def _prep_stage(self, in_q: "queue.Queue", out_q: "queue.Queue"):
+        """Email data → Dia-ready chunks (announcement, body, sign-off)"""
+        max_words = None if self.long_form else 200
+        while True:
+            email_data = self._get(in_q)
+            if email_data is DONE:
+                break
+            body = email_data['text_plain'].strip() or email_data['text_html_converted'].strip()
+            parts = self.engine._email_script_parts(
+                email_data['subject'] or '(no subject)', email_data['from'], body or 'This email has no text.',
+                max_words
+            )
+            chunks = [chunk for part in parts for chunk in self.engine._chunk_script(part)]
+            if not self._put(out_q, {'email': email_data, 'chunks': chunks}):
+                break
+        self._put(out_q, DONE, force=True)
+
+    def _tts_stage(self, in_q: "queue.Queue"):
+        """Generate each message's audio and queue it for playback without waiting for it"""
+        # Loading the model here overlaps it with the first IMAP round trips
+        if not self.engine.ensure_loaded():
+            raise RuntimeError("Dia TTS engine not available")
+
+        while True:
+            item = self._get(in_q)
+            if item is DONE:
+                break
+            email_data, chunks = item['email'], item['chunks']
+            tts_start = time.time()
+            output_file = self.output_dir / f"digest_{len(self.messages) + 1:02d}_{email_data['id']}.wav"
+            audio_file = self.engine._synthesize_chunks(chunks, str(output_file))
+            audio_ready_at = time.time() - self._start_time
+
+            self.messages.append({
+                'uid': email_data['id'],
+                'subject': email_data['subject'],
+                'from': email_data['from'],
+                'audio_file': audio_file,
+                'fetch_seconds': round(email_data['fetch_seconds'], 2),
+                'tts_seconds': round(time.time() - tts_start, 2),
+                'audio_ready_at': audio_ready_at
+            })
+            logger.info(f"🎧 [{len(self.messages)}] {email_data['subject'][:60]} ready after {audio_ready_at:.1f}s")
+            if self.play:
+                self.engine.play_audio(audio_file, block=False)
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Read unread FastMail messages aloud with Dia TTS')
+    parser.add_argument('--folder', '-f', default='INBOX', help='Folder name (default: INBOX)')
+    parser.add_argument('--limit', '-n', type=int, default=DEFAULT_LIMIT,
+                        help=f'Most messages to read, newest first (default: {DEFAULT_LIMIT})')
+    parser.add_argument('--all', action='store_true', help='Include messages that were already read')
+    parser.add_argument('--long-form', action='store_true', help='Read full bodies instead of the first 200 words')
+    parser.add_argument('--no-play', action='store_true', help='Only write audio files')
+    parser.add_argument('--output-dir', '-o', help='Directory for per-message audio files')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f'Messages buffered between stages (default: {DEFAULT_QUEUE_SIZE})')
+    parser.add_argument('--voice', help='Registered Dia voice profile to read with')
+    args = parser.parse_args()
+
+    try:
+        reader = EnhancedEmailReader()
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    engine = DiaTTSEngine()
+    if args.voice:
+        engine.use_voice_profile(args.voice)
+
+    digest = InboxDigest(reader, engine, folder=args.folder, limit=args.limit,
+                         unread_only=not args.all, long_form=args.long_form, play=not args.no_play,
+                         output_dir=Path(args.output_dir) if args.output_dir else None,
+                         queue_size=args.queue_size)
+    summary = digest.run()
+
+    print(f"\n📨 Digest: {summary['count']} messages in {summary['elapsed_seconds']}s "
+          f"(first audio after {summary['first_audio_seconds']}s)")
+    for message in summary['messages']:
+        print(f"  🎧 {message['subject'][:60]} — {message['audio_file']}")
+    for error in summary['errors']:
+        print(f"  ❌ {error}")
+
+if __name__ == "__main__":
+    main()